@@ -0,0 +1,57 @@
+"""
+Plumbing shared by the async views served under ASGI (see backend/urls_async.py).
+
+DRF views are synchronous, so the async views are plain Django views that
+reuse DRF's parsers, serializers and renderer and answer with the same bodies
+and status codes as the DRF views they stand in for.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from wallet.idempotency import IDEMPOTENCY_HEADER
+
+
+def render(data, status=200):
+    # The first configured renderer, as DRF picks for clients that accept anything
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+
+
+def async_api_view(sync_view, methods=('GET',)):
+    """
+    Turn an async function taking a DRF Request into an async Django view.
+
+    The request is authenticated from the session; other HTTP methods and
+    requests carrying an Idempotency-Key are handed to sync_view, the DRF view
+    for the same URL. Http404 and DRF exceptions become the responses DRF's
+    exception handler would give.
+    """
+    sync_view = sync_to_async(sync_view)
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def view(request, *args, **kwargs):
+            if request.method not in methods or IDEMPOTENCY_HEADER in request.headers:
+                return await sync_view(request, *args, **kwargs)
+
+            user = await request.auser()
+            if not user.is_authenticated:
+                # 403 rather than 401: session authentication sends no WWW-Authenticate challenge
+                return render({'detail': NotAuthenticated.default_detail}, 403)
+
+            drf_request = Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES])
+            drf_request.user = user
+            try:
+                return await func(drf_request, *args, **kwargs)
+            except Http404 as exc:
+                return render({'detail': str(exc) or NotFound.default_detail}, NotFound.status_code)
+            except APIException as exc:
+                data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                return render(data, exc.status_code)
+        return view
+    return decorator
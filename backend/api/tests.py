@@ -1,3 +1,117 @@
-from django.test import TestCase
+import json
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.db import router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from api.parsers import ORJSONParser
+from api.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+from backend.replicas import PIN_COOKIE, ReplicaRoutingMiddleware
+from wallet.models import Wallet
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(SimpleTestCase):
+    """Test cases for read replica routing"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.used = []
+
+        def view(request):
+            self.used.append(router.db_for_read(Wallet))
+            return HttpResponse()
+        self.middleware = ReplicaRoutingMiddleware(view)
+
+    def test_safe_requests_read_from_replica(self):
+        """Test GET requests read from a replica and writes never do"""
+        self.middleware(self.factory.get('/api/wallets/'))
+        self.middleware(self.factory.post('/api/wallets/'))
+
+        self.assertEqual(self.used, ['replica', 'default'])
+        self.assertEqual(router.db_for_write(Wallet), 'default')
+        self.assertEqual(router.db_for_read(Wallet), 'default')
+
+    def test_reads_pinned_to_primary_after_write(self):
+        """Test a client that just wrote keeps reading from the primary"""
+        response = self.middleware(self.factory.post('/api/wallets/'))
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+
+        request = self.factory.get('/api/wallets/')
+        request.COOKIES[PIN_COOKIE] = cookie.value
+        self.middleware(request)
+
+        self.assertEqual(self.used, ['default', 'default'])
+
+    def test_streamed_body_reads_from_replica(self):
+        """Test statement-style streamed responses keep reading from the replica"""
+        def rows():
+            yield router.db_for_read(Wallet)
+
+        middleware = ReplicaRoutingMiddleware(lambda request: StreamingHttpResponse(rows()))
+        response = middleware(self.factory.get('/api/wallets/'))
+
+        self.assertEqual(b''.join(response.streaming_content), b'replica')
+
+    def test_replicas_are_not_migrated(self):
+        """Test migrations only run on the primary"""
+        self.assertFalse(router.allow_migrate('replica', 'wallet'))
+        self.assertTrue(router.allow_migrate('default', 'wallet'))
+
+
+class RendererTest(SimpleTestCase):
+    """Test cases for the orjson and MessagePack renderers and parser"""
+
+    def setUp(self):
+        self.data = ReturnDict({
+            'id': uuid.UUID('0190f5a4-3c2b-7d8e-9f01-23456789abcd'),
+            'created_at': datetime(2026, 3, 1, 12, 30, 5, 123456, tzinfo=dt_timezone.utc),
+            'day': date(2026, 3, 1),
+            'amount': '12.50',
+            'description': 'Caf\u00e9 \u2028 \U0001f4b0',
+            'errors': [ErrorDetail('Invalid', code='invalid'), gettext_lazy('Not found.')],
+            'count': 3,
+            'ratio': 0.1,
+            'next': None,
+        }, serializer=None)
+
+    def test_same_output_as_json_renderer(self):
+        """Test ORJSONRenderer output matches JSONRenderer byte for byte"""
+        self.assertEqual(ORJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(
+            ORJSONRenderer().render(self.data, 'application/json; indent=4'),
+            JSONRenderer().render(self.data, 'application/json; indent=4')
+        )
+
+    def test_decimals_rendered_as_strings(self):
+        """Test Decimal values keep their exact digits"""
+        content = ORJSONRenderer().render({'amount': Decimal('1234567890.10'), 'items': [Decimal('0.30')]})
+        self.assertEqual(content, b'{"amount":"1234567890.10","items":["0.30"]}')
+        content = ORJSONRenderer().render({1: Decimal('0.30'), 'big': 2 ** 70})
+        self.assertEqual(content, b'{"1":"0.30","big":1180591620717411303424}')
+
+    def test_parser(self):
+        """Test ORJSONParser parses like JSONParser and rejects the same input"""
+        body = b'{"amount": "10.00", "note": "caf\xc3\xa9", "tags": [1, 2.5, null]}'
+        self.assertEqual(ORJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        for invalid in (b'{"amount": NaN}', b'{"amount": '):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(BytesIO(invalid))
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack_renderer(self):
+        """Test MessagePack responses carry the same values as JSON ones"""
+        content = MessagePackRenderer().render({**self.data, 'amount': Decimal('12.50')})
+        expected = JSONRenderer().render(self.data).decode()
+        self.assertEqual(msgpack.unpackb(content), json.loads(expected))
@@ -2,6 +2,10 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests are resolved against backend.urls_async, which serves the async
+versions of the wallet endpoints and falls back to backend.urls. The event
+stream at /api/events/ (SSE and WebSocket) is served by wallet.streams
+without going through Django's request handling.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -9,8 +13,42 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+
+class AsyncURLConfASGIHandler(ASGIHandler):
+    urlconf = 'backend.urls_async'
+
+    async def get_response_async(self, request):
+        request.urlconf = self.urlconf
+        return await super().get_response_async(request)
+
+
+class Application:
+    """Send the event stream to wallet.streams and everything else to Django"""
+    events_path = '/api/events/'
+
+    def __init__(self):
+        from wallet.streams import EventStreamApp
+
+        self.django = AsyncURLConfASGIHandler()
+        self.events = EventStreamApp()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] in ('http', 'websocket') and scope['path'] == self.events_path:
+            return await self.events(scope, receive, send)
+        return await self.django(scope, receive, send)
+
+
+django.setup(set_prefix=False)
+application = Application()
+
+# Build the in-memory user search index and velocity counters (if used) before requests need them
+from users import search  # noqa: E402
+from wallet import velocity  # noqa: E402
+
+search.preload()
+velocity.preload()
@@ -0,0 +1,98 @@
+"""
+Connection reuse for the default database, chosen with environment variables.
+
+DB_POOL=1 uses Django's psycopg connection pool (requires psycopg[pool]):
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE   connections kept open / allowed (2, 10)
+    DB_POOL_TIMEOUT                      seconds a request waits for a free connection (10)
+    DB_POOL_MAX_IDLE                     seconds before an idle connection is closed (600)
+    DB_POOL_MAX_LIFETIME                 seconds before a connection is replaced (3600)
+Pooled connections are checked before they are handed out.
+
+Otherwise each worker thread keeps a persistent connection:
+    DB_CONN_MAX_AGE                      seconds to reuse it (60; 0 = new connection per
+                                         request, "none" = no limit)
+    DB_CONN_HEALTH_CHECKS                check it before reuse in a new request (1)
+
+DB_CONNECT_TIMEOUT (20) bounds the connect handshake in both modes.
+
+DB_REPLICA_HOSTS=host[:port],... adds read replica aliases replica_1, replica_2, ...
+with the default database's name and credentials (see backend/replicas.py).
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+TRUE = {'1', 'true', 'yes', 'on'}
+FALSE = {'0', 'false', 'no', 'off', ''}
+
+
+def _flag(environ, name, default):
+    value = environ.get(name)
+    if value is None:
+        return default
+    if value.lower() in TRUE:
+        return True
+    if value.lower() in FALSE:
+        return False
+    raise ImproperlyConfigured(f"{name} must be a boolean, got {value!r}")
+
+
+def _number(environ, name, default, cast=int):
+    value = environ.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise ImproperlyConfigured(f"{name} must be a number, got {value!r}")
+
+
+def connection_settings(environ=os.environ):
+    """
+    CONN_MAX_AGE, CONN_HEALTH_CHECKS and OPTIONS entries to merge into a
+    PostgreSQL DATABASES entry
+    """
+    options = {'connect_timeout': _number(environ, 'DB_CONNECT_TIMEOUT', 20)}
+
+    if _flag(environ, 'DB_POOL', False):
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError:
+            raise ImproperlyConfigured("DB_POOL requires the psycopg[pool] package")
+
+        pool = {
+            'min_size': _number(environ, 'DB_POOL_MIN_SIZE', 2),
+            'max_size': _number(environ, 'DB_POOL_MAX_SIZE', 10),
+            'timeout': _number(environ, 'DB_POOL_TIMEOUT', 10, float),
+            'max_idle': _number(environ, 'DB_POOL_MAX_IDLE', 600, float),
+            'max_lifetime': _number(environ, 'DB_POOL_MAX_LIFETIME', 3600, float),
+            'check': ConnectionPool.check_connection,
+        }
+        if pool['min_size'] > pool['max_size']:
+            raise ImproperlyConfigured("DB_POOL_MIN_SIZE must not exceed DB_POOL_MAX_SIZE")
+        # Django refuses persistent connections on top of a pool; closing returns the connection to it
+        return {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {**options, 'pool': pool}}
+
+    max_age = environ.get('DB_CONN_MAX_AGE', '60')
+    return {
+        'CONN_MAX_AGE': None if max_age.lower() == 'none' else _number(environ, 'DB_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': _flag(environ, 'DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': options,
+    }
+
+
+def replica_databases(default, environ=os.environ):
+    """DATABASES entries for the replicas listed in DB_REPLICA_HOSTS"""
+    replicas = {}
+    hosts = [host.strip() for host in environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+    for index, host in enumerate(hosts, start=1):
+        host, _, port = host.partition(':')
+        replicas[f'replica_{index}'] = {
+            **default,
+            'HOST': host,
+            'PORT': port or default.get('PORT', ''),
+            # Tests run against the default test database instead of a replica of it
+            'TEST': {'MIRROR': 'default'},
+        }
+    return replicas
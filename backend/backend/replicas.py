@@ -0,0 +1,130 @@
+"""
+Read replica routing.
+
+ReplicaRoutingMiddleware marks safe requests (GET, HEAD, OPTIONS) as allowed
+to read from a replica, and ReplicaRouter then sends their reads to one of the
+DATABASE_REPLICAS aliases. Everything else reads and writes the default
+database.
+
+Read-your-writes: any unsafe request sets a short-lived cookie, and while it
+is present the client's reads stay on the primary, so a wallet listing right
+after a deposit never shows the balance from before it.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Set for the duration of a request whose reads may go to a replica
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def get_pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+class ReplicaRouter:
+    """Reads from a random replica when the current request allows it, writes to the default database"""
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if replicas and _replica_reads.get():
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema through replication
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        replica_reads = self.replica_reads(request)
+        token = _replica_reads.set(replica_reads)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self.process_response(request, response, replica_reads)
+
+    async def __acall__(self, request):
+        replica_reads = self.replica_reads(request)
+        token = _replica_reads.set(replica_reads)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self.process_response(request, response, replica_reads)
+
+    def replica_reads(self, request):
+        return request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+
+    def process_response(self, request, response, replica_reads):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=get_pin_seconds(), httponly=True, samesite='Lax')
+        elif replica_reads and response.streaming:
+            # Streamed bodies (statement exports) query the database after this middleware returns
+            if response.is_async:
+                response.streaming_content = _route_async(response.streaming_content)
+            else:
+                response.streaming_content = _route(response.streaming_content)
+        return response
+
+
+def _route(chunks):
+    chunks = iter(chunks)
+    while True:
+        token = _replica_reads.set(True)
+        try:
+            chunk = next(chunks, None)
+        finally:
+            _replica_reads.reset(token)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def _route_async(chunks):
+    chunks = aiter(chunks)
+    while True:
+        token = _replica_reads.set(True)
+        try:
+            chunk = await anext(chunks, None)
+        finally:
+            _replica_reads.reset(token)
+        if chunk is None:
+            return
+        yield chunk
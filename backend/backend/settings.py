@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from .database import connection_settings, replica_databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -62,6 +64,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'backend.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -100,7 +103,8 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 #     }
 # }
 
-# DATABASES configuration
+# DATABASES configuration. Connection pooling or persistent connections are chosen
+# with DB_POOL / DB_CONN_MAX_AGE and related environment variables (see backend/database.py).
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -109,12 +113,17 @@ DATABASES = {
         'PASSWORD': 'password',
         'HOST': 'localhost',
         'PORT': '5432',
-        'OPTIONS': {
-            'connect_timeout': 20,
-        },
+        **connection_settings(),
     }
 }
 
+# Read replicas (DB_REPLICA_HOSTS). Safe requests read from a random replica unless the
+# client made a write in the last REPLICA_PIN_SECONDS, which keeps its reads on the primary.
+DATABASES.update(replica_databases(DATABASES['default']))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['backend.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -171,6 +180,98 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # orjson-based JSON (same output as DRF's JSONRenderer, Decimals as strings) and
+    # MessagePack for internal clients; list rest_framework.renderers.JSONRenderer and
+    # rest_framework.parsers.JSONParser instead to go back to the stdlib encoder
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# How long (seconds) responses stored against an Idempotency-Key are replayed.
+# Expired keys are removed with `python manage.py purge_idempotency_keys`.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Fraud screening run before every debit (see wallet/fraud.py). Scores at or above
+# HOLD_THRESHOLD are recorded as PENDING, at or above DENY_THRESHOLD as FAILED. A scorer
+# that misses the latency budget lets the movement through and flags the transaction.
+FRAUD_SCORING = {
+    'SCORER': 'wallet.fraud.RuleBasedScorer',
+    'LATENCY_BUDGET_MS': 5,
+    'HOLD_THRESHOLD': 0.7,
+    'DENY_THRESHOLD': 0.9,
+}
+
+# Sliding-window velocity counters feeding fraud features. The in-memory store is per
+# process and is rebuilt from the last 24 hours of transactions when a worker starts; use
+# wallet.velocity.SQLiteVelocityStore with OPTIONS {'path': ...} to share counters between
+# workers on one host, and `manage.py rebuild_velocity_counters` after a cold start.
+VELOCITY_COUNTERS = {
+    'BACKEND': 'wallet.velocity.InMemoryVelocityStore',
+    'OPTIONS': {},
+}
+
+# Ledger balance checkpoints (`python manage.py create_balance_checkpoints`, e.g. hourly) are
+# taken this many seconds behind now, so transactions still committing are not left out.
+LEDGER_CHECKPOINT_LAG = 5 * 60
+
+# Per-user index of accessible piggy banks (wallet/membership.py), kept in a per-process LRU of
+# MAX_USERS users for LOCAL_TTL seconds. Set CACHE to a CACHES alias to share it between workers;
+# saving or deleting piggy banks and members invalidates it, queryset update() only expires after
+# CACHE_TTL + LOCAL_TTL seconds.
+PIGGYBANK_MEMBERSHIP = {
+    'MAX_USERS': 10000,
+    'LOCAL_TTL': 30,
+    'CACHE': None,
+    'CACHE_TTL': 60,
+}
+
+# Cached wallet list pages with ETags (wallet/list_cache.py). Pages are keyed by a version read
+# from the user's wallet rows, so CACHE need not be shared between workers; a per-process
+# LocMemCache just means each worker builds its own copy. Set CACHE to None to turn it off.
+WALLET_LIST_CACHE = {
+    'CACHE': 'default',
+    'TTL': 60,
+}
+
+# Push channel at /api/events/ under ASGI (wallet/streams.py, wallet/events.py). LocalBroker only
+# reaches subscribers in the publishing process; use wallet.events.SQLiteBroker with OPTIONS
+# {'path': ...} to relay events between worker processes on one host. Each connection buffers at
+# most QUEUE_SIZE events and SSE connections get a keepalive comment every HEARTBEAT seconds.
+EVENT_STREAM = {
+    'BACKEND': 'wallet.events.LocalBroker',
+    'OPTIONS': {},
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT': 15,
+}
+
+# Transactional outbox (wallet/outbox.py): every money movement writes OutboxEvent rows that
+# `python manage.py dispatch_outbox` delivers to SINKS in batches (FileSink, HTTPSink or
+# CallbackSink), at least once and in order per wallet. Run `purge_outbox_events` daily.
+OUTBOX = {
+    'SINKS': [
+        {'BACKEND': 'wallet.outbox.FileSink', 'OPTIONS': {'path': str(BASE_DIR / 'outbox.ndjson')}},
+    ],
+    'BATCH_SIZE': 500,
+    'POLL_INTERVAL': 0.5,
+    'RETRY_DELAY': 5,
+    'MAX_RETRY_DELAY': 300,
+    'RETENTION_DAYS': 7,
+}
+
+# Ranked user search (users/search.py). 'auto' uses the pg_trgm indexes on
+# PostgreSQL and an in-memory index per process elsewhere, which picks up
+# users changed by other processes every SYNC_INTERVAL seconds.
+USER_SEARCH = {
+    'BACKEND': 'auto',
+    'SYNC_INTERVAL': 2,
 }
 
 # drf-spectacular settings
@@ -0,0 +1,23 @@
+"""
+URL configuration used by the ASGI application (backend/asgi.py).
+
+The async views take over the paths they implement, under the same names;
+every other path falls through to backend.urls.
+"""
+from django.urls import path
+
+from backend import urls
+from users import async_views as user_views
+from wallet import async_views as wallet_views
+
+urlpatterns = [
+    path('api/auth/users/search/', user_views.search_users, name='user-search'),
+    path('api/wallets/', wallet_views.wallet_list, name='wallet-list-create'),
+    path('api/wallets/<uuid:pk>/', wallet_views.wallet_detail, name='wallet-detail'),
+    path('api/wallets/<uuid:wallet_id>/deposit/', wallet_views.deposit_money, name='wallet-deposit'),
+    path('api/wallets/<uuid:wallet_id>/transfer/', wallet_views.transfer_money, name='wallet-transfer'),
+    path('api/wallets/<uuid:wallet_id>/transactions/', wallet_views.wallet_transactions, name='wallet-transactions'),
+    path('api/piggybanks/', wallet_views.piggybank_list, name='piggybank-list-create'),
+    path('api/piggybanks/<uuid:piggybank_id>/contribute/', wallet_views.contribute_to_piggybank,
+         name='piggybank-contribute'),
+] + urls.urlpatterns
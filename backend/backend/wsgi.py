@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Build the in-memory user search index and velocity counters (if used) before requests need them
+from users import search  # noqa: E402
+from wallet import velocity  # noqa: E402
+
+search.preload()
+velocity.preload()
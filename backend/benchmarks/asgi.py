@@ -0,0 +1,176 @@
+"""
+Throughput of the authenticated wallet listing served through the WSGI
+application (DRF views) and the ASGI application (async views) when clients
+are slow to read their responses.
+
+    python -m benchmarks.asgi --requests 2000 --clients 500 --threads 32 --client-delay 500
+
+Both applications are driven in-process, without a network server, so the
+numbers measure the applications and not a particular server:
+
+    wsgi   a pool of --threads worker threads, like gunicorn's gthread workers.
+           A worker stays busy until its client has read the whole response,
+           modelled as --client-delay ms of sleep after the body is produced.
+    asgi   --clients concurrent requests on one event loop. The slow read is
+           an await in send(), so it holds no thread.
+
+Requests per second, latency percentiles (including time spent waiting for a
+worker) and the peak number of threads in the process are reported. Django
+runs its built-in middleware through sync_to_async on a thread kept for each
+in-flight ASGI request, so the ASGI peak follows --clients, but those threads
+sit idle while the client reads.
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from benchmarks.common import print_table, scratch_database, seed
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from users.models import User  # noqa: E402
+
+
+PATH = '/api/wallets/'
+
+
+class ThreadPeak:
+    """Samples the number of live threads in the background"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.sampler.join()
+
+
+def run_wsgi(cookie, total, threads, delay):
+    """Returns (seconds, latencies, failures, peak threads)"""
+    app = get_wsgi_application()
+    failures = []
+
+    def request(queued_at):
+        statuses = []
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': PATH, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_COOKIE': cookie,
+            'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(), 'wsgi.errors': BytesIO(),
+            'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        body = app(environ, lambda status, headers: statuses.append(status))
+        b''.join(body)
+        body.close()
+        time.sleep(delay)
+        if not statuses[0].startswith('200'):
+            failures.append(statuses[0])
+        return time.perf_counter() - queued_at
+
+    with ThreadPeak() as peak, ThreadPoolExecutor(threads) as executor:
+        started = time.perf_counter()
+        futures = [executor.submit(request, time.perf_counter()) for _ in range(total)]
+        latencies = [future.result() for future in futures]
+        seconds = time.perf_counter() - started
+    return seconds, latencies, len(failures), peak.peak
+
+
+def run_asgi(cookie, total, clients, delay):
+    """Returns (seconds, latencies, failures, peak threads)"""
+    from backend.asgi import application
+
+    failures = []
+
+    async def request(slots, queued_at):
+        async with slots:
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': PATH, 'raw_path': PATH.encode(), 'query_string': b'',
+                'root_path': '', 'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+                'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+            }
+            received = False
+            done = asyncio.Event()
+
+            async def receive():
+                nonlocal received
+                if not received:
+                    received = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await done.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start' and message['status'] != 200:
+                    failures.append(message['status'])
+                elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                    await asyncio.sleep(delay)
+                    done.set()
+
+            await application(scope, receive, send)
+            return time.perf_counter() - queued_at
+
+    async def main():
+        slots = asyncio.Semaphore(clients)
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(request(slots, time.perf_counter()) for _ in range(total)))
+        return time.perf_counter() - started, latencies
+
+    with ThreadPeak() as peak:
+        seconds, latencies = asyncio.run(main())
+    return seconds, latencies, len(failures), peak.peak
+
+
+def summarize(name, total, result):
+    seconds, latencies, failures, threads = result
+    cuts = statistics.quantiles(latencies, n=100)
+    return [
+        name, f"{total / seconds:,.0f}", f"{cuts[49] * 1000:.0f}", f"{cuts[98] * 1000:.0f}", threads, failures
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=500, help="Concurrent clients for the ASGI application")
+    parser.add_argument('--threads', type=int, default=32, help="Worker threads for the WSGI application")
+    parser.add_argument('--client-delay', type=float, default=500, help="Milliseconds each client takes to read")
+    args = parser.parse_args()
+    delay = args.client_delay / 1000
+
+    with scratch_database():
+        seed(users=200)
+        client = Client()
+        client.force_login(User.objects.filter(wallets__isnull=False).first())
+        cookie = f"sessionid={client.cookies['sessionid'].value}"
+
+        run_wsgi(cookie, min(args.requests, 100), args.threads, 0)
+        run_asgi(cookie, min(args.requests, 100), args.clients, 0)
+        results = [
+            summarize(f'wsgi ({args.threads} threads)', args.requests,
+                      run_wsgi(cookie, args.requests, args.threads, delay)),
+            summarize(f'asgi ({args.clients} clients)', args.requests,
+                      run_asgi(cookie, args.requests, args.clients, delay)),
+        ]
+
+        print(f"{args.requests} x GET {PATH}, clients take {args.client_delay:.0f} ms to read\n")
+        print_table(['app', 'requests/s', 'p50 ms', 'p99 ms', 'peak threads', 'failures'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Helpers shared by the benchmark scripts in this directory.
+
+Every script runs against a scratch copy of the configured database
+(test_<NAME>), created and migrated on start and dropped on exit, so it never
+touches real data. Run them from backend/:
+
+    python -m benchmarks.<script> --help
+"""
+import os
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from users.models import User  # noqa: E402
+from wallet.models import (  # noqa: E402
+    Wallet, Transaction, PiggyBank, PiggyBankContribution, PiggyBankMember
+)
+
+
+@contextmanager
+def scratch_database():
+    """Create and migrate a throwaway database, and drop it afterwards"""
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def add_seed_arguments(parser, users=2000, wallets_per_user=3, transactions_per_wallet=30):
+    parser.add_argument('--users', type=int, default=users)
+    parser.add_argument('--wallets-per-user', type=int, default=wallets_per_user)
+    parser.add_argument('--transactions-per-wallet', type=int, default=transactions_per_wallet)
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the generated data")
+
+
+def seed(users=2000, wallets_per_user=3, transactions_per_wallet=30, random_seed=0, batch_size=5000):
+    """
+    Bulk-insert a synthetic dataset: users with a mix of active and closed
+    wallets, piggy banks with members and contributions, and a transaction
+    history per wallet. Returns the row counts.
+    """
+    rng = random.Random(random_seed)
+    User.objects.bulk_create(
+        [User(username=f'bench{i}', email=f'bench{i}@example.com') for i in range(users)], batch_size=batch_size
+    )
+    people = list(User.objects.filter(username__startswith='bench').order_by('username'))
+
+    Wallet.objects.bulk_create([
+        Wallet(owner=person, name=f'Wallet {j}', balance=Decimal(rng.randint(0, 10000)), is_active=rng.random() > 0.2)
+        for person in people for j in range(wallets_per_user)
+    ], batch_size=batch_size)
+    wallets = list(Wallet.objects.order_by('id'))
+
+    PiggyBank.objects.bulk_create([
+        PiggyBank(name=f'Fund {i}', creator=rng.choice(people), target_amount=Decimal('1000.00'),
+                  is_active=rng.random() > 0.1)
+        for i in range(max(1, users // 10))
+    ], batch_size=batch_size)
+    piggy_banks = list(PiggyBank.objects.order_by('id'))
+
+    PiggyBankMember.objects.bulk_create([
+        PiggyBankMember(piggy_bank=piggy_bank, user=person, is_active=rng.random() > 0.2)
+        for piggy_bank in piggy_banks for person in rng.sample(people, min(5, len(people)))
+    ], batch_size=batch_size)
+
+    transactions = []
+    contributions = []
+    for wallet in wallets:
+        for _ in range(transactions_per_wallet):
+            kind = rng.choice(('DEPOSIT', 'TRANSFER_OUT', 'TRANSFER_IN', 'PIGGYBANK_CONTRIBUTION'))
+            txn = Transaction(
+                wallet=wallet, transaction_type=kind, amount=Decimal(rng.randint(1, 500)), status='COMPLETED'
+            )
+            if kind.startswith('TRANSFER'):
+                txn.related_wallet = rng.choice(wallets)
+            if kind == 'PIGGYBANK_CONTRIBUTION':
+                piggy_bank = rng.choice(piggy_banks)
+                txn.reference_id = str(piggy_bank.id)
+                contributions.append(PiggyBankContribution(
+                    piggy_bank=piggy_bank, contributor_id=wallet.owner_id, wallet=wallet, amount=txn.amount,
+                    transaction=txn
+                ))
+            transactions.append(txn)
+    Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+    PiggyBankContribution.objects.bulk_create(contributions, batch_size=batch_size)
+    analyze()
+
+    return {
+        'users': len(people),
+        'wallets': len(wallets),
+        'piggy_banks': len(piggy_banks),
+        'transactions': len(transactions),
+        'contributions': len(contributions),
+    }
+
+
+def analyze():
+    """Refresh planner statistics"""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def measure(func, repeat=50):
+    """Median wall time of func() in milliseconds, after one warm-up call"""
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    for row in [headers, ['-' * width for width in widths]] + list(rows):
+        print('  '.join(str(value).ljust(width) for value, width in zip(row, widths)))
@@ -0,0 +1,147 @@
+"""
+Requests per second of the authenticated wallet listing for each way of
+handling database connections (see backend/database.py).
+
+    python -m benchmarks.connections --requests 5000 --threads 8
+
+Every mode runs the app in a child process with its own environment, served
+by a fixed pool of worker threads like gunicorn's gthread workers, against the
+same scratch database:
+
+    new          DB_CONN_MAX_AGE=0: connect and authenticate on every request
+    persistent   DB_CONN_MAX_AGE=60: one health-checked connection per thread
+    pool         DB_POOL=1: psycopg pool shared by the threads (PostgreSQL only)
+
+The scratch database must be reachable from another process, so an
+in-memory SQLite test database will not do.
+"""
+import argparse
+import http.client
+import itertools
+import os
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import print_table, scratch_database, seed
+
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from users.models import User  # noqa: E402
+
+
+MODES = {
+    'new': {'DB_POOL': '0', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': '0', 'DB_CONN_MAX_AGE': '60', 'DB_CONN_HEALTH_CHECKS': '1'},
+    'pool': {'DB_POOL': '1'},
+}
+
+PATH = '/api/wallets/'
+
+
+class PooledWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    """Hands connections to a fixed set of worker threads instead of a thread per connection"""
+
+    def __init__(self, *args, workers, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executor = ThreadPoolExecutor(workers)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, threads):
+    """Child process: serve the app on the parent's scratch database until killed"""
+    connection.creation.create_test_db(verbosity=0, keepdb=True, serialize=False)
+    connection.close()
+    server = PooledWSGIServer(('127.0.0.1', port), QuietRequestHandler, workers=threads)
+    server.set_app(get_wsgi_application())
+    print('ready', flush=True)
+    server.serve_forever()
+
+
+def load(port, cookie, total, concurrency):
+    """Issue total GETs from concurrency keep-alive clients; returns (requests/s, failures)"""
+    issued = itertools.count()
+    failures = []
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while next(issued) < total:
+            conn.request('GET', PATH, headers={'Cookie': cookie})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                failures.append(response.status)
+        conn.close()
+
+    workers = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return total / (time.perf_counter() - started), len(failures)
+
+
+def run_mode(mode, port, threads, cookie, total):
+    env = {**os.environ, **MODES[mode]}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.connections', '--serve', '--port', str(port), '--threads', str(threads)],
+        env=env, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        if server.stdout.readline().strip() != 'ready':
+            raise RuntimeError(f"{mode} server did not start (exit code {server.wait()})")
+        load(port, cookie, min(total, 100), threads)
+        return load(port, cookie, total, threads)
+    finally:
+        server.kill()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8, help="Server worker threads and concurrent clients")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.threads)
+        return
+
+    with scratch_database():
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            sys.exit("The scratch database is in memory; set DATABASES['default']['TEST']['NAME'] to a file")
+        seed(users=200)
+        user = User.objects.filter(wallets__isnull=False).first()
+        client = Client()
+        client.force_login(user)
+        cookie = f"sessionid={client.cookies['sessionid'].value}"
+        connection.close()
+
+        results = []
+        for mode in args.modes:
+            rate, failures = run_mode(mode, args.port, args.threads, cookie, args.requests)
+            results.append([mode, f"{rate:,.0f}", failures])
+
+        print(f"{args.requests} x GET {PATH}, {args.threads} threads, {connection.vendor}\n")
+        print_table(['mode', 'requests/s', 'failures'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Memory held per idle event stream connection and the time to fan one event
+out to all of them (wallet/streams.py, wallet/events.py).
+
+    python -m benchmarks.event_stream --connections 20000
+
+The connections are SSE requests made to the ASGI application in-process,
+all logged in as users subscribed to one channel, so every published event
+reaches each of them. Memory is what tracemalloc sees allocated for the open
+connections (the coroutines, queues and Django's per-connection state), not
+the server's socket buffers.
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks.common import print_table, scratch_database
+
+from django.conf import settings  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from users.models import User  # noqa: E402
+from wallet import events  # noqa: E402
+from wallet.streams import EventStreamApp  # noqa: E402
+
+
+async def open_connections(app, cookie, count):
+    connections = []
+    for _ in range(count):
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        inbox.put_nowait({'type': 'http.request', 'body': b''})
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/events/', 'headers': [(b'cookie', cookie)]}
+        task = asyncio.ensure_future(app(scope, inbox.get, outbox.put))
+        connections.append((task, inbox, outbox))
+    # Wait until every connection is subscribed and has sent its headers and retry line
+    for task, inbox, outbox in connections:
+        await outbox.get()
+        await outbox.get()
+    return connections
+
+
+async def fan_out(broker, channel, connections):
+    started = time.perf_counter()
+    broker.publish(channel, events.Message('transaction', '{"id":"benchmark"}'))
+    for task, inbox, outbox in connections:
+        await outbox.get()
+    return (time.perf_counter() - started) * 1000
+
+
+async def run(count, cookie, channel):
+    app = EventStreamApp()
+    broker = events.get_broker()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    connections = await open_connections(app, cookie, count)
+    connect_s = time.perf_counter() - started
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    fan_out_ms = min([await fan_out(broker, channel, connections) for _ in range(5)])
+
+    for task, inbox, outbox in connections:
+        inbox.put_nowait({'type': 'http.disconnect'})
+    await asyncio.gather(*(task for task, inbox, outbox in connections))
+    return connect_s, held, fan_out_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=20000)
+    args = parser.parse_args()
+
+    with scratch_database():
+        user = User.objects.create_user(username='listener', password='benchmark-pass')
+        client = Client()
+        client.force_login(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'.encode()
+
+        connect_s, held, fan_out_ms = asyncio.run(run(args.connections, cookie, events.user_channel(user.id)))
+
+    print(f"{args.connections:,} idle SSE connections, one channel\n")
+    print_table(['metric', 'value'], [
+        ['connect (incl. session lookup)', f"{connect_s:.1f} s"],
+        ['memory held', f"{held / 1024 / 1024:,.1f} MiB"],
+        ['memory per connection', f"{held / args.connections / 1024:,.1f} KiB"],
+        ['fan-out of one event to all', f"{fan_out_ms:,.0f} ms"],
+    ])
+
+
+if __name__ == '__main__':
+    main()
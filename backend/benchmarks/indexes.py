@@ -0,0 +1,70 @@
+"""
+EXPLAIN plans and median timings of the hot wallet queries with and without
+the access-path indexes of migration wallet.0008.
+
+    python -m benchmarks.indexes --users 20000
+"""
+import argparse
+
+from benchmarks.common import add_seed_arguments, analyze, measure, print_table, scratch_database, seed
+
+from django.core.management import call_command  # noqa: E402
+
+from wallet.models import Wallet, Transaction, PiggyBank, PiggyBankContribution, PiggyBankMember  # noqa: E402
+
+
+BEFORE = '0007_journalentry_adjustment'
+AFTER = '0008_access_path_indexes'
+
+
+def hot_queries():
+    """Query shapes used by wallet.views, bound to a representative user, wallet and piggy bank"""
+    member = PiggyBankMember.objects.filter(is_active=True).select_related('piggy_bank').first()
+    user = member.user
+    wallet = Wallet.objects.filter(owner=user).first()
+    piggy_bank = member.piggy_bank
+    return {
+        'wallet list (owner, is_active)': lambda: Wallet.objects.filter(
+            owner=user, is_active=True).order_by('-created_at'),
+        'transaction page (wallet, -created_at)': lambda: Transaction.objects.filter(
+            wallet=wallet).order_by('-created_at', '-id')[:20],
+        'piggy banks created (creator, is_active)': lambda: PiggyBank.objects.filter(
+            creator=user, is_active=True).order_by('-created_at'),
+        'memberships (user, is_active)': lambda: PiggyBankMember.objects.filter(user=user, is_active=True),
+        'contributions (piggy_bank, -created_at)': lambda: PiggyBankContribution.objects.filter(
+            piggy_bank=piggy_bank).order_by('-created_at')[:20],
+        'payouts (reference_id)': lambda: Transaction.objects.filter(reference_id=str(piggy_bank.id)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_seed_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with scratch_database():
+        counts = seed(args.users, args.wallets_per_user, args.transactions_per_wallet, args.seed)
+        print("Seeded " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+        queries = hot_queries()
+
+        results = {name: {} for name in queries}
+        for label, target in (('before', BEFORE), ('after', AFTER)):
+            call_command('migrate', 'wallet', target, verbosity=0)
+            analyze()
+            for name, build in queries.items():
+                results[name][label] = (build().explain(), measure(lambda: list(build()), args.repeat))
+
+        print()
+        print_table(
+            ['query', 'before ms', 'after ms'],
+            [[name, f"{result['before'][1]:.3f}", f"{result['after'][1]:.3f}"] for name, result in results.items()]
+        )
+        for name, result in results.items():
+            print(f"\n== {name}")
+            for label in ('before', 'after'):
+                print(f"-- {label}\n{result[label][0]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Outbox dispatch throughput (wallet/outbox.py) for a few batch sizes and sinks.
+
+    python -m benchmarks.outbox --events 20000
+
+Each run writes --events pending OutboxEvent rows for the seeded
+transactions, then times Dispatcher.dispatch_batch() until the outbox is
+drained, so claiming, the per-wallet order check, delivery and the bulk
+UPDATE are all included.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import print_table, scratch_database, seed
+
+from wallet import outbox  # noqa: E402
+from wallet.models import OutboxEvent, Transaction  # noqa: E402
+
+
+def fill(transactions, count):
+    OutboxEvent.objects.all().delete()
+    events = [outbox.transaction_event(transactions[i % len(transactions)]) for i in range(count)]
+    OutboxEvent.objects.bulk_create(events, batch_size=5000)
+
+
+def drain(dispatcher):
+    started = time.perf_counter()
+    delivered = 0
+    while True:
+        count, claimed = dispatcher.dispatch_batch()
+        if not claimed:
+            return delivered, time.perf_counter() - started
+        delivered += count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=20000)
+    args = parser.parse_args()
+
+    with scratch_database(), tempfile.TemporaryDirectory() as directory:
+        seed(users=300, wallets_per_user=3, transactions_per_wallet=10)
+        transactions = list(Transaction.objects.order_by('created_at')[:args.events])
+        sinks = {
+            'callback': lambda: [outbox.CallbackSink(lambda messages: None)],
+            'file (fsync per batch)': lambda: [outbox.FileSink(os.path.join(directory, 'outbox.ndjson'))],
+        }
+
+        results = []
+        for name, build in sinks.items():
+            for batch_size in (100, 500, 1000):
+                fill(transactions, args.events)
+                delivered, seconds = drain(outbox.Dispatcher(build(), batch_size=batch_size))
+                results.append([name, batch_size, delivered, f"{seconds:.2f}", f"{delivered / seconds:,.0f}"])
+
+    print(f"Draining {args.events:,} pending events\n")
+    print_table(['sink', 'batch size', 'delivered', 'seconds', 'events/s'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Time to render and parse a 1,000-row transaction page with DRF's stdlib JSON
+renderer/parser and the orjson and MessagePack ones (api/renderers.py).
+
+    python -m benchmarks.renderers --rows 1000 --repeat 200
+
+The page is TransactionSerializer output, as the transaction list endpoint
+renders it; serializing it is timed too for scale.
+"""
+import argparse
+import time
+from io import BytesIO
+
+from benchmarks.common import print_table, scratch_database, seed
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api.parsers import ORJSONParser  # noqa: E402
+from api.renderers import MessagePackRenderer, ORJSONRenderer, msgpack  # noqa: E402
+from wallet.models import Transaction  # noqa: E402
+from wallet.serializers import TransactionSerializer  # noqa: E402
+
+
+def best_of(repeat, func):
+    """Fastest of repeat runs in microseconds; the minimum is the least noisy estimate"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with scratch_database():
+        seed(users=max(1, args.rows // 30 + 1), wallets_per_user=1, transactions_per_wallet=30)
+        transactions = list(
+            Transaction.objects.select_related('wallet__owner', 'related_wallet__owner')
+            .order_by('-created_at')[:args.rows]
+        )
+
+    serialize_us = best_of(max(1, args.repeat // 10), lambda: TransactionSerializer(transactions, many=True).data)
+    page = {'count': len(transactions), 'next': None, 'previous': None,
+            'results': TransactionSerializer(transactions, many=True).data}
+
+    renderers = [('json (stdlib)', JSONRenderer()), ('orjson', ORJSONRenderer())]
+    if msgpack is not None:
+        renderers.append(('msgpack', MessagePackRenderer()))
+    results = []
+    baseline = None
+    for name, renderer in renderers:
+        content = renderer.render(page)
+        microseconds = best_of(args.repeat, lambda: renderer.render(page))
+        baseline = baseline or microseconds
+        results.append(['render', name, f"{microseconds:,.0f}", f"{baseline / microseconds:.1f}x",
+                        f"{len(content) / 1024:,.0f}"])
+
+    body = JSONRenderer().render(page)
+    baseline = None
+    for name, json_parser in (('json (stdlib)', JSONParser()), ('orjson', ORJSONParser())):
+        microseconds = best_of(args.repeat, lambda: json_parser.parse(BytesIO(body)))
+        baseline = baseline or microseconds
+        results.append(['parse', name, f"{microseconds:,.0f}", f"{baseline / microseconds:.1f}x",
+                        f"{len(body) / 1024:,.0f}"])
+
+    print(f"Transaction page of {len(transactions)} rows; serializing it takes {serialize_us:,.0f} us\n")
+    print_table(['step', 'format', 'us', 'speedup', 'KiB'], results)
+    if msgpack is None:
+        print("\nmsgpack is not installed; MessagePack rendering skipped")
+
+
+if __name__ == '__main__':
+    main()
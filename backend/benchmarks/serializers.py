@@ -0,0 +1,69 @@
+"""
+Cost of building a transaction page and a wallet page with the DRF
+serializers versus the values()-based fast path (wallet/fast_serializers.py).
+
+    python -m benchmarks.serializers --rows 1000 --repeat 20
+
+For each, the fetch (model instances with select_related versus values_list
+rows) and the serialization are timed separately. Both produce the same data.
+"""
+import argparse
+import time
+
+from benchmarks.common import print_table, scratch_database, seed
+
+from wallet import fast_serializers  # noqa: E402
+from wallet.models import Transaction, Wallet  # noqa: E402
+from wallet.serializers import TransactionSerializer, WalletSerializer  # noqa: E402
+
+
+def best_of(repeat, func):
+    """(fastest run in milliseconds, result); the minimum is the least noisy estimate"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, result
+
+
+def compare(name, queryset, serializer_class, rows, serialize, repeat):
+    fetch_ms, instances = best_of(repeat, lambda: list(queryset.all()))
+    drf_ms, expected = best_of(repeat, lambda: serializer_class(instances, many=True).data)
+    values_ms, values = best_of(repeat, lambda: list(rows(queryset)))
+    fast_ms, data = best_of(repeat, lambda: serialize(values))
+    if data != expected:
+        raise AssertionError(f"Fast {name} serialization differs from {serializer_class.__name__}")
+    return [
+        [name, 'DRF serializer', len(instances), f"{fetch_ms:.1f}", f"{drf_ms:.1f}", f"{fetch_ms + drf_ms:.1f}"],
+        [name, 'values() fast path', len(values), f"{values_ms:.1f}", f"{fast_ms:.1f}", f"{values_ms + fast_ms:.1f}"],
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with scratch_database():
+        seed(users=args.rows // 3 + 1, wallets_per_user=3, transactions_per_wallet=1)
+        transactions = Transaction.objects.select_related('wallet__owner', 'related_wallet__owner').order_by(
+            '-created_at', '-id'
+        )[:args.rows]
+        wallets = Wallet.objects.select_related('owner').order_by('-created_at')[:args.rows]
+
+        results = compare(
+            'transactions', transactions, TransactionSerializer,
+            fast_serializers.transaction_rows, fast_serializers.serialize_transactions, args.repeat
+        ) + compare(
+            'wallets', wallets, WalletSerializer,
+            fast_serializers.wallet_rows, fast_serializers.serialize_wallets, args.repeat
+        )
+
+        print(f"Pages of {args.rows} rows, best of {args.repeat}\n")
+        print_table(['page', 'path', 'rows', 'fetch ms', 'serialize ms', 'total ms'], results)
+
+
+if __name__ == '__main__':
+    main()
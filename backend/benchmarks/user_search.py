@@ -0,0 +1,134 @@
+"""
+User search latency (users/search.py) on the in-memory index, compared with
+the icontains query it replaced.
+
+    python -m benchmarks.user_search --users 1000000
+
+The index is built from --users synthetic (id, username, email) rows rather
+than the database, since inserting a million users takes far longer than
+the benchmark. Queries are a mix of exact usernames, short and long
+prefixes, substrings of one user, substrings most users share (e.g.
+"exam"), two-character substrings and misses. The database rows are timed on a scratch
+table of --db-users users, as the full icontains scan grows linearly.
+"""
+import argparse
+import random
+import statistics
+import time
+import resource
+import uuid
+
+from benchmarks.common import print_table, scratch_database
+
+from django.db.models import Q  # noqa: E402
+
+from users import search  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+SYLLABLES = ['an', 'bel', 'car', 'dan', 'el', 'fi', 'go', 'ha', 'is', 'jo', 'ka', 'li', 'mo', 'na', 'or', 'pe',
+             'qu', 'ri', 'sa', 'to', 'ul', 'vi', 'wa', 'xe', 'yo', 'zu']
+DOMAINS = ['example.com', 'mail.test', 'corp.example', 'inbox.test']
+# Substrings of many users' values, whose trigrams are all common
+COMMON = ['exam', 'ample', '.com', 'mail', 'test', 'corp.', 'box.t']
+
+
+def rows(count, rng):
+    for i in range(count):
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) + str(i)
+        yield uuid.UUID(int=i), name, f'{name}.{rng.choice(SYLLABLES)}@{rng.choice(DOMAINS)}'
+
+
+def queries(count, rng):
+    samples = []
+    for i in range(count):
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(3)) + str(rng.randrange(count * 10))
+        kind = i % 7
+        if kind == 0:
+            samples.append(('exact', name))
+        elif kind == 1:
+            samples.append(('short prefix', name[:2]))
+        elif kind == 2:
+            samples.append(('prefix', name[:5]))
+        elif kind == 3:
+            samples.append(('substring', name[2:7]))
+        elif kind == 4:
+            samples.append(('common substring', rng.choice(COMMON + [f'.{syllable}@' for syllable in SYLLABLES])))
+        elif kind == 5:
+            samples.append(('short substring', name[3:5]))
+        else:
+            samples.append(('miss', 'qqq' + name))
+    return samples
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return (
+        f"{statistics.median(timings) * 1000:.3f}",
+        f"{timings[int(len(timings) * 0.99)] * 1000:.3f}",
+        f"{timings[-1] * 1000:.3f}",
+    )
+
+
+def time_queries(run, samples):
+    by_kind = {}
+    for kind, query in samples:
+        started = time.perf_counter()
+        run(query)
+        by_kind.setdefault(kind, []).append(time.perf_counter() - started)
+    return by_kind
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--db-users', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=5000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    data = list(rows(args.users, rng))
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    index = search.SearchIndex()
+    started = time.perf_counter()
+    index.build(data)
+    build_seconds = time.perf_counter() - started
+    # ru_maxrss is in KiB on Linux
+    memory = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) * 1024
+
+    samples = queries(args.queries, random.Random(1))
+    results = []
+    by_kind = time_queries(lambda query: index.search(query), samples)
+    for kind, timings in by_kind.items():
+        results.append([f'index, {args.users:,} users', kind, *percentiles(timings)])
+    results.append([f'index, {args.users:,} users', 'all', *percentiles(sum(by_kind.values(), []))])
+
+    started = time.perf_counter()
+    for i in range(1000):
+        index.update(uuid.UUID(int=i), f'renamed{i}', f'renamed{i}@example.com')
+    update_seconds = time.perf_counter() - started
+
+    with scratch_database():
+        User.objects.bulk_create(
+            [User(id=user_id, username=username, email=email) for user_id, username, email in data[:args.db_users]],
+            batch_size=5000
+        )
+        db_samples = samples[:200]
+
+        def icontains(query):
+            list(User.objects.filter(Q(username__icontains=query) | Q(email__icontains=query))[:10])
+
+        def ranked(query):
+            list(search.database_queryset(query)[:10])
+
+        for name, run in [('icontains (before)', icontains), ('ranked query', ranked)]:
+            timings = sum(time_queries(run, db_samples).values(), [])
+            results.append([f'database, {args.db_users:,} users', name, *percentiles(timings)])
+
+    print(f"Index build: {build_seconds:.1f}s, {memory / 2 ** 20:.0f} MiB ({memory / args.users:.0f} bytes/user); "
+          f"1,000 updates: {update_seconds:.2f}s\n")
+    print_table(['backend', 'queries', 'p50 ms', 'p99 ms', 'max ms'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Insert throughput and index size of a transaction-shaped table keyed by
+random uuid4 ids versus time-ordered uuid7 ids (wallet.ids.uuid7).
+
+    python -m benchmarks.uuid_keys --rows 1000000
+
+Each variant gets its own table with the primary key and a (wallet, created_at)
+index, filled in batches. Throughput is reported for the first and last tenth
+of the rows: random keys slow down as the primary key index outgrows the
+cache, time-ordered keys keep appending to its right edge.
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import print_table, scratch_database
+
+from django.db import connection, models  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from wallet.ids import uuid7  # noqa: E402
+
+
+class BenchRow(models.Model):
+    id = models.UUIDField(primary_key=True)
+    wallet_id = models.UUIDField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        abstract = True
+        app_label = 'benchmarks'
+
+
+class UUID4Row(BenchRow):
+    class Meta(BenchRow.Meta):
+        abstract = False
+        db_table = 'bench_uuid4_row'
+        indexes = [models.Index(fields=['wallet_id', 'created_at'], name='bench_uuid4_wallet_idx')]
+
+
+class UUID7Row(BenchRow):
+    class Meta(BenchRow.Meta):
+        abstract = False
+        db_table = 'bench_uuid7_row'
+        indexes = [models.Index(fields=['wallet_id', 'created_at'], name='bench_uuid7_wallet_idx')]
+
+
+VARIANTS = (('uuid4', UUID4Row, uuid.uuid4), ('uuid7', UUID7Row, uuid7))
+
+
+def index_bytes(table):
+    """Size of the table's indexes, where the backend can tell"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_indexes_size(%s)", [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT sum(pgsize) FROM dbstat WHERE name IN "
+                "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)", [table]
+            )
+        else:
+            return None
+        return cursor.fetchone()[0]
+
+
+def fill(model, make_id, rows, batch_size, wallets, random_seed):
+    """Insert rows in batches; returns (rows, seconds) per batch"""
+    rng = random.Random(random_seed)
+    wallet_ids = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(wallets)]
+    started_at = timezone.now() - timedelta(days=30)
+    timings = []
+    for offset in range(0, rows, batch_size):
+        batch = [
+            model(id=make_id(), wallet_id=rng.choice(wallet_ids), amount=Decimal(rng.randint(1, 50000)) / 100,
+                  created_at=started_at + timedelta(milliseconds=offset + i))
+            for i in range(min(batch_size, rows - offset))
+        ]
+        started = time.perf_counter()
+        model.objects.bulk_create(batch)
+        timings.append((len(batch), time.perf_counter() - started))
+    return timings
+
+
+def rate(timings):
+    count = sum(size for size, _ in timings)
+    return count / sum(seconds for _, seconds in timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--wallets', type=int, default=50_000)
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the generated data")
+    args = parser.parse_args()
+
+    with scratch_database():
+        results = []
+        for name, model, make_id in VARIANTS:
+            with connection.schema_editor() as editor:
+                editor.create_model(model)
+            timings = fill(model, make_id, args.rows, args.batch_size, args.wallets, args.seed)
+            tenth = max(1, len(timings) // 10)
+            size = index_bytes(model._meta.db_table)
+            results.append([
+                name, f"{sum(seconds for _, seconds in timings):.1f}", f"{rate(timings):,.0f}",
+                f"{rate(timings[:tenth]):,.0f}", f"{rate(timings[-tenth:]):,.0f}",
+                '-' if size is None else f"{size / 2 ** 20:.1f}",
+            ])
+            with connection.schema_editor() as editor:
+                editor.delete_model(model)
+
+        print(f"{args.rows} rows in batches of {args.batch_size} on {connection.vendor}\n")
+        print_table(['ids', 'seconds', 'rows/s', 'first 10% rows/s', 'last 10% rows/s', 'index MiB'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+"""
+Async version of the user search endpoint, served under ASGI
+"""
+from api.async_support import async_api_view, render
+from . import search, views
+from .serializers import UserSerializer
+
+
+@async_api_view(views.search_users)
+async def search_users(request):
+    """
+    Search users by username or email
+    """
+    query = request.GET.get('q', '').strip()
+    users = await search.asearch_users(query, exclude_id=request.user.id, limit=10)
+    return render(UserSerializer(users, many=True).data)
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+
+from wallet.migration_operations import AddIndexConcurrently
+
+
+TABLE = 'users_user'
+# icontains/istartswith/iexact compare UPPER(column) on PostgreSQL, so the trigram indexes are on that
+TRIGRAM_INDEXES = {
+    'user_username_trgm_idx': 'username',
+    'user_email_trgm_idx': 'email',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote_name = schema_editor.quote_name
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(name)} ON {quote_name(TABLE)} "
+            f"USING gin (UPPER({quote_name(column)}) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        # The trigram indexes are PostgreSQL-only expression indexes, so they are not in User.Meta
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['updated_at'], name='user_updated_at_idx'),
+        ),
+    ]
@@ -16,5 +16,11 @@ class User(AbstractUser):
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['email']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Lets users.search pick up changed users without scanning the table
+            models.Index(fields=['updated_at'], name='user_updated_at_idx'),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.email})"
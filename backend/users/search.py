@@ -0,0 +1,394 @@
+"""
+Ranked user search for search_users.
+
+A user matches a query of at least MIN_LENGTH characters when their username
+or email contains it, ignoring case. Results are ranked exact match, then
+prefix, then substring, and within a rank by the matching value (the smaller
+one when both match equally well).
+
+On PostgreSQL the search is one query served by the trigram GIN indexes on
+UPPER(username) and UPPER(email) (users migration 0002); two-character
+queries contain no trigram, so they scan the table there as the old
+icontains query did. Elsewhere, e.g. on SQLite where every query is a full
+table scan, each process keeps a SearchIndex: every lowercased username and
+email in one sorted list for exact and prefix matches, plus an array of
+internal ids per bigram and trigram for substring matches. It is built on
+first use (or at startup, see preload()), updated directly by registration
+and profile changes in this process, and every SYNC_INTERVAL seconds picks
+up users changed elsewhere through User.updated_at. It costs roughly 700
+bytes per user.
+
+A search checks at most VALUES_SCANNED substring candidates, so it takes a
+few milliseconds whatever the query. Candidates are checked in an order no
+match of theirs can sort before, stopping once no later one can do better,
+so results are exact unless that limit is reached: a query that matches few
+users although all of its n-grams are common may then return fewer than
+limit substring matches, though always the best ones.
+"""
+import bisect
+import threading
+import time
+from array import array
+from datetime import timedelta
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, CharField, F, IntegerField, Q, Value, When
+from django.db.models.functions import Least, Lower
+from django.utils import timezone
+
+from .models import User
+
+
+DEFAULTS = {
+    # 'auto' is 'database' on PostgreSQL and 'memory' elsewhere
+    'BACKEND': 'auto',
+    'SYNC_INTERVAL': 2,
+}
+
+MIN_LENGTH = 2
+TRIGRAM_LENGTH = 3
+# Substring candidates are the users in the posting lists of all of the query's n-grams. Lists
+# are intersected until at most CANDIDATES_CHECKED users are left, unless even the rarest has
+# more than INTERSECTED, in which case the sorted values are scanned instead, SCAN_CHUNK at a
+# time. Either way at most VALUES_SCANNED candidates or values are checked.
+CANDIDATES_CHECKED = 1000
+INTERSECTED = 20000
+VALUES_SCANNED = 5000
+SCAN_CHUNK = 1000
+EMPTY = array('I')
+# Changes committed this long before the last sync are picked up again, in case their
+# transactions were still open when it ran
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def get_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'USER_SEARCH', {})}[name]
+
+
+def use_memory_index():
+    backend = get_setting('BACKEND')
+    if backend == 'auto':
+        return connection.vendor != 'postgresql'
+    return backend == 'memory'
+
+
+def ngrams(text, length):
+    return {text[i:i + length] for i in range(len(text) - length + 1)}
+
+
+def value_grams(text):
+    """The bigrams and trigrams a value is indexed under"""
+    return ngrams(text, MIN_LENGTH) | ngrams(text, TRIGRAM_LENGTH)
+
+
+def order_code(value):
+    """An integer that sorts like value, from the first 8 bytes of its UTF-8"""
+    return int.from_bytes(value.encode()[:8].ljust(8, b'\0'), 'big')
+
+
+def query_grams(query):
+    """N-grams every value containing query is indexed under: the query itself or its trigrams"""
+    return ngrams(query, min(len(query), TRIGRAM_LENGTH))
+
+
+def rank(value, query):
+    """0 exact, 1 prefix, 2 substring, None for no match; value and query lowercased"""
+    if value == query:
+        return 0
+    if value.startswith(query):
+        return 1
+    if query in value:
+        return 2
+    return None
+
+
+def sort_key(username, email, query):
+    """(rank, matching value) for a user, or None when they do not match"""
+    ranked = [(r, value) for value in (username, email) if (r := rank(value, query)) is not None]
+    return min(ranked) if ranked else None
+
+
+class SearchIndex:
+    """
+    In-memory username/email index of one process. Reads and writes take a
+    lock; a changed user gets a new internal id and the old one is left as a
+    tombstone until the index is compacted.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            # Internal id -> user id (None once replaced), username and email
+            self.user_ids = []
+            self.usernames = []
+            self.emails = []
+            # order_code() of the smaller of each user's username and email
+            self.codes = array('Q')
+            self.positions = {}
+            # Every username and email, sorted, with the internal id each belongs to
+            self.keys = []
+            self.key_ids = array('I')
+            self.postings = {}
+            self.tombstones = 0
+            self.synced_at = None
+            self.ready = False
+
+    def build(self, rows=None):
+        """
+        Load (id, username, email) rows, all users by default, replacing
+        the current contents
+        """
+        started = timezone.now()
+        if rows is None:
+            rows = User.objects.values_list('id', 'username', 'email').iterator(chunk_size=10000)
+        with self.lock:
+            self.clear()
+            for user_id, username, email in rows:
+                self._append(user_id, username.lower(), email.lower())
+            self._sort_keys()
+            self.synced_at = started
+            self.ready = True
+
+    def _append(self, user_id, username, email):
+        internal_id = len(self.user_ids)
+        self.user_ids.append(user_id)
+        self.usernames.append(username)
+        self.emails.append(email)
+        self.codes.append(order_code(min(username, email)))
+        self.positions[user_id] = internal_id
+        for gram in value_grams(username) | value_grams(email):
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array('I')
+            posting.append(internal_id)
+        return internal_id
+
+    def _sort_keys(self):
+        keys = sorted(
+            (value, internal_id)
+            for internal_id, user_id in enumerate(self.user_ids) if user_id is not None
+            for value in (self.usernames[internal_id], self.emails[internal_id])
+        )
+        self.keys = [value for value, _ in keys]
+        self.key_ids = array('I', (internal_id for _, internal_id in keys))
+        self.tombstones = 0
+
+    def compact(self):
+        """Rebuild from the live entries, dropping tombstones"""
+        with self.lock:
+            live = [
+                (user_id, self.usernames[internal_id], self.emails[internal_id])
+                for internal_id, user_id in enumerate(self.user_ids) if user_id is not None
+            ]
+            synced_at = self.synced_at
+            self.clear()
+            for row in live:
+                self._append(*row)
+            self._sort_keys()
+            self.synced_at = synced_at
+            self.ready = True
+
+    def update(self, user_id, username, email):
+        """Add a user or replace their entry"""
+        username, email = username.lower(), email.lower()
+        with self.lock:
+            current = self.positions.get(user_id)
+            if current is not None:
+                if (self.usernames[current], self.emails[current]) == (username, email):
+                    return
+                self.user_ids[current] = None
+                self.tombstones += 1
+            internal_id = self._append(user_id, username, email)
+            for value in (username, email):
+                position = bisect.bisect_left(self.keys, value)
+                self.keys.insert(position, value)
+                self.key_ids.insert(position, internal_id)
+            if self.tombstones > max(1000, len(self.positions) // 4):
+                self.compact()
+
+    def sync(self):
+        """Apply users changed since the last sync, e.g. through other processes"""
+        started = timezone.now()
+        changed = User.objects.filter(updated_at__gte=self.synced_at - SYNC_OVERLAP).values_list(
+            'id', 'username', 'email'
+        )
+        with self.lock:
+            for user_id, username, email in changed:
+                self.update(user_id, username, email)
+            self.synced_at = started
+
+    def search(self, query, exclude_id=None, limit=10):
+        """Ids of the best limit users matching query, best first"""
+        query = query.lower()
+        with self.lock:
+            results = []
+            seen = set()
+            # Exact and prefix matches, in order of the matching value
+            position = bisect.bisect_left(self.keys, query)
+            while position < len(self.keys) and len(results) < limit:
+                if not self.keys[position].startswith(query):
+                    break
+                user_id = self.user_ids[self.key_ids[position]]
+                position += 1
+                if user_id is None or user_id == exclude_id or user_id in seen:
+                    continue
+                seen.add(user_id)
+                results.append(user_id)
+            if len(results) == limit:
+                return results
+
+            # Substring matches: every one is in the posting list of each of the query's n-grams
+            postings = sorted((self.postings.get(gram, EMPTY) for gram in query_grams(query)), key=len)
+            if len(postings[0]) > INTERSECTED:
+                return self._scan_keys(query, exclude_id, limit, results, seen)
+            # Posting lists are sorted by internal id
+            candidates = np.frombuffer(postings[0], dtype=np.uintc)
+            for posting in postings[1:]:
+                if len(candidates) <= CANDIDATES_CHECKED:
+                    break
+                other = np.frombuffer(posting, dtype=np.uintc)
+                found = np.minimum(np.searchsorted(other, candidates), len(other) - 1)
+                candidates = candidates[other[found] == candidates]
+
+            # Check candidates in order of their smaller value, before which none of their matches
+            # sorts, until the next one cannot beat the matches found
+            codes = np.frombuffer(self.codes, dtype=np.uint64)[candidates]
+            in_order = np.argsort(codes, kind='stable')[:VALUES_SCANNED]
+            usernames, emails = self.usernames, self.emails
+            need = limit - len(results)
+            matches = []
+            bound = None
+            for internal_id, code in zip(candidates[in_order].tolist(), codes[in_order].tolist()):
+                if bound is not None and code > bound:
+                    break
+                if query not in usernames[internal_id] and query not in emails[internal_id]:
+                    continue
+                user_id = self.user_ids[internal_id]
+                if user_id is None or user_id == exclude_id or user_id in seen:
+                    continue
+                bisect.insort(matches, (sort_key(usernames[internal_id], emails[internal_id], query), user_id))
+                if len(matches) > need:
+                    matches.pop()
+                if len(matches) == need:
+                    bound = order_code(matches[-1][0][1])
+            return results + [user_id for _, user_id in matches]
+
+    def _scan_keys(self, query, exclude_id, limit, results, seen):
+        """
+        Add substring matches found by scanning the sorted values in order, for
+        queries whose n-grams are all too common to intersect: such matches are
+        usually common too, and a user's first matching value is their smallest
+        """
+        keys = self.keys
+        for start in range(0, min(len(keys), VALUES_SCANNED), SCAN_CHUNK):
+            for position in [
+                position for position in range(start, min(start + SCAN_CHUNK, len(keys)))
+                if query in keys[position]
+            ]:
+                user_id = self.user_ids[self.key_ids[position]]
+                if user_id is None or user_id == exclude_id or user_id in seen:
+                    continue
+                seen.add(user_id)
+                results.append(user_id)
+                if len(results) == limit:
+                    return results
+        return results
+
+
+_index = SearchIndex()
+_sync_lock = threading.Lock()
+_last_sync = 0.0
+
+
+def get_index():
+    """The process's index, built on first use and synced every SYNC_INTERVAL seconds"""
+    global _last_sync
+    if not _index.ready:
+        with _sync_lock:
+            if not _index.ready:
+                _index.build()
+                _last_sync = time.monotonic()
+    elif time.monotonic() - _last_sync > get_setting('SYNC_INTERVAL') and _sync_lock.acquire(blocking=False):
+        try:
+            _index.sync()
+            _last_sync = time.monotonic()
+        finally:
+            _sync_lock.release()
+    return _index
+
+
+def preload():
+    """Build the index in a background thread, so the first search does not wait for it"""
+    if use_memory_index():
+        threading.Thread(target=get_index, daemon=True, name='user-search-index').start()
+
+
+def index_user(user):
+    """Reflect a registration or profile change in this process's index once it commits"""
+    user_id, username, email = user.id, user.username, user.email
+
+    def update():
+        if _index.ready:
+            _index.update(user_id, username, email)
+
+    transaction.on_commit(update)
+
+
+def reset():
+    """Drop this process's index; the next search rebuilds it (tests)"""
+    _index.clear()
+
+
+def database_queryset(query):
+    """Matching users ranked in the database; uses the trigram indexes on PostgreSQL"""
+    def ranked(field):
+        return Case(
+            When(**{f'{field}__iexact': query}, then=Value(0)),
+            When(**{f'{field}__istartswith': query}, then=Value(1)),
+            When(**{f'{field}__icontains': query}, then=Value(2)),
+            default=Value(3),
+            output_field=IntegerField(),
+        )
+
+    return User.objects.filter(Q(username__icontains=query) | Q(email__icontains=query)).annotate(
+        username_rank=ranked('username'),
+        email_rank=ranked('email'),
+    ).annotate(
+        search_rank=Least('username_rank', 'email_rank'),
+        search_key=Case(
+            When(username_rank__lt=F('email_rank'), then=Lower('username')),
+            When(email_rank__lt=F('username_rank'), then=Lower('email')),
+            default=Least(Lower('username'), Lower('email')),
+            output_field=CharField(),
+        ),
+    ).order_by('search_rank', 'search_key', 'id')
+
+
+def search_users(query, exclude_id=None, limit=10):
+    """Users matching query, best first, without exclude_id"""
+    if len(query) < MIN_LENGTH:
+        return []
+    if not use_memory_index():
+        return list(database_queryset(query).exclude(id=exclude_id)[:limit])
+    user_ids = get_index().search(query, exclude_id, limit)
+    users = User.objects.in_bulk(user_ids)
+    # Users deleted since they were indexed drop out here
+    return [users[user_id] for user_id in user_ids if user_id in users]
+
+
+async def asearch_users(query, exclude_id=None, limit=10):
+    """search_users() for async views"""
+    if len(query) < MIN_LENGTH:
+        return []
+    if not use_memory_index():
+        return [user async for user in database_queryset(query).exclude(id=exclude_id)[:limit]]
+    # Building or syncing the index queries the database
+    index = await sync_to_async(get_index)()
+    user_ids = index.search(query, exclude_id, limit)
+    users = await User.objects.ain_bulk(user_ids)
+    return [users[user_id] for user_id in user_ids if user_id in users]
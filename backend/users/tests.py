@@ -1,7 +1,11 @@
+import random
+import uuid
+
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
+from . import search
 from .models import User
 
 
@@ -139,3 +143,97 @@ class UserAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['username'], 'testuser')
         self.assertEqual(response.data['email'], 'test@example.com')
+
+
+class UserSearchTest(APITestCase):
+    """Test cases for the ranked user search"""
+
+    def setUp(self):
+        search.reset()
+        self.addCleanup(search.reset)
+        self.user = User.objects.create_user(username='searcher', email='searcher@example.com', password='testpass123')
+        for username, email in [
+            ('annabel', 'bell@example.com'),
+            ('ann', 'ann.other@example.com'),
+            ('joanna', 'jo@example.com'),
+            ('bob', 'annie@example.org'),
+            ('carl', 'carl@example.com'),
+        ]:
+            User.objects.create_user(username=username, email=email, password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('user-search')
+
+    def usernames(self, query):
+        response = self.client.get(self.url, {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user['username'] for user in response.data]
+
+    def test_ranking(self):
+        """Test exact matches come first, then prefix, then substring matches"""
+        for backend in ('memory', 'database'):
+            with self.subTest(backend=backend), self.settings(USER_SEARCH={'BACKEND': backend}):
+                self.assertEqual(self.usernames('ANN'), ['ann', 'annabel', 'bob', 'joanna'])
+                self.assertEqual(self.usernames('bell'), ['annabel'])
+                self.assertEqual(self.usernames('example.org'), ['bob'])
+
+    def test_short_queries(self):
+        """Test one-character queries return nothing and two-character ones match substrings too"""
+        for backend in ('memory', 'database'):
+            with self.subTest(backend=backend), self.settings(USER_SEARCH={'BACKEND': backend}):
+                self.assertEqual(self.usernames('a'), [])
+                self.assertEqual(self.usernames('nn'), ['ann', 'annabel', 'bob', 'joanna'])
+                self.assertEqual(self.usernames('jo'), ['joanna'])
+
+    def test_excludes_current_user(self):
+        """Test the searching user is not in their own results"""
+        self.assertEqual(self.usernames('searcher'), [])
+
+    def test_index_follows_registration_and_profile_changes(self):
+        """Test users registered or renamed after the index was built are found"""
+        self.assertEqual(self.usernames('zed'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('user-register'), {
+                'username': 'zedd',
+                'email': 'zedd@example.com',
+                'password': 'newpass123',
+                'password_confirm': 'newpass123',
+            })
+            response = self.client.patch(reverse('user-profile'), {'username': 'zebra'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.usernames('zed'), ['zedd'])
+
+        self.client.force_authenticate(user=User.objects.get(username='carl'))
+        self.assertEqual(self.usernames('zeb'), ['zebra'])
+        self.assertEqual(self.usernames('searcher'), ['zebra'])
+
+
+class SearchIndexTest(TestCase):
+    """Test cases for the in-memory search index at a size where searches are bounded"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = random.Random(0)
+        syllables = ['an', 'bel', 'car', 'dan', 'el', 'fi', 'go', 'ha']
+        cls.rows = []
+        for i in range(50000):
+            name = ''.join(rng.choice(syllables) for _ in range(2)) + str(i)
+            cls.rows.append((uuid.UUID(int=i), name, f'{name}@{rng.choice(["example.com", "mail.test"])}'))
+        cls.index = search.SearchIndex()
+        cls.index.build(cls.rows)
+
+    def expected(self, query, exclude_id=None):
+        ranked = sorted(
+            (key, user_id) for user_id, username, email in self.rows
+            if user_id != exclude_id and (key := search.sort_key(username, email, query)) is not None
+        )
+        return [user_id for _, user_id in ranked[:10]]
+
+    def test_results_match_a_full_scan(self):
+        """Test rare, intersected, common and two-character queries return the best matches in order"""
+        # 'example' is in half the users, so it is answered by scanning the sorted values
+        for query in ['example', 'mail.t', 'anbel1', 'el12', 'l123', '4999', 'fi7@', '12', 'l.', 'a1', 'zz']:
+            with self.subTest(query=query):
+                self.assertEqual(self.index.search(query), self.expected(query))
+        excluded = self.expected('example')[0]
+        self.assertEqual(self.index.search('example', excluded), self.expected('example', excluded))
@@ -6,9 +6,8 @@ from django.contrib.auth import login, logout
 from django.middleware.csrf import get_token
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils.decorators import method_decorator
-from django.db import models
 from drf_spectacular.utils import extend_schema
-from .models import User
+from . import search
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserSerializer
 
 
@@ -40,6 +39,7 @@ def register(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.save()
+        search.index_user(user)
         user_serializer = UserSerializer(user)
         return Response(user_serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -96,6 +96,9 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+    def perform_update(self, serializer):
+        search.index_user(serializer.save())
+
 
 @extend_schema(
     responses={200: UserSerializer(many=True)},
@@ -105,17 +108,12 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
 @permission_classes([IsAuthenticated])
 def search_users(request):
     """
-    Search users by username or email
+    Search users by username or email; exact matches first, then prefix, then substring
     """
     query = request.GET.get('q', '').strip()
 
-    if len(query) < 2:
-        return Response([], status=status.HTTP_200_OK)
-
-    # Search users by username or email, exclude current user
-    users = User.objects.filter(
-        models.Q(username__icontains=query) | models.Q(email__icontains=query)
-    ).exclude(id=request.user.id)[:10]  # Limit to 10 results
+    # Exclude current user, limit to 10 results
+    users = search.search_users(query, exclude_id=request.user.id, limit=10)
 
     serializer = UserSerializer(users, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Wallet, Transaction, PiggyBank, PiggyBankContribution, PiggyBankMember
+from .models import (
+    Wallet, Transaction, PiggyBank, PiggyBankContribution, PiggyBankMember, IdempotencyKey,
+    JournalEntry, Posting, BalanceCheckpoint, ArchivedTransactionBatch, OutboxEvent
+)
 
 
 @admin.register(Wallet)
@@ -15,8 +18,8 @@ class WalletAdmin(admin.ModelAdmin):
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     """Admin configuration for Transaction model"""
-    list_display = ('transaction_type', 'amount', 'wallet', 'status', 'created_at')
-    list_filter = ('transaction_type', 'status', 'created_at')
+    list_display = ('transaction_type', 'amount', 'wallet', 'status', 'fraud_flagged', 'created_at')
+    list_filter = ('transaction_type', 'status', 'fraud_flagged', 'batch_fraud_flagged', 'created_at')
     search_fields = ('wallet__name', 'wallet__owner__username', 'description')
     readonly_fields = ('id', 'created_at', 'updated_at')
     ordering = ('-created_at',)
@@ -50,3 +53,99 @@ class PiggyBankMemberAdmin(admin.ModelAdmin):
     search_fields = ('piggy_bank__name', 'user__username')
     readonly_fields = ('id', 'invited_at')
     ordering = ('-invited_at',)
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    """Admin configuration for IdempotencyKey model"""
+    list_display = ('key', 'user', 'response_status', 'created_at')
+    list_filter = ('response_status', 'created_at')
+    search_fields = ('key', 'user__username')
+    readonly_fields = ('id', 'request_hash', 'response_status', 'response_body', 'created_at')
+    ordering = ('-created_at',)
+
+
+class PostingInline(admin.TabularInline):
+    """Read-only legs of a journal entry"""
+    model = Posting
+    fields = ('account', 'amount')
+    readonly_fields = ('account', 'amount')
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(JournalEntry)
+class JournalEntryAdmin(admin.ModelAdmin):
+    """Admin configuration for JournalEntry model; the ledger is append-only"""
+    list_display = ('entry_type', 'description', 'transaction', 'created_at')
+    list_filter = ('entry_type', 'created_at')
+    search_fields = ('description', 'postings__account')
+    readonly_fields = ('id', 'entry_type', 'description', 'transaction', 'created_at')
+    inlines = [PostingInline]
+    ordering = ('-created_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BalanceCheckpoint)
+class BalanceCheckpointAdmin(admin.ModelAdmin):
+    """Admin configuration for BalanceCheckpoint model"""
+    list_display = ('account', 'balance', 'as_of', 'created_at')
+    list_filter = ('as_of',)
+    search_fields = ('account',)
+    readonly_fields = ('id', 'account', 'as_of', 'balance', 'created_at')
+    ordering = ('-as_of',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedTransactionBatch)
+class ArchivedTransactionBatchAdmin(admin.ModelAdmin):
+    """Admin configuration for ArchivedTransactionBatch model"""
+    list_display = ('wallet', 'month', 'row_count', 'net', 'created_at')
+    list_filter = ('month',)
+    search_fields = ('wallet__name', 'wallet__owner__username')
+    exclude = ('payload',)
+    readonly_fields = ('id', 'wallet', 'month', 'row_count', 'net', 'reference_totals', 'created_at')
+    ordering = ('-month',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    """Admin configuration for OutboxEvent model"""
+    list_display = ('id', 'event_type', 'wallet_id', 'created_at', 'attempts', 'dispatched_at')
+    list_filter = ('event_type', 'dispatched_at')
+    search_fields = ('wallet_id', 'last_error')
+    readonly_fields = (
+        'id', 'event_type', 'wallet_id', 'payload', 'created_at', 'available_at', 'attempts', 'last_error',
+        'dispatched_at'
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,182 @@
+"""
+Cold storage for old transactions.
+
+archive_month() moves one calendar month out of the Transaction table into
+ArchivedTransactionBatch rows, one per wallet, each holding the month's rows
+as zlib-compressed JSON plus the totals balance checks need (net of completed
+rows, completed piggy bank payouts by reference). On PostgreSQL the month's
+partition is then dropped, which is far cheaper than deleting its rows.
+
+Statements read archived rows back through archived_rows() and
+archived_net_before(); reconciliation adds the stored totals.
+"""
+import json
+import uuid
+import zlib
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils.dateparse import parse_datetime
+
+from . import partitions
+from .models import Transaction, ArchivedTransactionBatch
+
+
+# Order of the values in each archived row; the wallet is stored on the batch
+ARCHIVE_COLUMNS = (
+    'id', 'created_at', 'updated_at', 'transaction_type', 'status', 'amount', 'description',
+    'reference_id', 'related_wallet_id', 'related_transaction_id', 'fraud_score', 'fraud_flagged',
+)
+
+ZERO = Decimal('0.00')
+
+
+def _signed(transaction_type, amount):
+    if transaction_type in Transaction.CREDIT_TYPES:
+        return amount
+    if transaction_type in Transaction.DEBIT_TYPES:
+        return -amount
+    return ZERO
+
+
+def _encode(value):
+    # Unlike DjangoJSONEncoder, keeps microseconds, which order rows within a wallet
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f"Cannot archive {type(value).__name__}")
+
+
+def _make_batch(wallet_id, month, rows):
+    record = dict.fromkeys(ARCHIVE_COLUMNS)
+    net = ZERO
+    reference_totals = {}
+    for row in rows:
+        record.update(zip(ARCHIVE_COLUMNS, row))
+        if record['status'] != 'COMPLETED':
+            continue
+        net += _signed(record['transaction_type'], record['amount'])
+        if record['transaction_type'] == 'TRANSFER_IN' and record['reference_id']:
+            reference = record['reference_id']
+            reference_totals[reference] = reference_totals.get(reference, ZERO) + record['amount']
+    payload = zlib.compress(json.dumps(rows, default=_encode, separators=(',', ':')).encode())
+    return ArchivedTransactionBatch(
+        wallet_id=wallet_id, month=month, row_count=len(rows), net=net,
+        reference_totals={reference: str(total) for reference, total in reference_totals.items()},
+        payload=payload
+    )
+
+
+def archive_month(month, chunk_size=5000, batch_size=500):
+    """
+    Move every transaction created in the given month into the archive.
+    Returns the number of rows moved.
+    """
+    start, end = partitions.month_bounds(month)
+    rows = Transaction.objects.filter(created_at__gte=start, created_at__lt=end).order_by(
+        'wallet_id', 'created_at', 'id'
+    ).values_list('wallet_id', *ARCHIVE_COLUMNS)
+
+    archived = 0
+    with transaction.atomic():
+        batches = []
+        for wallet_id, group in groupby(rows.iterator(chunk_size=chunk_size), key=itemgetter(0)):
+            batch = _make_batch(wallet_id, month, [row[1:] for row in group])
+            batches.append(batch)
+            archived += batch.row_count
+            if len(batches) >= batch_size:
+                ArchivedTransactionBatch.objects.bulk_create(batches)
+                batches = []
+        ArchivedTransactionBatch.objects.bulk_create(batches)
+
+        partitions.drop_partition(month)
+        # Raw DELETE: the rows now live in the archive, so the ORM's cascade to
+        # contributions and SET_NULL on journal entries must not run. On
+        # PostgreSQL this only reaches rows that fell into the default partition.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(partitions.TABLE)} WHERE created_at >= %s AND created_at < %s",
+                [start, end]
+            )
+    return archived
+
+
+def months_before(cutoff):
+    """Months before the month containing cutoff that still have transactions, oldest first"""
+    start = partitions.month_bounds(partitions.month_start(cutoff))[0]
+    return [
+        value.date() for value in Transaction.objects.filter(created_at__lt=start).datetimes(
+            'created_at', 'month', tzinfo=dt_timezone.utc
+        )
+    ]
+
+
+def _decode(batch):
+    for values in json.loads(zlib.decompress(batch.payload)):
+        record = dict(zip(ARCHIVE_COLUMNS, values))
+        record['id'] = uuid.UUID(record['id'])
+        record['created_at'] = parse_datetime(record['created_at'])
+        record['amount'] = Decimal(record['amount'])
+        if record['related_wallet_id'] is not None:
+            record['related_wallet_id'] = uuid.UUID(record['related_wallet_id'])
+        yield record
+
+
+def archived_rows(wallet, since=None, until=None):
+    """
+    Archived transactions of a wallet as dicts keyed by ARCHIVE_COLUMNS,
+    oldest first, optionally limited to [since, until)
+    """
+    batches = ArchivedTransactionBatch.objects.filter(wallet=wallet)
+    if since is not None:
+        batches = batches.filter(month__gte=partitions.month_start(since))
+    if until is not None:
+        batches = batches.filter(month__lte=partitions.month_start(until))
+    for _, month_batches in groupby(batches.order_by('month', 'created_at').iterator(), key=lambda b: b.month):
+        # A month archived in more than one run has several batches
+        records = sorted(
+            (record for batch in month_batches for record in _decode(batch)),
+            key=lambda record: (record['created_at'], record['id'])
+        )
+        for record in records:
+            if since is not None and record['created_at'] < since:
+                continue
+            if until is not None and record['created_at'] >= until:
+                continue
+            yield record
+
+
+def archived_net_before(wallet, since):
+    """Signed total of the wallet's archived completed transactions before since"""
+    month = partitions.month_start(since)
+    net = ArchivedTransactionBatch.objects.filter(wallet=wallet, month__lt=month).aggregate(total=Sum('net'))['total']
+    net = ZERO if net is None else net
+    for batch in ArchivedTransactionBatch.objects.filter(wallet=wallet, month=month):
+        for record in _decode(batch):
+            if record['status'] == 'COMPLETED' and record['created_at'] < since:
+                net += _signed(record['transaction_type'], record['amount'])
+    return net
+
+
+def archived_wallet_nets(chunk_size=5000):
+    """(wallet id, archived net) in wallet id order"""
+    rows = ArchivedTransactionBatch.objects.order_by('wallet_id').values('wallet_id').annotate(
+        net=Sum('net')
+    ).values_list('wallet_id', 'net')
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def archived_reference_totals():
+    """Completed archived payouts per reference id"""
+    totals = {}
+    for reference_totals in ArchivedTransactionBatch.objects.exclude(reference_totals={}).values_list(
+        'reference_totals', flat=True
+    ).iterator():
+        for reference, total in reference_totals.items():
+            totals[reference] = totals.get(reference, ZERO) + Decimal(total)
+    return totals
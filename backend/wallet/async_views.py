@@ -0,0 +1,208 @@
+"""
+Async versions of the busiest wallet endpoints, served under ASGI.
+
+Reads and lookups use the async ORM, so a request waiting on the database or
+on a slow client holds no worker thread. Django has no async transactions
+yet, so the balance-changing part of each write runs the same service
+function as the DRF view through sync_to_async, as does serializer validation
+that queries the database.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotModified
+from django.shortcuts import aget_object_or_404
+
+from api.async_support import async_api_view, render
+from . import fast_serializers, fraud, list_cache, membership, velocity, views
+from .models import Wallet, Transaction, PiggyBank
+from .pagination import AsyncPageNumberPagination, KeysetPagination
+from .services import InsufficientFunds, deposit_funds, transfer_funds, contribute_funds
+from .serializers import (
+    WalletSerializer, TransactionSerializer, DepositSerializer, TransferSerializer,
+    PiggyBankSerializer, PiggyBankContributionSerializer, PiggyBankContributeSerializer
+)
+
+
+async def paginated_data(request, queryset, serialize, paginator=None):
+    paginator = paginator or AsyncPageNumberPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    return paginator.get_paginated_response(serialize(page)).data
+
+
+async def paginated(request, queryset, serialize, paginator=None):
+    return render(await paginated_data(request, queryset, serialize, paginator))
+
+
+async def blocked(assessment, **fields):
+    """Record a movement fraud screening held or denied and build its response"""
+    txn = await Transaction.objects.acreate(
+        status=assessment.transaction_status, **fields, **assessment.transaction_fields()
+    )
+    response = await sync_to_async(views.fraud_blocked_response)(assessment, txn)
+    return render(response.data, response.status_code)
+
+
+async def record_velocity(method, *args):
+    """
+    Record a movement in the velocity store. The in-memory store only updates
+    a few counters, cheaper than a thread hop; other stores do I/O, so they
+    run on a thread instead of blocking the event loop.
+    """
+    store = velocity.get_store()
+    if getattr(store, 'process_local', False):
+        getattr(store, method)(*args)
+    else:
+        await sync_to_async(getattr(store, method), thread_sensitive=False)(*args)
+
+
+@async_api_view(views.WalletListCreateView.as_view())
+async def wallet_list(request):
+    """
+    List user's wallets
+    """
+    async def page_data():
+        queryset = Wallet.objects.filter(owner=request.user, is_active=True).select_related('owner')
+        return await paginated_data(request, fast_serializers.wallet_rows(queryset), fast_serializers.serialize_wallets)
+
+    data, etag = await list_cache.aconditional_page(request, request.user.id, page_data)
+    response = HttpResponseNotModified() if data is None else render(data)
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+@async_api_view(views.WalletDetailView.as_view())
+async def wallet_detail(request, pk):
+    """
+    Retrieve a wallet
+    """
+    wallet = await aget_object_or_404(
+        Wallet.objects.select_related('owner'), pk=pk, owner=request.user, is_active=True
+    )
+    return render(WalletSerializer(wallet, context={'request': request}).data)
+
+
+@async_api_view(views.WalletTransactionListView.as_view())
+async def wallet_transactions(request, wallet_id):
+    """
+    List transactions for a specific wallet
+    """
+    wallet = await aget_object_or_404(Wallet, id=wallet_id, owner=request.user, is_active=True)
+    queryset = views.wallet_transactions(wallet, request.query_params)
+    paginator = KeysetPagination() if views.wants_cursor(request.query_params) else None
+    return await paginated(
+        request, fast_serializers.transaction_rows(queryset), fast_serializers.serialize_transactions, paginator
+    )
+
+
+@async_api_view(views.PiggyBankListCreateView.as_view())
+async def piggybank_list(request):
+    """
+    List user's piggy banks
+    """
+    queryset = views.piggy_banks_by_id(await membership.aaccessible_ids(request.user.id))
+    return await paginated(
+        request, queryset, lambda page: PiggyBankSerializer(page, many=True, context={'request': request}).data
+    )
+
+
+@async_api_view(views.deposit_money, methods=('POST',))
+async def deposit_money(request, wallet_id):
+    """
+    Deposit money into a wallet
+    """
+    wallet = await aget_object_or_404(
+        Wallet.objects.select_related('owner'), id=wallet_id, owner=request.user, is_active=True
+    )
+    serializer = DepositSerializer(data=request.data)
+    if not serializer.is_valid():
+        return render(serializer.errors, 400)
+
+    amount = serializer.validated_data['amount']
+    description = serializer.validated_data.get('description', 'Wallet deposit')
+    txn = await sync_to_async(deposit_funds)(wallet, amount, description)
+    await record_velocity('record_deposit', wallet.id, request.user.id, amount)
+    return render(TransactionSerializer(txn).data)
+
+
+@async_api_view(views.transfer_money, methods=('POST',))
+async def transfer_money(request, wallet_id):
+    """
+    Transfer money from one wallet to another
+    """
+    sender_wallet = await aget_object_or_404(
+        Wallet.objects.select_related('owner'), id=wallet_id, owner=request.user, is_active=True
+    )
+    serializer = TransferSerializer(data=request.data)
+    if not await sync_to_async(serializer.is_valid)():
+        return render(serializer.errors, 400)
+
+    amount = serializer.validated_data['amount']
+    description = serializer.validated_data.get('description', 'Peer-to-peer transfer')
+    recipient_wallet = await aget_object_or_404(
+        Wallet.objects.select_related('owner'), id=serializer.validated_data['recipient_wallet_id'], is_active=True
+    )
+
+    # Cheap early exit; the conditional debit in transfer_funds is authoritative
+    if not sender_wallet.can_debit(amount):
+        return render({"error": "Insufficient balance"}, 400)
+
+    assessment = await fraud.aevaluate(fraud.ScoringEvent(
+        'transfer', request.user.id, sender_wallet.id, amount,
+        balance=sender_wallet.balance, counterparty_id=recipient_wallet.id,
+        wallet_created_at=sender_wallet.created_at
+    ))
+    if not assessment.allowed:
+        return await blocked(
+            assessment, wallet=sender_wallet, transaction_type='TRANSFER_OUT', amount=amount,
+            description=f"Transfer to {recipient_wallet.owner.username}: {description}",
+            related_wallet=recipient_wallet
+        )
+
+    try:
+        sender_txn = await sync_to_async(transfer_funds)(sender_wallet, recipient_wallet, amount, description, assessment)
+    except InsufficientFunds:
+        return render({"error": "Insufficient balance"}, 400)
+
+    await record_velocity('record_transfer', sender_wallet.id, request.user.id, recipient_wallet.id, amount)
+    return render(TransactionSerializer(sender_txn).data)
+
+
+@async_api_view(views.contribute_to_piggybank, methods=('POST',))
+async def contribute_to_piggybank(request, piggybank_id):
+    """
+    Contribute money to a piggy bank
+    """
+    piggy_bank = await aget_object_or_404(PiggyBank, id=piggybank_id, is_active=True)
+
+    if not await membership.acan_access(request.user, piggy_bank):
+        return render({"error": "You are not a member of this piggy bank"}, 403)
+
+    serializer = PiggyBankContributeSerializer(data=request.data, context={'request': request})
+    if not await sync_to_async(serializer.is_valid)():
+        return render(serializer.errors, 400)
+
+    amount = serializer.validated_data['amount']
+    wallet = await aget_object_or_404(
+        Wallet.objects.select_related('owner'), id=serializer.validated_data['wallet_id'],
+        owner=request.user, is_active=True
+    )
+    if not wallet.can_debit(amount):
+        return render({"error": "Insufficient balance in wallet"}, 400)
+
+    assessment = await fraud.aevaluate(fraud.ScoringEvent(
+        'piggybank_contribution', request.user.id, wallet.id, amount,
+        balance=wallet.balance, counterparty_id=piggy_bank.id, wallet_created_at=wallet.created_at
+    ))
+    if not assessment.allowed:
+        return await blocked(
+            assessment, wallet=wallet, transaction_type='PIGGYBANK_CONTRIBUTION', amount=amount,
+            description=f"Contribution to {piggy_bank.name}", reference_id=str(piggy_bank.id)
+        )
+
+    try:
+        contribution = await sync_to_async(contribute_funds)(piggy_bank, wallet, request.user, amount, assessment)
+    except InsufficientFunds:
+        return render({"error": "Insufficient balance in wallet"}, 400)
+
+    await record_velocity('record_transfer', wallet.id, request.user.id, piggy_bank.id, amount)
+    return render(PiggyBankContributionSerializer(contribution).data, 201)
@@ -0,0 +1,295 @@
+"""
+Publish/subscribe fan-out behind the event stream (wallet/streams.py).
+
+Money movements publish once their database transaction commits: every
+Transaction row goes to its wallet owner's channel (user:<id>) with the
+wallet's balance after the commit, and every contribution to its piggy bank's
+channel (piggybank:<id>) with the new total.
+
+A subscriber is a bounded queue read by one connection on an event loop.
+Publishing never blocks: a subscriber that falls QUEUE_SIZE messages behind
+loses the oldest and is told so, and should refetch over the REST API.
+Messages are encoded once and shared by every subscriber they reach.
+
+LocalBroker only reaches subscribers in the publishing process. With several
+worker processes on a host, SQLiteBroker relays events through a local SQLite
+file that each process polls while it has subscribers.
+"""
+import asyncio
+import functools
+import json
+import sqlite3
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from . import fast_serializers
+from .models import PiggyBank, Wallet
+
+
+DEFAULTS = {
+    'BACKEND': 'wallet.events.LocalBroker',
+    'OPTIONS': {},
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT': 15,
+}
+
+# event is the event name, data the JSON encoded payload
+Message = namedtuple('Message', ['event', 'data'])
+
+
+def get_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'EVENT_STREAM', {})}[name]
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def piggybank_channel(piggybank_id):
+    return f'piggybank:{piggybank_id}'
+
+
+class Subscriber:
+    """
+    Messages waiting for one connection. put() and close() run on its event loop.
+    """
+    __slots__ = ('channels', 'loop', 'queue', 'ready', 'overflowed', 'closed')
+
+    def __init__(self, channels, queue_size, loop):
+        self.channels = frozenset(channels)
+        self.loop = loop
+        self.queue = deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.overflowed = False
+        self.closed = False
+
+    def put(self, message):
+        if len(self.queue) == self.queue.maxlen:
+            self.overflowed = True
+        self.queue.append(message)
+        self.ready.set()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    async def get(self, timeout=None):
+        """
+        (messages, overflowed) queued since the last call, waiting up to
+        timeout seconds for the first; both are empty on a timeout
+        """
+        if not self.queue and not self.closed:
+            # A timer rather than asyncio.wait_for(), which costs a task per wait
+            timer = None if timeout is None else self.loop.call_later(timeout, self.ready.set)
+            try:
+                await self.ready.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+        self.ready.clear()
+        messages = list(self.queue)
+        self.queue.clear()
+        overflowed, self.overflowed = self.overflowed, False
+        return messages, overflowed
+
+
+def _deliver(subscribers, message):
+    for subscriber in subscribers:
+        subscriber.put(message)
+
+
+class LocalBroker:
+    """
+    In-process fan-out; publish() may be called from any thread
+    """
+    def __init__(self):
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, channels, queue_size=None, loop=None):
+        subscriber = Subscriber(
+            channels, queue_size or get_setting('QUEUE_SIZE'), loop or asyncio.get_running_loop()
+        )
+        with self.lock:
+            for channel in subscriber.channels:
+                self.channels.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            for channel in subscriber.channels:
+                subscribers = self.channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self.channels[channel]
+
+    def wants(self, channels):
+        """Whether publishing to any of these channels can reach a subscriber"""
+        return any(channel in self.channels for channel in channels)
+
+    def publish(self, channel, message):
+        self.dispatch(channel, message)
+
+    def dispatch(self, channel, message):
+        with self.lock:
+            subscribers = tuple(self.channels.get(channel, ()))
+        by_loop = {}
+        for subscriber in subscribers:
+            by_loop.setdefault(subscriber.loop, []).append(subscriber)
+        # One callback per event loop, however many of its connections are listening
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, group, message)
+            except RuntimeError:
+                # The loop has shut down; its subscribers are gone with it
+                pass
+
+
+class SQLiteBroker(LocalBroker):
+    """
+    Events relayed through a local SQLite file shared by all worker processes
+    on a host. A process starts one polling thread on its first subscription;
+    rows older than retention seconds are deleted as it goes.
+    """
+    def __init__(self, path='events.sqlite3', poll_interval=0.2, retention=60):
+        super().__init__()
+        self.path = str(path)
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.local = threading.local()
+        self.poller = None
+        self.stopped = threading.Event()
+        with self._connection() as connection:
+            connection.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS stream_event (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    published_at REAL NOT NULL
+                );
+            """)
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+        return connection
+
+    def wants(self, channels):
+        # Subscribers in other processes are not known here
+        return True
+
+    def publish(self, channel, message):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO stream_event (channel, event, data, published_at) VALUES (?, ?, ?, ?)",
+                (channel, message.event, message.data, time.time())
+            )
+
+    def subscribe(self, channels, queue_size=None, loop=None):
+        subscriber = super().subscribe(channels, queue_size, loop)
+        with self.lock:
+            if self.poller is None:
+                last_id = self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM stream_event").fetchone()[0]
+                self.poller = threading.Thread(target=self._poll, args=(last_id,), daemon=True)
+                self.poller.start()
+        return subscriber
+
+    def _poll(self, last_id):
+        connection = self._connection()
+        purged_at = time.monotonic()
+        while not self.stopped.wait(self.poll_interval):
+            if not self.channels:
+                last_id = connection.execute("SELECT COALESCE(MAX(id), ?) FROM stream_event", (last_id,)).fetchone()[0]
+                continue
+            for last_id, channel, event, data in connection.execute(
+                    "SELECT id, channel, event, data FROM stream_event WHERE id > ? ORDER BY id", (last_id,)
+            ).fetchall():
+                self.dispatch(channel, Message(event, data))
+            if time.monotonic() - purged_at > self.retention:
+                with connection:
+                    connection.execute("DELETE FROM stream_event WHERE published_at < ?", (time.time() - self.retention,))
+                purged_at = time.monotonic()
+
+    def close(self):
+        """Stop the polling thread"""
+        self.stopped.set()
+        if self.poller is not None:
+            self.poller.join()
+
+
+@functools.lru_cache(maxsize=None)
+def _build_broker(backend, options):
+    return import_string(backend)(**dict(options))
+
+
+def get_broker():
+    """Return the configured broker, shared within the process"""
+    config = {**DEFAULTS, **getattr(settings, 'EVENT_STREAM', {})}
+    return _build_broker(config['BACKEND'], tuple(sorted(config['OPTIONS'].items())))
+
+
+def encode(data):
+    return json.dumps(data, separators=(',', ':'))
+
+
+def _send_transactions(transactions):
+    broker = get_broker()
+    if not broker.wants({user_channel(txn.wallet.owner_id) for txn in transactions}):
+        return
+    balances = dict(Wallet.objects.filter(id__in={txn.wallet_id for txn in transactions}).values_list('id', 'balance'))
+    as_money = fast_serializers.money_formatter()
+    as_datetime = fast_serializers.datetime_formatter()
+    for txn in transactions:
+        broker.publish(user_channel(txn.wallet.owner_id), Message('transaction', encode({
+            'id': str(txn.id),
+            'wallet': str(txn.wallet_id),
+            'transaction_type': txn.transaction_type,
+            'amount': as_money(txn.amount),
+            'status': txn.status,
+            'description': txn.description,
+            'related_wallet': str(txn.related_wallet_id) if txn.related_wallet_id else None,
+            'created_at': as_datetime(txn.created_at),
+            'balance': as_money(balances[txn.wallet_id]) if txn.wallet_id in balances else None,
+        })))
+
+
+def _send_contribution(contribution):
+    broker = get_broker()
+    channel = piggybank_channel(contribution.piggy_bank_id)
+    if not broker.wants({channel}):
+        return
+    current_amount = PiggyBank.objects.filter(id=contribution.piggy_bank_id).values_list(
+        'current_amount', flat=True
+    ).first()
+    as_money = fast_serializers.money_formatter()
+    broker.publish(channel, Message('contribution', encode({
+        'id': str(contribution.id),
+        'piggy_bank': str(contribution.piggy_bank_id),
+        'contributor': contribution.contributor.username,
+        'wallet': str(contribution.wallet_id),
+        'amount': as_money(contribution.amount),
+        'created_at': fast_serializers.datetime_formatter()(contribution.created_at),
+        'current_amount': as_money(current_amount) if current_amount is not None else None,
+    })))
+
+
+def publish_transactions(transactions):
+    """
+    Push these Transaction rows to their wallet owners once the current
+    transaction commits. Each row's wallet must be loaded.
+    """
+    transaction.on_commit(functools.partial(_send_transactions, list(transactions)), robust=True)
+
+
+def publish_contribution(contribution):
+    """Push a piggy bank contribution to the piggy bank's channel once the current transaction commits"""
+    transaction.on_commit(functools.partial(_send_contribution, contribution), robust=True)
@@ -0,0 +1,111 @@
+"""
+Read-only fast path for the wallet and transaction list endpoints.
+
+Builds exactly what TransactionSerializer and WalletSerializer return, but
+straight from values_list() rows, without a model instance or a serializer
+field call per value. The DRF serializers remain the source of truth: they
+describe the schema, handle writes and validation, and the parity tests in
+wallet.tests hold these functions to their output.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+
+TRANSACTION_FIELDS = (
+    'id', 'wallet_id', 'wallet__owner__username', 'transaction_type', 'amount', 'status', 'description',
+    'reference_id', 'related_wallet_id', 'related_wallet__owner__username', 'created_at', 'updated_at',
+)
+
+WALLET_FIELDS = (
+    'id', 'owner_id', 'owner__username', 'owner__email', 'owner__phone_number', 'owner__created_at',
+    'name', 'balance', 'created_at', 'updated_at', 'is_active',
+)
+
+CENT = Decimal('0.01')
+
+
+def transaction_rows(queryset):
+    """Rows for serialize_transactions(); pagination reads created_at and id off them"""
+    return queryset.values_list(*TRANSACTION_FIELDS, named=True)
+
+
+def wallet_rows(queryset):
+    """Rows for serialize_wallets()"""
+    return queryset.values_list(*WALLET_FIELDS, named=True)
+
+
+def datetime_formatter():
+    """DateTimeField.to_representation for the current time zone"""
+    if not settings.USE_TZ or api_settings.DATETIME_FORMAT != ISO_8601:
+        return serializers.DateTimeField().to_representation
+    tz = timezone.get_current_timezone()
+
+    def to_representation(value):
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            return value[:-6] + 'Z'
+        return value
+    return to_representation
+
+
+def money_formatter():
+    """DecimalField(max_digits=12, decimal_places=2).to_representation"""
+    if not api_settings.COERCE_DECIMAL_TO_STRING:
+        return serializers.DecimalField(max_digits=12, decimal_places=2).to_representation
+    return lambda value: format(value.quantize(CENT), 'f')
+
+
+def serialize_transactions(rows):
+    """TransactionSerializer(many=True).data for rows from transaction_rows()"""
+    as_datetime = datetime_formatter()
+    as_money = money_formatter()
+    data = []
+    for (pk, wallet_id, wallet_owner, transaction_type, amount, status, description, reference_id,
+         related_wallet_id, related_wallet_owner, created_at, updated_at) in rows:
+        item = {
+            'id': str(pk),
+            'wallet': wallet_id,
+            'wallet_owner': wallet_owner,
+            'transaction_type': transaction_type,
+            'amount': as_money(amount),
+            'status': status,
+            'description': description,
+            'reference_id': reference_id,
+            'related_wallet': related_wallet_id,
+        }
+        # DRF leaves the field out, rather than null, when there is no related wallet
+        if related_wallet_id is not None:
+            item['related_wallet_owner'] = related_wallet_owner
+        item['created_at'] = as_datetime(created_at)
+        item['updated_at'] = as_datetime(updated_at)
+        data.append(item)
+    return data
+
+
+def serialize_wallets(rows):
+    """WalletSerializer(many=True).data for rows from wallet_rows()"""
+    as_datetime = datetime_formatter()
+    as_money = money_formatter()
+    return [
+        {
+            'id': str(pk),
+            'owner': {
+                'id': str(owner_id),
+                'username': username,
+                'email': email,
+                'phone_number': phone_number,
+                'created_at': as_datetime(owner_created_at),
+            },
+            'name': name,
+            'balance': as_money(balance),
+            'created_at': as_datetime(created_at),
+            'updated_at': as_datetime(updated_at),
+            'is_active': is_active,
+        }
+        for (pk, owner_id, username, email, phone_number, owner_created_at,
+             name, balance, created_at, updated_at, is_active) in rows
+    ]
@@ -0,0 +1,198 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import velocity
+
+
+logger = logging.getLogger(__name__)
+
+ALLOW = 'ALLOW'
+HOLD = 'HOLD'
+DENY = 'DENY'
+
+DEFAULTS = {
+    'SCORER': 'wallet.fraud.RuleBasedScorer',
+    'LATENCY_BUDGET_MS': 5,
+    'HOLD_THRESHOLD': 0.7,
+    'DENY_THRESHOLD': 0.9,
+    'WORKERS': 4,
+    'LARGE_AMOUNT': '10000.00',
+    'VELOCITY_LIMIT_1H': '50000.00',
+    'BURST_COUNT_60S': 5,
+    'RECIPIENTS_1H': 10,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'FRAUD_SCORING', {}).get(name, DEFAULTS[name])
+
+
+class ScoringEvent:
+    """
+    Everything a scorer may look at. Scorers must only use this and other
+    in-process state; they run under a hard latency budget and must not query the database.
+    features holds the sender's velocity counters (see wallet.velocity).
+    """
+    def __init__(self, kind, user_id, wallet_id, amount, balance=None, counterparty_id=None,
+                 wallet_created_at=None, features=None):
+        self.kind = kind
+        self.user_id = user_id
+        self.wallet_id = wallet_id
+        self.amount = amount
+        self.balance = balance
+        self.counterparty_id = counterparty_id
+        self.wallet_created_at = wallet_created_at
+        self.features = features
+        self.timestamp = timezone.now()
+
+
+class Assessment:
+    """
+    Result of screening one money movement
+    """
+    def __init__(self, decision, score, reasons=(), flagged=False):
+        self.decision = decision
+        self.score = score
+        self.reasons = list(reasons)
+        self.flagged = flagged
+
+    @property
+    def allowed(self):
+        return self.decision == ALLOW
+
+    @property
+    def transaction_status(self):
+        """Status for the Transaction recorded when the movement is not allowed"""
+        return 'PENDING' if self.decision == HOLD else 'FAILED'
+
+    def transaction_fields(self):
+        """Fraud columns to store on the Transaction row"""
+        return {'fraud_score': self.score, 'fraud_flagged': self.flagged}
+
+
+class BaseScorer:
+    """
+    Interface for fraud scorers: return (score between 0 and 1, list of reasons)
+    """
+    def score(self, event):
+        raise NotImplementedError
+
+
+class RuleBasedScorer(BaseScorer):
+    """
+    Small set of weighted rules over the event itself
+    """
+    def score(self, event):
+        score = 0.0
+        reasons = []
+
+        if event.amount >= Decimal(get_setting('LARGE_AMOUNT')):
+            score += 0.4
+            reasons.append('large_amount')
+
+        if event.balance and event.amount >= event.balance * Decimal('0.9'):
+            score += 0.3
+            reasons.append('drains_balance')
+
+        if event.wallet_created_at and timezone.now() - event.wallet_created_at < timedelta(days=1):
+            score += 0.2
+            reasons.append('new_wallet')
+
+        features = event.features or {}
+        if features.get('wallet_sent_1h', 0) + event.amount > Decimal(get_setting('VELOCITY_LIMIT_1H')):
+            score += 0.3
+            reasons.append('velocity_1h')
+
+        if features.get('wallet_sent_count_60s', 0) >= get_setting('BURST_COUNT_60S'):
+            score += 0.3
+            reasons.append('burst')
+
+        if features.get('wallet_recipients_1h', 0) >= get_setting('RECIPIENTS_1H'):
+            score += 0.3
+            reasons.append('many_recipients')
+
+        return min(score, 1.0), reasons
+
+
+@functools.lru_cache(maxsize=None)
+def _load_scorer(path):
+    return import_string(path)()
+
+
+@functools.lru_cache(maxsize=None)
+def _executor(workers):
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fraud-scoring')
+
+
+def _score(scorer, event):
+    if event.features is None:
+        event.features = velocity.get_store().features(event.wallet_id, event.user_id)
+    return scorer.score(event)
+
+
+def decide(score):
+    if score >= get_setting('DENY_THRESHOLD'):
+        return DENY
+    if score >= get_setting('HOLD_THRESHOLD'):
+        return HOLD
+    return ALLOW
+
+
+def evaluate(event):
+    """
+    Score an event within the configured latency budget.
+
+    Velocity features are looked up in-process and the scorer runs on a
+    small worker pool, both inside the budget, so a slow or failing scorer can be
+    abandoned: if no answer arrives within LATENCY_BUDGET_MS the movement is
+    allowed and flagged for review, so fraud checks never hold up transfers.
+    """
+    scorer = _load_scorer(get_setting('SCORER'))
+    budget = get_setting('LATENCY_BUDGET_MS') / 1000
+    started = time.perf_counter()
+
+    future = _executor(get_setting('WORKERS')).submit(_score, scorer, event)
+    try:
+        score, reasons = future.result(timeout=budget)
+    except TimeoutError:
+        future.cancel()
+        logger.warning("Fraud scoring exceeded %.1f ms budget for %s", budget * 1000, event.kind)
+        return Assessment(ALLOW, None, ['scoring_timeout'], flagged=True)
+    except Exception:
+        logger.exception("Fraud scorer failed for %s", event.kind)
+        return Assessment(ALLOW, None, ['scoring_error'], flagged=True)
+
+    logger.debug("Fraud scoring took %.2f ms", (time.perf_counter() - started) * 1000)
+    decision = decide(score)
+    return Assessment(decision, score, reasons, flagged=decision != ALLOW)
+
+
+async def aevaluate(event):
+    """
+    evaluate() for async views: the scorer still runs on the worker pool, but
+    the request waits on it without occupying a thread
+    """
+    scorer = _load_scorer(get_setting('SCORER'))
+    budget = get_setting('LATENCY_BUDGET_MS') / 1000
+
+    future = _executor(get_setting('WORKERS')).submit(_score, scorer, event)
+    try:
+        score, reasons = await asyncio.wait_for(asyncio.wrap_future(future), timeout=budget)
+    except TimeoutError:
+        logger.warning("Fraud scoring exceeded %.1f ms budget for %s", budget * 1000, event.kind)
+        return Assessment(ALLOW, None, ['scoring_timeout'], flagged=True)
+    except Exception:
+        logger.exception("Fraud scorer failed for %s", event.kind)
+        return Assessment(ALLOW, None, ['scoring_error'], flagged=True)
+
+    decision = decide(score)
+    return Assessment(decision, score, reasons, flagged=decision != ALLOW)
@@ -0,0 +1,438 @@
+"""
+Directed money-flow graph between wallets, built from completed TRANSFER_OUT rows.
+
+Edges are kept in flat NumPy arrays in created_at order, with wallets mapped
+to dense integer ids, so a refresh only appends the rows created since the
+last one and a time window is a slice found by binary search. A transfer can
+commit after newer ones were loaded, with an earlier created_at, so each
+refresh re-reads the last LEDGER_CHECKPOINT_LAG (see wallet.ledger) and skips
+the ids it has already loaded. Analyses run
+on a CSR (compressed sparse row) view of a window, where parallel edges
+between the same two wallets are merged and their amounts summed.
+"""
+import numpy as np
+
+from . import ledger
+from .models import Transaction
+
+
+class CSRGraph:
+    """
+    Adjacency of one time window: the recipients of node v are
+    indices[indptr[v]:indptr[v + 1]], with the summed amount and edge count in
+    weights and counts at the same positions
+    """
+    def __init__(self, size, indptr, indices, weights, counts):
+        self.size = size
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.counts = counts
+
+    @property
+    def sources(self):
+        """Sender of every edge, aligned with indices"""
+        return np.repeat(np.arange(self.size, dtype=np.int64), np.diff(self.indptr))
+
+    @property
+    def active(self):
+        """Nodes with at least one edge in the window"""
+        return (np.diff(self.indptr) > 0) | (np.bincount(self.indices, minlength=self.size) > 0)
+
+    @classmethod
+    def from_edges(cls, size, src, dst, amount):
+        keys = src.astype(np.int64) * size + dst
+        pairs, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        weights = np.bincount(inverse, weights=amount, minlength=len(pairs))
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // size, minlength=size), out=indptr[1:])
+        return cls(size, indptr, pairs % size, weights, counts)
+
+
+class TransferGraph:
+    """
+    Append-only edge store over all wallets that have sent or received a transfer
+    """
+    def __init__(self, capacity=1024, lag=None):
+        self.lag = ledger.get_checkpoint_lag() if lag is None else lag
+        self.wallet_index = {}
+        self.wallet_ids = []
+        self.length = 0
+        self.src = np.empty(capacity, dtype=np.int32)
+        self.dst = np.empty(capacity, dtype=np.int32)
+        self.amount = np.empty(capacity, dtype=np.float64)
+        self.timestamp = np.empty(capacity, dtype=np.float64)
+        # created_at of the newest row loaded, and the ids loaded within lag of it
+        self.newest = None
+        self.recent = {}
+
+    @property
+    def size(self):
+        return len(self.wallet_ids)
+
+    def node(self, wallet_id):
+        index = self.wallet_index.get(wallet_id)
+        if index is None:
+            index = self.wallet_index[wallet_id] = len(self.wallet_ids)
+            self.wallet_ids.append(wallet_id)
+        return index
+
+    def _reserve(self, extra):
+        needed = self.length + extra
+        if needed <= len(self.src):
+            return
+        capacity = max(needed, 2 * len(self.src))
+        for name in ('src', 'dst', 'amount', 'timestamp'):
+            array = getattr(self, name)
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self.length] = array[:self.length]
+            setattr(self, name, grown)
+
+    def append(self, edges):
+        """
+        Add (sender wallet id, recipient wallet id, amount, created_at) edges, oldest first
+        """
+        edges = list(edges)
+        self._reserve(len(edges))
+        start = self.length
+        for offset, (sender, recipient, amount, created_at) in enumerate(edges, start):
+            self.src[offset] = self.node(sender)
+            self.dst[offset] = self.node(recipient)
+            self.amount[offset] = amount
+            self.timestamp[offset] = created_at.timestamp()
+        self.length += len(edges)
+        return len(edges)
+
+    def refresh(self, since=None, chunk_size=10000):
+        """
+        Append transfers not loaded yet: on the first refresh those created
+        at or after since (all by default), afterwards those created from lag
+        before the newest loaded row on. Returns the number of new edges.
+        """
+        queryset = Transaction.objects.filter(
+            transaction_type='TRANSFER_OUT', status='COMPLETED', related_wallet__isnull=False
+        )
+        if self.newest is not None:
+            queryset = queryset.filter(created_at__gte=self.newest - self.lag)
+        elif since is not None:
+            queryset = queryset.filter(created_at__gte=since)
+        rows = queryset.order_by('created_at', 'id').values_list(
+            'wallet_id', 'related_wallet_id', 'amount', 'created_at', 'id'
+        ).iterator(chunk_size=chunk_size)
+
+        start = self.length
+        batch = []
+        for sender, recipient, amount, created_at, pk in rows:
+            if pk in self.recent:
+                continue
+            self.recent[pk] = created_at
+            self.newest = created_at if self.newest is None else max(self.newest, created_at)
+            batch.append((sender, recipient, amount, created_at))
+            if len(batch) >= chunk_size:
+                self.append(batch)
+                self._forget_before(self.newest - self.lag)
+                batch = []
+        self.append(batch)
+        if self.newest is not None:
+            self._forget_before(self.newest - self.lag)
+        self._sort_from(start)
+        return self.length - start
+
+    def _forget_before(self, horizon):
+        self.recent = {pk: created_at for pk, created_at in self.recent.items() if created_at >= horizon}
+
+    def _sort_from(self, start):
+        """Move late rows appended after start back into created_at order"""
+        if start == 0 or self.length == start:
+            return
+        earliest = self.timestamp[start:self.length].min()
+        cut = int(np.searchsorted(self.timestamp[:start], earliest, side='right'))
+        if cut == start:
+            return
+        order = np.argsort(self.timestamp[cut:self.length], kind='stable') + cut
+        for name in ('src', 'dst', 'amount', 'timestamp'):
+            array = getattr(self, name)
+            array[cut:self.length] = array[order]
+
+    def discard_before(self, before):
+        """Drop edges older than before to bound memory; wallet ids stay mapped"""
+        cut = int(np.searchsorted(self.timestamp[:self.length], before.timestamp(), side='left'))
+        for name in ('src', 'dst', 'amount', 'timestamp'):
+            array = getattr(self, name)
+            array[:self.length - cut] = array[cut:self.length]
+        self.length -= cut
+        return cut
+
+    def window(self, since=None, until=None):
+        """CSR view of the edges created in [since, until)"""
+        timestamps = self.timestamp[:self.length]
+        start = 0 if since is None else int(np.searchsorted(timestamps, since.timestamp(), side='left'))
+        stop = self.length if until is None else int(np.searchsorted(timestamps, until.timestamp(), side='left'))
+        window = slice(start, max(start, stop))
+        return CSRGraph.from_edges(self.size, self.src[window], self.dst[window], self.amount[window])
+
+
+def hub_scores(csr):
+    """
+    Fan-in/fan-out per node. Mule wallets receive from many senders and pass
+    most of it on, so the score grows with both distinct counterparty counts and
+    with how closely the amount sent out matches the amount received.
+    """
+    sources = csr.sources
+    fan_out = np.diff(csr.indptr)
+    fan_in = np.bincount(csr.indices, minlength=csr.size)
+    amount_out = np.bincount(sources, weights=csr.weights, minlength=csr.size)
+    amount_in = np.bincount(csr.indices, weights=csr.weights, minlength=csr.size)
+    larger = np.maximum(amount_in, amount_out)
+    pass_through = np.divide(np.minimum(amount_in, amount_out), larger, out=np.zeros(csr.size), where=larger > 0)
+    return {
+        'fan_in': fan_in,
+        'fan_out': fan_out,
+        'amount_in': amount_in,
+        'amount_out': amount_out,
+        'pass_through': pass_through,
+        'score': np.log1p(fan_in) * np.log1p(fan_out) * pass_through,
+    }
+
+
+def connected_components(csr):
+    """
+    Weakly connected component label per node (-1 for nodes without edges),
+    by min-label propagation with pointer jumping
+    """
+    sources, targets = csr.sources, csr.indices
+    labels = np.arange(csr.size, dtype=np.int64)
+    while True:
+        lowest = np.minimum(labels[sources], labels[targets])
+        updated = labels.copy()
+        np.minimum.at(updated, sources, lowest)
+        np.minimum.at(updated, targets, lowest)
+        # A label is always a node of the same component, so following labels stays inside it
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+
+    result = np.full(csr.size, -1, dtype=np.int64)
+    active = csr.active
+    result[active] = np.unique(labels[active], return_inverse=True)[1]
+    return result
+
+
+def _cyclic_candidates(csr, max_rounds=20):
+    """
+    Nodes left after repeatedly removing those with no incoming or no outgoing
+    edge; nothing removed can lie on a cycle
+    """
+    sources, targets = csr.sources, csr.indices
+    alive = csr.active
+    for _ in range(max_rounds):
+        live = alive[sources] & alive[targets]
+        keep = (alive
+                & (np.bincount(sources[live], minlength=csr.size) > 0)
+                & (np.bincount(targets[live], minlength=csr.size) > 0))
+        if np.array_equal(keep, alive):
+            break
+        alive = keep
+    return alive
+
+
+def strongly_connected_components(csr):
+    """
+    Strongly connected component label per node, -1 for nodes on no cycle.
+    Acyclic parts are trimmed with vectorised degree checks first, so the
+    iterative Tarjan pass only walks the (usually small) remainder.
+    """
+    alive = _cyclic_candidates(csr).tolist()
+    indptr = csr.indptr.tolist()
+    indices = csr.indices.tolist()
+    order = [-1] * csr.size
+    low = [0] * csr.size
+    on_stack = [False] * csr.size
+    labels = np.full(csr.size, -1, dtype=np.int64)
+    stack = []
+    counter = 0
+    component = 0
+
+    for root in range(csr.size):
+        if not alive[root] or order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, indptr[root])]
+        while work:
+            node, edge = work[-1]
+            end = indptr[node + 1]
+            descended = False
+            while edge < end:
+                target = indices[edge]
+                edge += 1
+                if not alive[target]:
+                    continue
+                if order[target] == -1:
+                    work[-1] = (node, edge)
+                    order[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = True
+                    work.append((target, indptr[target]))
+                    descended = True
+                    break
+                if on_stack[target] and order[target] < low[node]:
+                    low[node] = order[target]
+            if descended:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == order[node]:
+                members = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    members.append(member)
+                    if member == node:
+                        break
+                if len(members) > 1:
+                    labels[members] = component
+                    component += 1
+    return labels
+
+
+def _reverse(csr):
+    """Predecessor lists in CSR form: the senders to node v are indices[indptr[v]:indptr[v + 1]]"""
+    order = np.argsort(csr.indices, kind='stable')
+    indptr = np.zeros(csr.size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(csr.indices, minlength=csr.size), out=indptr[1:])
+    return indptr, csr.sources[order]
+
+
+def find_cycles(csr, max_length=6, limit=1000, labels=None, lookahead=2):
+    """
+    Simple cycles of at most max_length wallets, each reported once, starting
+    from its lowest node. The search stays inside one strongly connected
+    component, and its last lookahead steps only enter nodes that a reverse
+    search from the start showed can still close the cycle in time.
+    """
+    labels = strongly_connected_components(csr) if labels is None else labels
+    indptr = csr.indptr.tolist()
+    indices = csr.indices.tolist()
+    reverse_indptr, reverse_indices = (array.tolist() for array in _reverse(csr))
+    components = labels.tolist()
+    lookahead = min(lookahead, max_length - 1)
+    cycles = []
+    for start in np.flatnonzero(labels >= 0).tolist():
+        component = components[start]
+
+        # Hops from each nearby node back to start, over nodes eligible for this start
+        distance = {start: 0}
+        frontier = [start]
+        for hops in range(1, lookahead + 1):
+            reached = []
+            for node in frontier:
+                for sender in reverse_indices[reverse_indptr[node]:reverse_indptr[node + 1]]:
+                    if sender > start and sender not in distance and components[sender] == component:
+                        distance[sender] = hops
+                        reached.append(sender)
+            frontier = reached
+
+        path = [start]
+        cursors = [indptr[start]]
+        on_path = {start}
+        while path:
+            node = path[-1]
+            edge = cursors[-1]
+            if edge == indptr[node + 1]:
+                path.pop()
+                cursors.pop()
+                on_path.discard(node)
+                continue
+            cursors[-1] = edge + 1
+            target = indices[edge]
+            if target == start:
+                cycles.append(list(path))
+                if len(cycles) >= limit:
+                    return cycles
+                continue
+            # Edges still available to return to start after stepping to target
+            remaining = max_length - len(path)
+            if target <= start or remaining < 1 or target in on_path or components[target] != component:
+                continue
+            if remaining <= lookahead and distance.get(target, remaining + 1) > remaining:
+                continue
+            path.append(target)
+            cursors.append(indptr[target])
+            on_path.add(target)
+    return cycles
+
+
+def _edge_amount(csr, sender, recipient):
+    start, end = csr.indptr[sender], csr.indptr[sender + 1]
+    position = start + int(np.searchsorted(csr.indices[start:end], recipient))
+    return float(csr.weights[position])
+
+
+def analyze(graph, since=None, until=None, top=20, max_cycle_length=6, cycle_limit=100, min_component_size=3):
+    """
+    Hubs, cycles and clusters of one window, with wallets reported by id
+    """
+    csr = graph.window(since, until)
+    wallet_ids = graph.wallet_ids
+
+    hubs = hub_scores(csr)
+    ranked = np.argsort(-hubs['score'], kind='stable')[:top]
+    ranked = ranked[hubs['score'][ranked] > 0]
+
+    cycles = find_cycles(csr, max_cycle_length, cycle_limit)
+
+    components = connected_components(csr)
+    sizes = np.bincount(components[components >= 0])
+    volume = np.bincount(components[csr.sources], weights=csr.weights, minlength=len(sizes))
+    clusters = [label for label in np.argsort(-sizes, kind='stable') if sizes[label] >= min_component_size]
+
+    return {
+        'window': {
+            'since': since.isoformat() if since else None,
+            'until': until.isoformat() if until else None,
+        },
+        'wallets': int(csr.active.sum()),
+        'edges': int(csr.counts.sum()),
+        'hubs': [
+            {
+                'wallet': str(wallet_ids[node]),
+                'score': round(float(hubs['score'][node]), 4),
+                'fan_in': int(hubs['fan_in'][node]),
+                'fan_out': int(hubs['fan_out'][node]),
+                'amount_in': round(float(hubs['amount_in'][node]), 2),
+                'amount_out': round(float(hubs['amount_out'][node]), 2),
+            }
+            for node in ranked
+        ],
+        'cycles': [
+            {
+                'wallets': [str(wallet_ids[node]) for node in cycle],
+                'amount': round(min(
+                    _edge_amount(csr, node, cycle[(position + 1) % len(cycle)])
+                    for position, node in enumerate(cycle)
+                ), 2),
+            }
+            for cycle in cycles
+        ],
+        'components': [
+            {
+                'size': int(sizes[label]),
+                'amount': round(float(volume[label]), 2),
+                'wallets': [str(wallet_ids[node]) for node in np.flatnonzero(components == label)[:top]],
+            }
+            for label in clusters[:top]
+        ],
+    }
+
@@ -0,0 +1,132 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name=IDEMPOTENCY_HEADER,
+    type=str,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description="Unique client key; retries with the same key return the original response"
+)
+
+
+def get_idempotency_ttl():
+    """Return how long stored responses are replayed for"""
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def request_fingerprint(request):
+    """
+    Hash the method, path and body so a key reused for a different request can be rejected
+    """
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps([request.method, request.path, data], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _UnstoredResponse(Exception):
+    """
+    Used to roll back the key when the view fails with a server error
+    """
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def _replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return Response(
+            {"error": "Idempotency-Key was already used for a different request"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if record.response_status is None:
+        return Response(
+            {"error": "A request with this Idempotency-Key is still in progress"},
+            status=status.HTTP_409_CONFLICT
+        )
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_func):
+    """
+    Make a function based API view honour the Idempotency-Key header.
+
+    The key row is inserted in the same database transaction as the view's
+    writes, so a concurrent retry blocks on the unique constraint and then
+    replays the committed response. Responses below 500 are stored; server
+    errors roll the key back so the client can retry.
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_func(request, *args, **kwargs)
+
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response(
+                {"error": "Idempotency-Key is too long"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        request_hash = request_fingerprint(request)
+        record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if record is not None:
+            if record.created_at >= timezone.now() - get_idempotency_ttl():
+                return _replay(record, request_hash)
+            record.delete()
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(user=request.user, key=key, request_hash=request_hash)
+                response = view_func(request, *args, **kwargs)
+                if response.status_code >= 500:
+                    raise _UnstoredResponse(response)
+
+                record.response_status = response.status_code
+                record.response_body = response.data
+                record.save(update_fields=['response_status', 'response_body'])
+        except _UnstoredResponse as exc:
+            return exc.response
+        except IntegrityError:
+            # A concurrent request with the same key committed first
+            record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            if record is None:
+                raise
+            return _replay(record, request_hash)
+
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(batch_size=1000):
+    """
+    Delete keys older than the TTL in primary key batches, returning the number removed
+    """
+    cutoff = timezone.now() - get_idempotency_ttl()
+    expired = IdempotencyKey.objects.filter(created_at__lt=cutoff)
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
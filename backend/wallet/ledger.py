@@ -0,0 +1,115 @@
+"""
+Append-only double-entry journal.
+
+Every money movement posts one JournalEntry whose Posting legs sum to zero,
+so money only ever moves between accounts: wallets, piggy banks and the
+system accounts below. Periodic BalanceCheckpoint rows make "balance as of
+T" the nearest checkpoint plus the postings after it, a scan bounded by the
+checkpoint interval rather than by the account's whole history.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import DecimalField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BalanceCheckpoint, JournalEntry, Posting
+
+
+# Money entering or leaving the system (deposits)
+EXTERNAL_ACCOUNT = 'external'
+# Counterpart of the balances that existed before the ledger was introduced
+OPENING_ACCOUNT = 'equity:opening'
+# Counterpart of corrections made by balance reconciliation
+ADJUSTMENT_ACCOUNT = 'equity:adjustments'
+
+
+class UnbalancedEntry(ValueError):
+    """
+    Raised when the legs of a journal entry do not sum to zero
+    """
+
+
+def wallet_account(wallet_id):
+    return f'wallet:{wallet_id}'
+
+
+def piggybank_account(piggybank_id):
+    return f'piggybank:{piggybank_id}'
+
+
+def get_checkpoint_lag():
+    """
+    How far behind now checkpoints are taken, so transactions still in flight
+    (whose postings carry an earlier created_at) are not left out of them
+    """
+    return timedelta(seconds=getattr(settings, 'LEDGER_CHECKPOINT_LAG', 5 * 60))
+
+
+def post(entry_type, legs, description='', transaction=None):
+    """
+    Write a journal entry with one posting per (account, amount) leg.
+    Must run inside the database transaction that moves the balances.
+    """
+    legs = [(account, amount) for account, amount in legs if amount]
+    if sum(amount for _, amount in legs) != 0:
+        raise UnbalancedEntry(f"{entry_type} legs do not balance: {legs}")
+
+    entry = JournalEntry.objects.create(entry_type=entry_type, description=description, transaction=transaction)
+    Posting.objects.bulk_create([
+        Posting(entry=entry, account=account, amount=amount, created_at=entry.created_at)
+        for account, amount in legs
+    ])
+    return entry
+
+
+def _sum_postings(queryset):
+    return queryset.aggregate(
+        total=Coalesce(Sum('amount'), Value(Decimal('0.00')), output_field=DecimalField())
+    )['total']
+
+
+def balance_as_of(account, at=None):
+    """
+    Balance of an account including postings created at or before at, from the
+    latest checkpoint not after at plus the postings since
+    """
+    at = timezone.now() if at is None else at
+    checkpoint = BalanceCheckpoint.objects.filter(account=account, as_of__lte=at).order_by('-as_of').first()
+    postings = Posting.objects.filter(account=account, created_at__lte=at)
+    if checkpoint is None:
+        return _sum_postings(postings)
+    return checkpoint.balance + _sum_postings(postings.filter(created_at__gt=checkpoint.as_of))
+
+
+def create_checkpoints(as_of=None, batch_size=1000):
+    """
+    Checkpoint every account with postings since the previous run, as of as_of
+    (default: now minus LEDGER_CHECKPOINT_LAG). Returns the number created.
+
+    Runs are global, so an account without a checkpoint in the previous run
+    had no postings since its own latest one; its new balance is that
+    checkpoint plus one grouped sum over the postings since the previous run.
+    """
+    as_of = timezone.now() - get_checkpoint_lag() if as_of is None else as_of
+    previous = BalanceCheckpoint.objects.aggregate(latest=Max('as_of'))['latest']
+    if previous is not None and as_of <= previous:
+        raise ValueError(f"Checkpoints already exist up to {previous.isoformat()}")
+
+    activity = Posting.objects.filter(created_at__lte=as_of)
+    if previous is not None:
+        activity = activity.filter(created_at__gt=previous)
+    latest_balance = BalanceCheckpoint.objects.filter(account=OuterRef('account')).order_by('-as_of').values('balance')[:1]
+    rows = activity.order_by().values('account').annotate(
+        delta=Sum('amount'),
+        opening=Subquery(latest_balance, output_field=DecimalField()),
+    )
+
+    checkpoints = [
+        BalanceCheckpoint(account=row['account'], as_of=as_of, balance=(row['opening'] or Decimal('0.00')) + row['delta'])
+        for row in rows.iterator()
+    ]
+    BalanceCheckpoint.objects.bulk_create(checkpoints, batch_size=batch_size)
+    return len(checkpoints)
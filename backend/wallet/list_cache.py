@@ -0,0 +1,116 @@
+"""
+Read-through cache of each user's wallet list page.
+
+A user's wallet list has a version: a digest of the id, updated_at and
+balance of each of their wallets and their own updated_at, read with one
+small query on the owner index. Every balance change, wallet edit and
+profile change writes an updated_at, so the version changes with any
+write, whichever worker or tool (the admin, `reconcile_balances --repair`)
+made it. Pages of GET /api/wallets/ are cached
+in the Django cache named by WALLET_LIST_CACHE['CACHE'] under a key made from
+the user, that version and the request URL, and the same key is the
+response's ETag, so a poll whose If-None-Match is still current gets a 304
+without the page being built, and a page built from old rows is never served
+once the version has moved on.
+
+Since the version lives in the database, the cache does not have to be
+shared: with the default per-process LocMemCache each worker just builds its
+own copy of a page.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Wallet
+
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'TTL': 60,
+}
+
+
+def get_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'WALLET_LIST_CACHE', {})}[name]
+
+
+def get_cache():
+    alias = get_setting('CACHE')
+    return caches[alias] if alias else None
+
+
+def _page_key(etag):
+    return f'wallet-list-page:{etag.strip(chr(34))}'
+
+
+def _version_rows(user_id):
+    # Pages include the owner's username and email, so their profile is part of the version
+    return Wallet.objects.filter(owner_id=user_id).order_by('id').values_list(
+        'id', 'updated_at', 'balance', 'owner__updated_at'
+    )
+
+
+def _digest(rows):
+    return hashlib.sha1(repr(rows).encode()).hexdigest()[:20]
+
+
+def current_version(user_id):
+    return _digest(list(_version_rows(user_id)))
+
+
+async def acurrent_version(user_id):
+    return _digest([row async for row in _version_rows(user_id)])
+
+
+def make_etag(request, user_id, version):
+    """Strong ETag for this user's list at version, for the URL and format requested"""
+    media_type = getattr(request, 'accepted_media_type', '')
+    digest = hashlib.sha1(
+        f'{user_id}|{version}|{request.build_absolute_uri()}|{media_type}'.encode()
+    ).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    if header.strip() == '*':
+        return True
+    # Weak comparison, as If-None-Match requires
+    return etag in {tag.strip().removeprefix('W/') for tag in header.split(',')}
+
+
+def conditional_page(request, user_id, build):
+    """
+    (data, etag) for a user's wallet list request. data is None when the
+    client's If-None-Match is current, the cached page when there is one, and
+    otherwise build(), which is then cached. Without a cache this is just
+    (build(), None).
+    """
+    cache = get_cache()
+    if cache is None:
+        return build(), None
+    etag = make_etag(request, user_id, current_version(user_id))
+    if etag_matches(request, etag):
+        return None, etag
+    data = cache.get(_page_key(etag))
+    if data is None:
+        data = build()
+        cache.set(_page_key(etag), data, get_setting('TTL'))
+    return data, etag
+
+
+async def aconditional_page(request, user_id, build):
+    """conditional_page() for async views; build is a coroutine function"""
+    cache = get_cache()
+    if cache is None:
+        return await build(), None
+    etag = make_etag(request, user_id, await acurrent_version(user_id))
+    if etag_matches(request, etag):
+        return None, etag
+    data = await cache.aget(_page_key(etag))
+    if data is None:
+        data = await build()
+        await cache.aset(_page_key(etag), data, get_setting('TTL'))
+    return data, etag
+
@@ -0,0 +1,46 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from wallet.graph import TransferGraph, analyze
+
+
+class Command(BaseCommand):
+    help = "Report transfer cycles, fan-in/fan-out hubs and wallet clusters as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help="Length of the window ending now")
+        parser.add_argument('--top', type=int, default=20, help="Hubs and clusters to report")
+        parser.add_argument('--max-cycle-length', type=int, default=6, help="Longest cycle searched for")
+        parser.add_argument('--cycle-limit', type=int, default=100, help="Stop after this many cycles")
+        parser.add_argument('--min-component-size', type=int, default=3, help="Smallest cluster reported")
+        parser.add_argument('--interval', type=float,
+                            help="Keep running, appending new transfers and reporting every N seconds")
+
+    def handle(self, *args, **options):
+        window = timedelta(hours=options['hours'])
+        graph = TransferGraph()
+        while True:
+            started = time.monotonic()
+            now = timezone.now()
+            added = graph.refresh(since=now - window)
+            # Edges older than the window can never be reported again
+            graph.discard_before(now - window)
+            report = analyze(
+                graph,
+                since=now - window,
+                top=options['top'],
+                max_cycle_length=options['max_cycle_length'],
+                cycle_limit=options['cycle_limit'],
+                min_component_size=options['min_component_size'],
+            )
+            report['new_edges'] = added
+            report['seconds'] = round(time.monotonic() - started, 3)
+            self.stdout.write(json.dumps(report, indent=2))
+
+            if not options['interval']:
+                break
+            time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
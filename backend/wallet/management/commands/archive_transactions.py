@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from wallet.archive import archive_month, months_before
+from wallet.partitions import add_months, month_start
+
+
+class Command(BaseCommand):
+    help = "Move transactions from months older than --older-than into the compressed archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=12,
+                            help="Keep this many whole months before the current one in the transaction table")
+        parser.add_argument('--dry-run', action='store_true', help="Only list the months that would be archived")
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 1:
+            raise CommandError("--older-than must be at least 1")
+        cutoff = add_months(month_start(timezone.now()), -options['older_than'])
+        months = months_before(cutoff)
+        if not months:
+            self.stdout.write(self.style.SUCCESS(f"No transactions before {cutoff:%Y-%m}"))
+            return
+
+        total = 0
+        for month in months:
+            if options['dry_run']:
+                self.stdout.write(f"Would archive {month:%Y-%m}")
+                continue
+            archived = archive_month(month)
+            total += archived
+            self.stdout.write(f"Archived {archived} transactions from {month:%Y-%m}")
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Archived {total} transactions from {len(months)} months"))
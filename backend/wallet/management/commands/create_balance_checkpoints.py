@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.ledger import create_checkpoints
+
+
+class Command(BaseCommand):
+    help = "Checkpoint ledger balances of accounts with postings since the previous run (run e.g. hourly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Checkpoints inserted per statement")
+
+    def handle(self, *args, **options):
+        try:
+            created = create_checkpoints(batch_size=options['batch_size'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Created {created} balance checkpoints"))
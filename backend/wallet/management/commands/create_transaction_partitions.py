@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.partitions import ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = "Create monthly Transaction partitions ahead of time (PostgreSQL; run e.g. daily)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help="Months after the current one that must have a partition")
+
+    def handle(self, *args, **options):
+        if options['months_ahead'] < 0:
+            raise CommandError("--months-ahead must not be negative")
+        if not is_partitioned():
+            self.stdout.write("The transaction table is not partitioned on this database; nothing to do")
+            return
+        created = ensure_partitions(options['months_ahead'])
+        months = ", ".join(f"{month:%Y-%m}" for month in created) or "none needed"
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} transaction partitions ({months})"))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.outbox import Dispatcher, build_sinks, get_setting
+
+
+class Command(BaseCommand):
+    help = "Deliver pending outbox events to the sinks in OUTBOX['SINKS']"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Events claimed per batch (default OUTBOX['BATCH_SIZE'])")
+        parser.add_argument('--interval', type=float,
+                            help="Seconds to wait when caught up (default OUTBOX['POLL_INTERVAL'])")
+        parser.add_argument('--once', action='store_true', help="Deliver what is pending now and exit")
+
+    def handle(self, *args, **options):
+        sinks = build_sinks()
+        if not sinks:
+            raise CommandError("No outbox sinks configured; set OUTBOX['SINKS']")
+        dispatcher = Dispatcher(sinks, batch_size=options['batch_size'])
+
+        if options['once']:
+            delivered = 0
+            while True:
+                count, claimed = dispatcher.dispatch_batch()
+                delivered += count
+                if count == 0:
+                    break
+            self.stdout.write(self.style.SUCCESS(f"Delivered {delivered} outbox events"))
+            return
+
+        interval = get_setting('POLL_INTERVAL') if options['interval'] is None else options['interval']
+        self.stdout.write(f"Dispatching outbox events to {len(sinks)} sinks")
+        try:
+            dispatcher.run(poll_interval=interval)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from wallet.outbox import get_setting, purge_dispatched
+
+
+class Command(BaseCommand):
+    help = "Delete outbox events dispatched more than OUTBOX['RETENTION_DAYS'] days ago"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, help="Override OUTBOX['RETENTION_DAYS']")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per statement")
+
+    def handle(self, *args, **options):
+        days = get_setting('RETENTION_DAYS') if options['days'] is None else options['days']
+        deleted = purge_dispatched(timedelta(days=days), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} dispatched outbox events"))
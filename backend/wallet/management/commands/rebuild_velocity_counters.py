@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.velocity import get_store, rebuild_from_transactions
+
+
+class Command(BaseCommand):
+    help = "Rebuild velocity counters from the last 24 hours of transactions (shared SQLite store)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows fetched per round trip")
+
+    def handle(self, *args, **options):
+        store = get_store()
+        if getattr(store, 'process_local', False):
+            raise CommandError(
+                f"{type(store).__name__} lives in each worker process and is rebuilt when the worker starts; "
+                "this command only applies to a shared store such as SQLiteVelocityStore"
+            )
+        replayed = rebuild_from_transactions(store, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Replayed {replayed} transactions into velocity counters"))
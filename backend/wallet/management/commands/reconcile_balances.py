@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.reconciliation import find_discrepancies, repair
+
+
+class Command(BaseCommand):
+    help = "Compare wallet and piggy bank balances with their transactions and optionally repair them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true',
+                            help="Set mismatched balances to the expected value and post ADJUSTMENT entries")
+        parser.add_argument('--limit', type=int, default=50, help="Discrepancies listed in the report")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows fetched per round trip")
+        parser.add_argument('--fail-on-discrepancy', action='store_true',
+                            help="Exit with an error when unrepaired discrepancies remain (for cron alerts)")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        wallets, piggy_banks, discrepancies = find_discrepancies(chunk_size=options['chunk_size'])
+
+        for discrepancy in discrepancies[:options['limit']]:
+            self.stdout.write(
+                f"{discrepancy.kind} {discrepancy.id}: stored {discrepancy.stored}, "
+                f"expected {discrepancy.expected} ({discrepancy.difference:+})"
+            )
+        if len(discrepancies) > options['limit']:
+            self.stdout.write(f"... and {len(discrepancies) - options['limit']} more")
+
+        summary = (
+            f"Checked {wallets} wallets and {piggy_banks} piggy banks in {time.monotonic() - started:.1f}s: "
+            f"{len(discrepancies)} discrepancies"
+        )
+        if not discrepancies:
+            self.stdout.write(self.style.SUCCESS(summary))
+            return
+        self.stdout.write(self.style.WARNING(summary))
+
+        remaining = len(discrepancies)
+        if options['repair']:
+            repaired = repair(discrepancies)
+            remaining -= repaired
+            self.stdout.write(self.style.SUCCESS(f"Repaired {repaired}; {remaining} changed since the check and were skipped"))
+        if remaining and options['fail_on_discrepancy']:
+            raise CommandError(f"{remaining} balance discrepancies")
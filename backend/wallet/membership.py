@@ -0,0 +1,184 @@
+"""
+Which piggy banks each user can access.
+
+accessible_ids() returns the ids of the active piggy banks a user created or
+is an active member of, so authorization is a set lookup instead of one or
+two queries per request. The sets live in a per-process LRU for LOCAL_TTL
+seconds and, when PIGGYBANK_MEMBERSHIP['CACHE'] names a Django cache, in
+that cache too so workers share them.
+
+Saving or deleting a PiggyBank or PiggyBankMember, whether through the
+API, the admin or the shell, invalidates the affected users (see
+connect_signals()). Invalidation only reaches this process and the shared
+cache, so other workers may keep an old set for up to LOCAL_TTL.
+can_access() therefore reloads before refusing, which means a new membership
+is never refused. A revoked one can still be granted for that long.
+Queryset update() and raw SQL send no signals; their changes are seen only
+once both caches expire, up to CACHE_TTL + LOCAL_TTL seconds later.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import PiggyBank, PiggyBankMember
+
+
+DEFAULTS = {
+    'MAX_USERS': 10000,
+    'LOCAL_TTL': 30,
+    'CACHE': None,
+    'CACHE_TTL': 60,
+}
+
+
+def get_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'PIGGYBANK_MEMBERSHIP', {})}[name]
+
+
+class MembershipIndex:
+    """
+    Process-local LRU of user id -> (loaded at, frozenset of piggy bank ids)
+    """
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id, ttl):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            loaded_at, ids = entry
+            if time.monotonic() - loaded_at > ttl:
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return ids
+
+    def put(self, user_id, ids, max_users):
+        with self.lock:
+            self.entries[user_id] = (time.monotonic(), ids)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > max_users:
+                self.entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_index = MembershipIndex()
+
+
+def _shared_cache():
+    alias = get_setting('CACHE')
+    return caches[alias] if alias else None
+
+
+def _cache_key(user_id):
+    return f'piggybank-access:{user_id}'
+
+
+def load_ids(user_id):
+    """Read a user's accessible piggy bank ids from the database"""
+    created = PiggyBank.objects.filter(creator_id=user_id, is_active=True).values_list('id', flat=True)
+    joined = PiggyBankMember.objects.filter(
+        user_id=user_id, is_active=True, piggy_bank__is_active=True
+    ).values_list('piggy_bank_id', flat=True)
+    return frozenset(created.order_by().union(joined.order_by()))
+
+
+def accessible_ids(user_id):
+    """Ids of the active piggy banks the user created or is an active member of"""
+    ids = _index.get(user_id, get_setting('LOCAL_TTL'))
+    if ids is not None:
+        return ids
+
+    cache = _shared_cache()
+    if cache is not None:
+        ids = cache.get(_cache_key(user_id))
+    if ids is None:
+        ids = load_ids(user_id)
+        if cache is not None:
+            cache.set(_cache_key(user_id), ids, get_setting('CACHE_TTL'))
+    _index.put(user_id, ids, get_setting('MAX_USERS'))
+    return ids
+
+
+async def aaccessible_ids(user_id):
+    """accessible_ids() for async views; only a miss in this process leaves the event loop"""
+    ids = _index.get(user_id, get_setting('LOCAL_TTL'))
+    if ids is not None:
+        return ids
+    return await sync_to_async(accessible_ids)(user_id)
+
+
+def can_access(user, piggy_bank):
+    """Whether the user created the piggy bank or is an active member of it"""
+    if piggy_bank.creator_id == user.id or piggy_bank.id in accessible_ids(user.id):
+        return True
+    # The membership may have been granted through another worker since the set was loaded
+    _index.discard(user.id)
+    return piggy_bank.id in accessible_ids(user.id)
+
+
+async def acan_access(user, piggy_bank):
+    """can_access() for async views"""
+    if piggy_bank.creator_id == user.id or piggy_bank.id in await aaccessible_ids(user.id):
+        return True
+    return await sync_to_async(can_access)(user, piggy_bank)
+
+
+def _forget(user_ids):
+    cache = _shared_cache()
+    for user_id in user_ids:
+        _index.discard(user_id)
+    if cache is not None:
+        cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def invalidate(*user_ids):
+    """
+    Drop the cached sets of these users, now and again once the current
+    transaction commits, so a lookup racing the write cannot keep the old set
+    """
+    _forget(user_ids)
+    transaction.on_commit(functools.partial(_forget, user_ids))
+
+
+def invalidate_piggy_bank(piggy_bank):
+    """Drop the cached sets of everyone with access to the piggy bank"""
+    members = PiggyBankMember.objects.filter(piggy_bank=piggy_bank).values_list('user_id', flat=True)
+    invalidate(piggy_bank.creator_id, *members)
+
+
+def _member_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id)
+
+
+def _piggy_bank_changed(sender, instance, **kwargs):
+    invalidate_piggy_bank(instance)
+
+
+def connect_signals():
+    """Invalidate on every save and delete of piggy banks and members; called from WalletConfig.ready()"""
+    post_save.connect(_member_changed, sender=PiggyBankMember, dispatch_uid='membership-member-saved')
+    post_delete.connect(_member_changed, sender=PiggyBankMember, dispatch_uid='membership-member-deleted')
+    post_save.connect(_piggy_bank_changed, sender=PiggyBank, dispatch_uid='membership-piggy-bank-saved')
+    post_delete.connect(_piggy_bank_changed, sender=PiggyBank, dispatch_uid='membership-piggy-bank-deleted')
+
+
+def clear():
+    """Empty this process's index (tests)"""
+    _index.clear()
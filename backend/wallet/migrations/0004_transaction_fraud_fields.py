@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-16 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0003_transaction_wallet_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='fraud_flagged',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='fraud_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
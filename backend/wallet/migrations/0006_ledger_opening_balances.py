@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+OPENING_ACCOUNT = 'equity:opening'
+
+
+def post_opening_balances(apps, schema_editor):
+    """
+    Give every existing wallet and piggy bank balance a matching OPENING entry,
+    so ledger balances agree with the stored ones from the start
+    """
+    Wallet = apps.get_model('wallet', 'Wallet')
+    PiggyBank = apps.get_model('wallet', 'PiggyBank')
+    JournalEntry = apps.get_model('wallet', 'JournalEntry')
+    Posting = apps.get_model('wallet', 'Posting')
+
+    legs = [
+        (f'wallet:{wallet_id}', balance)
+        for wallet_id, balance in Wallet.objects.filter(balance__gt=0).values_list('id', 'balance').iterator()
+    ] + [
+        (f'piggybank:{piggybank_id}', amount)
+        for piggybank_id, amount in PiggyBank.objects.filter(current_amount__gt=0).values_list(
+            'id', 'current_amount').iterator()
+    ]
+    if not legs:
+        return
+
+    now = timezone.now()
+    entry = JournalEntry.objects.create(entry_type='OPENING', description='Balances before the ledger', created_at=now)
+    postings = [Posting(entry=entry, account=account, amount=amount, created_at=now) for account, amount in legs]
+    postings.append(Posting(entry=entry, account=OPENING_ACCOUNT, amount=-sum(amount for _, amount in legs),
+                            created_at=now))
+    Posting.objects.bulk_create(postings, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0005_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(post_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-16 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0006_ledger_opening_balances'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='journalentry',
+            name='entry_type',
+            field=models.CharField(choices=[('OPENING', 'Opening balance'), ('DEPOSIT', 'Deposit'), ('TRANSFER', 'Transfer'), ('BULK_TRANSFER', 'Bulk transfer'), ('PIGGYBANK_CONTRIBUTION', 'Piggy Bank Contribution'), ('PIGGYBANK_PAYMENT', 'Piggy Bank Payment'), ('ADJUSTMENT', 'Reconciliation adjustment')], max_length=25),
+        ),
+    ]
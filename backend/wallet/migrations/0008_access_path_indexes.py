@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+from wallet.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('wallet', '0007_journalentry_adjustment'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='wallet',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['owner', '-created_at'], name='wallet_owner_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('reference_id__isnull', False)), fields=['reference_id'], name='txn_reference_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='piggybank',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['creator', '-created_at'], name='piggybank_creator_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='piggybankcontribution',
+            index=models.Index(fields=['piggy_bank', '-created_at'], name='contribution_piggybank_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='piggybankmember',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', 'piggy_bank'], name='member_user_active_idx'),
+        ),
+    ]
@@ -0,0 +1,133 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:07
+
+import django.core.serializers.json
+import django.db.models.deletion
+import uuid
+from datetime import date, datetime, timezone
+
+from django.db import migrations, models
+
+
+TABLE = 'wallet_transaction'
+# Monthly partitions created ahead of the newest row; create_transaction_partitions keeps this topped up
+MONTHS_AHEAD = 3
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _utc(month):
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def _rebuild(cursor, quote_name, partitioned):
+    """
+    Recreate wallet_transaction with the same columns, indexes and foreign keys,
+    either range-partitioned by month on created_at or as a plain table, and
+    copy the rows across.
+    """
+    old = f'{TABLE}_old'
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s", [TABLE]
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'f')", [TABLE]
+    )
+    constraints = cursor.fetchall()
+    primary_key = next(name for name, kind, _ in constraints if kind == 'p')
+
+    cursor.execute(f"ALTER TABLE {quote_name(TABLE)} RENAME TO {quote_name(old)}")
+    cursor.execute(f"ALTER INDEX {quote_name(primary_key)} RENAME TO {quote_name(old + '_pkey')}")
+    like = f"(LIKE {quote_name(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    if partitioned:
+        # The partition key has to be part of every unique index, the primary key included
+        cursor.execute(f"CREATE TABLE {quote_name(TABLE)} {like} PARTITION BY RANGE (created_at)")
+        cursor.execute(f"ALTER TABLE {quote_name(TABLE)} ADD CONSTRAINT {quote_name(primary_key)} PRIMARY KEY (id, created_at)")
+        cursor.execute(f"SELECT min(created_at), max(created_at) FROM {quote_name(old)}")
+        first, last = cursor.fetchone()
+        now = datetime.now(timezone.utc)
+        month = date((first or now).year, (first or now).month, 1)
+        end = date(max(last or now, now).year, max(last or now, now).month, 1)
+        for _ in range(MONTHS_AHEAD):
+            end = _next_month(end)
+        while month <= end:
+            cursor.execute(
+                f"CREATE TABLE {quote_name(f'{TABLE}_p{month:%Y%m}')} PARTITION OF {quote_name(TABLE)} "
+                f"FOR VALUES FROM (%s) TO (%s)", [_utc(month), _utc(_next_month(month))]
+            )
+            month = _next_month(month)
+        cursor.execute(f"CREATE TABLE {quote_name(TABLE + '_default')} PARTITION OF {quote_name(TABLE)} DEFAULT")
+    else:
+        cursor.execute(f"CREATE TABLE {quote_name(TABLE)} {like}")
+        cursor.execute(f"ALTER TABLE {quote_name(TABLE)} ADD CONSTRAINT {quote_name(primary_key)} PRIMARY KEY (id)")
+
+    cursor.execute(f"INSERT INTO {quote_name(TABLE)} SELECT * FROM {quote_name(old)}")
+    cursor.execute(f"DROP TABLE {quote_name(old)} CASCADE")
+
+    for name, definition in indexes:
+        if name != primary_key:
+            # Indexes on a partitioned parent are listed as ON ONLY
+            cursor.execute(definition.replace(' ON ONLY ', ' ON '))
+    for name, kind, definition in constraints:
+        if kind == 'f':
+            cursor.execute(f"ALTER TABLE {quote_name(TABLE)} ADD CONSTRAINT {quote_name(name)} {definition}")
+
+
+def partition_transactions(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        _rebuild(cursor, schema_editor.quote_name, partitioned=True)
+
+
+def unpartition_transactions(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        _rebuild(cursor, schema_editor.quote_name, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0008_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='journalentry',
+            name='transaction',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='journal_entries', to='wallet.transaction'),
+        ),
+        migrations.AlterField(
+            model_name='piggybankcontribution',
+            name='transaction',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='piggybank_contribution', to='wallet.transaction'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='related_transaction',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='wallet.transaction'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransactionBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField()),
+                ('row_count', models.PositiveIntegerField()),
+                ('net', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('reference_totals', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('payload', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('wallet', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_transaction_batches', to='wallet.wallet')),
+            ],
+            options={
+                'ordering': ['month'],
+                'indexes': [models.Index(fields=['wallet', 'month'], name='archive_wallet_month_idx')],
+            },
+        ),
+        migrations.RunPython(partition_transactions, unpartition_transactions),
+    ]
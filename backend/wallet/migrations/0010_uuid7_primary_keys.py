@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:13
+
+import wallet.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0009_transaction_partitioning'),
+    ]
+
+    # The default is applied in Python, so only the migration state changes. Run as
+    # plain AlterField, SQLite would rebuild the whole transaction table.
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='transaction',
+                name='id',
+                field=models.UUIDField(default=wallet.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+            migrations.AlterField(
+                model_name='wallet',
+                name='id',
+                field=models.UUIDField(default=wallet.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+        ]),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0011_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='batch_fraud_flagged',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='batch_fraud_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
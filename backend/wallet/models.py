@@ -1,15 +1,19 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 import uuid
 
+from .ids import uuid7
+
 
 class Wallet(models.Model):
     """
     Wallet model for storing user's money
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='wallets')
     name = models.CharField(max_length=100, default='My Wallet')
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), validators=[MinValueValidator(Decimal('0.00'))])
@@ -19,6 +23,11 @@ class Wallet(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Wallet list and ownership checks: one owner's active wallets, newest first
+            models.Index(fields=['owner', '-created_at'], condition=models.Q(is_active=True),
+                         name='wallet_owner_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.owner.username}'s {self.name} - R{self.balance}"
@@ -47,7 +56,12 @@ class Transaction(models.Model):
         ('CANCELLED', 'Cancelled'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Types that add to / take from the wallet the row belongs to
+    CREDIT_TYPES = ('DEPOSIT', 'TRANSFER_IN')
+    DEBIT_TYPES = ('WITHDRAWAL', 'TRANSFER_OUT', 'PIGGYBANK_CONTRIBUTION')
+
+    # Time-ordered (UUIDv7), so inserts append to the primary key index; older rows keep uuid4 ids
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='transactions')
     transaction_type = models.CharField(max_length=25, choices=TRANSACTION_TYPES)
     amount = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
@@ -59,15 +73,52 @@ class Transaction(models.Model):
 
     # For transfers - link to the other party
     related_wallet = models.ForeignKey(Wallet, on_delete=models.SET_NULL, null=True, blank=True, related_name='related_transactions')
-    related_transaction = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True)
+    # Foreign keys into this table are not enforced by the database: on PostgreSQL it is
+    # partitioned by created_at, and old partitions are moved to ArchivedTransactionBatch
+    related_transaction = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+                                            db_constraint=False)
+
+    # Set by fraud screening; flagged rows were held, denied or could not be scored in time
+    fraud_score = models.FloatField(null=True, blank=True)
+    fraud_flagged = models.BooleanField(default=False)
+    # Set by offline re-scoring (batch_scoring.py), recomputed from scratch on every run
+    batch_fraud_score = models.FloatField(null=True, blank=True)
+    batch_fraud_flagged = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serves wallet statements in (created_at, id) keyset order, with date range filters
+            models.Index(fields=['wallet', '-created_at', '-id'], name='txn_wallet_created_idx'),
+            # Ties contributions and payouts to their piggy bank; most rows have no reference
+            models.Index(fields=['reference_id'], condition=models.Q(reference_id__isnull=False),
+                         name='txn_reference_idx'),
+        ]
 
     def __str__(self):
         return f"{self.transaction_type} - R{self.amount} - {self.wallet.owner.username}"
 
 
+class PiggyBankQuerySet(models.QuerySet):
+    def with_counts(self):
+        """
+        Annotate active member and contribution counts with correlated subqueries,
+        so listing piggy banks does not cost two COUNT queries per row
+        """
+        members = PiggyBankMember.objects.filter(piggy_bank=models.OuterRef('pk'), is_active=True).order_by()
+        contributions = PiggyBankContribution.objects.filter(piggy_bank=models.OuterRef('pk')).order_by()
+        return self.annotate(
+            active_members_count=models.Subquery(
+                members.values('piggy_bank').annotate(total=models.Count('pk')).values('total'),
+                output_field=models.IntegerField()
+            ),
+            contribution_total_count=models.Subquery(
+                contributions.values('piggy_bank').annotate(total=models.Count('pk')).values('total'),
+                output_field=models.IntegerField()
+            ),
+        )
+
+
 class PiggyBank(models.Model):
     """
     PiggyBank model for shared bill splitting
@@ -82,8 +133,15 @@ class PiggyBank(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PiggyBankQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Piggy banks a user created that are still active, newest first
+            models.Index(fields=['creator', '-created_at'], condition=models.Q(is_active=True),
+                         name='piggybank_creator_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - R{self.current_amount}/R{self.target_amount}"
@@ -110,11 +168,16 @@ class PiggyBankContribution(models.Model):
     contributor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='piggybank_contributions')
     wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='piggybank_contributions')
     amount = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
-    transaction = models.OneToOneField(Transaction, on_delete=models.CASCADE, related_name='piggybank_contribution')
+    transaction = models.OneToOneField(Transaction, on_delete=models.CASCADE, related_name='piggybank_contribution',
+                                       db_constraint=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Contribution list of one piggy bank, newest first
+            models.Index(fields=['piggy_bank', '-created_at'], name='contribution_piggybank_idx'),
+        ]
 
     def __str__(self):
         return f"{self.contributor.username} contributed R{self.amount} to {self.piggy_bank.name}"
@@ -134,6 +197,183 @@ class PiggyBankMember(models.Model):
     class Meta:
         unique_together = ['piggy_bank', 'user']
         ordering = ['-invited_at']
+        indexes = [
+            # Piggy banks a user belongs to; (piggy_bank, user) lookups use the unique index
+            models.Index(fields=['user', 'piggy_bank'], condition=models.Q(is_active=True),
+                         name='member_user_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} in {self.piggy_bank.name}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response for a client-supplied Idempotency-Key header, so retried
+    money movements are answered from here instead of being executed twice
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
+
+class AppendOnlyModel(models.Model):
+    """
+    Rows can be inserted but never changed or deleted through the ORM instance API
+    """
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError(f"{type(self).__name__} rows are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError(f"{type(self).__name__} rows are append-only")
+
+
+class JournalEntry(AppendOnlyModel):
+    """
+    One money movement in the double-entry ledger; its postings sum to zero
+    """
+    ENTRY_TYPES = [
+        ('OPENING', 'Opening balance'),
+        ('DEPOSIT', 'Deposit'),
+        ('TRANSFER', 'Transfer'),
+        ('BULK_TRANSFER', 'Bulk transfer'),
+        ('PIGGYBANK_CONTRIBUTION', 'Piggy Bank Contribution'),
+        ('PIGGYBANK_PAYMENT', 'Piggy Bank Payment'),
+        ('ADJUSTMENT', 'Reconciliation adjustment'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    entry_type = models.CharField(max_length=25, choices=ENTRY_TYPES)
+    description = models.TextField(blank=True)
+    transaction = models.ForeignKey(Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='journal_entries',
+                                    db_constraint=False)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'journal entries'
+
+    def __str__(self):
+        return f"{self.entry_type} at {self.created_at}"
+
+
+class Posting(AppendOnlyModel):
+    """
+    One leg of a journal entry. account is 'wallet:<id>', 'piggybank:<id>' or a
+    system account; a positive amount increases that account's balance.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    entry = models.ForeignKey(JournalEntry, on_delete=models.PROTECT, related_name='postings')
+    account = models.CharField(max_length=64)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # Copied from the entry so balance scans never join it
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # Serves balance tail scans: one account, postings after a checkpoint
+            models.Index(fields=['account', 'created_at'], name='posting_account_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.account} {self.amount:+}"
+
+
+class BalanceCheckpoint(AppendOnlyModel):
+    """
+    Balance of one ledger account including every posting created at or before as_of
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    account = models.CharField(max_length=64)
+    as_of = models.DateTimeField()
+    balance = models.DecimalField(max_digits=16, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-as_of']
+        constraints = [
+            # Also the index behind "latest checkpoint at or before T" lookups
+            models.UniqueConstraint(fields=['account', 'as_of'], name='unique_checkpoint_per_account'),
+        ]
+
+    def __str__(self):
+        return f"{self.account} R{self.balance} as of {self.as_of}"
+
+
+class ArchivedTransactionBatch(models.Model):
+    """
+    One wallet's transactions for one calendar month, moved out of the
+    Transaction table by `manage.py archive_transactions` and stored as a
+    zlib-compressed JSON array of rows (see wallet.archive.ARCHIVE_COLUMNS)
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='archived_transaction_batches',
+                               db_index=False)
+    month = models.DateField()
+    row_count = models.PositiveIntegerField()
+    # Signed total of the completed rows, so balances never need the payload
+    net = models.DecimalField(max_digits=14, decimal_places=2)
+    # Completed piggy bank payouts in the batch: {reference_id: total}
+    reference_totals = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    payload = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['month']
+        indexes = [
+            models.Index(fields=['wallet', 'month'], name='archive_wallet_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.wallet_id} {self.month:%Y-%m} ({self.row_count} rows)"
+
+
+class OutboxEvent(models.Model):
+    """
+    A money movement waiting for delivery to downstream consumers, written in
+    the same database transaction as the movement and delivered by
+    `manage.py dispatch_outbox` (see wallet.outbox)
+    """
+    # Sequential, so pending events are claimed in the order they were written
+    id = models.BigAutoField(primary_key=True)
+    event_type = models.CharField(max_length=40)
+    # Not a foreign key: events outlive archived and deleted rows. Events of one wallet are delivered in id order.
+    wallet_id = models.UUIDField()
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Pushed back after a failed delivery
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # The dispatcher's scan: pending events in id order
+            models.Index(fields=['id'], condition=models.Q(dispatched_at__isnull=True), name='outbox_pending_idx'),
+            # Serves the check for an earlier pending event of the same wallet
+            models.Index(fields=['wallet_id', 'id'], condition=models.Q(dispatched_at__isnull=True),
+                         name='outbox_pending_wallet_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.id}"
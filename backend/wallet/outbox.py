@@ -0,0 +1,247 @@
+"""
+Transactional outbox for downstream consumers (notifications, fraud,
+analytics).
+
+Money movements call record_transactions()/record_contribution() inside their
+transaction.atomic() block, after the balance update, so an OutboxEvent row
+exists exactly when the movement committed. Since the row is written after
+the wallet row is locked, the events of one wallet get ids in commit order.
+
+`manage.py dispatch_outbox` runs Dispatcher: each batch claims up to
+BATCH_SIZE pending rows with SELECT ... FOR UPDATE SKIP LOCKED (so several
+dispatchers can run side by side on PostgreSQL), hands them to every
+configured sink and marks them dispatched with one UPDATE, all in one
+database transaction. Delivery is at least once: a crash or a failing sink
+leaves the batch pending and it is delivered again, after an exponential
+backoff when a sink raised. Events are delivered in id order per wallet:
+events behind one of their wallet's that is waiting out a backoff are not
+claimed at all, and a claimed event is held back while an earlier event of
+its wallet is still pending, e.g. claimed by another dispatcher. A batch that
+held events back moves the dispatcher's cursor past them, so one wallet's
+backlog never keeps other wallets' events from being claimed.
+"""
+import json
+import logging
+import os
+import time
+import urllib.request
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, F, Min, OuterRef
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxEvent
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SINKS': [],
+    'BATCH_SIZE': 500,
+    'POLL_INTERVAL': 0.5,
+    'RETRY_DELAY': 5,
+    'MAX_RETRY_DELAY': 300,
+    'RETENTION_DAYS': 7,
+}
+
+
+def get_setting(name):
+    return {**DEFAULTS, **getattr(settings, 'OUTBOX', {})}[name]
+
+
+def transaction_event(txn):
+    return OutboxEvent(event_type='transaction.completed', wallet_id=txn.wallet_id, payload={
+        'transaction_id': str(txn.id),
+        'wallet': str(txn.wallet_id),
+        'transaction_type': txn.transaction_type,
+        'amount': str(txn.amount),
+        'status': txn.status,
+        'description': txn.description,
+        'reference_id': txn.reference_id,
+        'related_wallet': str(txn.related_wallet_id) if txn.related_wallet_id else None,
+        'related_transaction': str(txn.related_transaction_id) if txn.related_transaction_id else None,
+        'created_at': txn.created_at.isoformat(),
+    })
+
+
+def record_transactions(transactions):
+    """Write an outbox event per transaction; call inside the movement's atomic block"""
+    OutboxEvent.objects.bulk_create([transaction_event(txn) for txn in transactions])
+
+
+def record_contribution(contribution):
+    """Write the outbox event for a piggy bank contribution; call inside the movement's atomic block"""
+    OutboxEvent.objects.create(event_type='piggybank.contribution', wallet_id=contribution.wallet_id, payload={
+        'contribution_id': str(contribution.id),
+        'piggy_bank': str(contribution.piggy_bank_id),
+        'contributor': str(contribution.contributor_id),
+        'wallet': str(contribution.wallet_id),
+        'amount': str(contribution.amount),
+        'transaction_id': str(contribution.transaction_id),
+        'created_at': contribution.created_at.isoformat(),
+    })
+
+
+def as_message(event):
+    """What sinks receive for an event"""
+    return {
+        'id': event.id,
+        'type': event.event_type,
+        'wallet': str(event.wallet_id),
+        'created_at': event.created_at.isoformat(),
+        'payload': event.payload,
+    }
+
+
+class FileSink:
+    """
+    Appends each event as a JSON line; the file is fsynced before the batch is marked dispatched
+    """
+    def __init__(self, path='outbox.ndjson', fsync=True):
+        self.path = str(path)
+        self.fsync = fsync
+
+    def deliver(self, messages):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.writelines(json.dumps(message, cls=DjangoJSONEncoder) + '\n' for message in messages)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+
+
+class HTTPSink:
+    """
+    POSTs each batch as {"events": [...]} to url; any response but 2xx fails the batch
+    """
+    def __init__(self, url, timeout=5, headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+
+    def deliver(self, messages):
+        body = json.dumps({'events': messages}, cls=DjangoJSONEncoder).encode()
+        request = urllib.request.Request(self.url, data=body, headers=self.headers, method='POST')
+        # urlopen raises HTTPError for 4xx and 5xx
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class CallbackSink:
+    """
+    Calls an in-process function (or dotted path to one) with each batch of messages
+    """
+    def __init__(self, callback):
+        self.callback = import_string(callback) if isinstance(callback, str) else callback
+
+    def deliver(self, messages):
+        self.callback(messages)
+
+
+def build_sinks(config=None):
+    config = get_setting('SINKS') if config is None else config
+    return [import_string(sink['BACKEND'])(**sink.get('OPTIONS', {})) for sink in config]
+
+
+class Dispatcher:
+    """
+    Claims pending outbox events in batches and delivers them to sinks
+    """
+    def __init__(self, sinks=None, batch_size=None):
+        self.sinks = build_sinks() if sinks is None else sinks
+        self.batch_size = batch_size or get_setting('BATCH_SIZE')
+        # Claims start after this id while events before it are held back
+        self.cursor = 0
+
+    def claim(self, now):
+        """Lock the next batch of pending events not stuck behind a backoff of their wallet"""
+        backing_off = OutboxEvent.objects.filter(
+            wallet_id=OuterRef('wallet_id'), id__lt=OuterRef('id'), dispatched_at__isnull=True, available_at__gt=now
+        )
+        return list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(dispatched_at__isnull=True, available_at__lte=now, id__gt=self.cursor)
+            .exclude(Exists(backing_off)).order_by('id')[:self.batch_size]
+        )
+
+    def in_wallet_order(self, claimed):
+        """The claimed events that no pending event of the same wallet precedes"""
+        ids = [event.id for event in claimed]
+        earliest = dict(
+            OutboxEvent.objects.filter(
+                dispatched_at__isnull=True, wallet_id__in={event.wallet_id for event in claimed}, id__lt=ids[-1]
+            ).exclude(id__in=ids).order_by().values('wallet_id').annotate(first=Min('id')).values_list('wallet_id', 'first')
+        )
+        return [event for event in claimed if event.id < earliest.get(event.wallet_id, event.id + 1)]
+
+    def dispatch_batch(self):
+        """
+        Deliver one batch, returning (events delivered, events claimed).
+        A sink that raises leaves the batch pending with a backoff.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            claimed = self.claim(now)
+            if not claimed and self.cursor:
+                # Past the end; start again from the events held back before
+                self.cursor = 0
+                claimed = self.claim(now)
+            if not claimed:
+                return 0, 0
+            ready = self.in_wallet_order(claimed)
+            if len(ready) < len(claimed) or self.cursor:
+                self.cursor = 0 if len(claimed) < self.batch_size else claimed[-1].id
+            if not ready:
+                return 0, len(claimed)
+            ids = [event.id for event in ready]
+            messages = [as_message(event) for event in ready]
+            try:
+                for sink in self.sinks:
+                    sink.deliver(messages)
+            except Exception as exc:
+                logger.exception("Outbox delivery of %d events failed", len(ready))
+                attempts = max(event.attempts for event in ready) + 1
+                delay = min(get_setting('RETRY_DELAY') * 2 ** (attempts - 1), get_setting('MAX_RETRY_DELAY'))
+                OutboxEvent.objects.filter(id__in=ids).update(
+                    attempts=F('attempts') + 1,
+                    last_error=f"{type(exc).__name__}: {exc}"[:1000],
+                    available_at=now + timedelta(seconds=delay)
+                )
+                return 0, len(claimed)
+            OutboxEvent.objects.filter(id__in=ids).update(dispatched_at=timezone.now())
+        return len(ready), len(claimed)
+
+    def run(self, poll_interval=None, stop=None):
+        """
+        Dispatch until stop() returns true, sleeping poll_interval seconds
+        whenever a batch comes back short or delivers nothing. Returns the
+        number of events delivered.
+        """
+        poll_interval = get_setting('POLL_INTERVAL') if poll_interval is None else poll_interval
+        delivered = 0
+        while not (stop and stop()):
+            count, claimed = self.dispatch_batch()
+            delivered += count
+            # A batch that was all held back has moved the cursor on, so claim again at once
+            if claimed < self.batch_size or (count == 0 and not self.cursor):
+                time.sleep(poll_interval)
+        return delivered
+
+
+def purge_dispatched(older_than=None, batch_size=1000):
+    """
+    Delete events dispatched more than older_than (default RETENTION_DAYS) ago
+    in primary key batches, returning the number removed
+    """
+    if older_than is None:
+        older_than = timedelta(days=get_setting('RETENTION_DAYS'))
+    expired = OutboxEvent.objects.filter(dispatched_at__lt=timezone.now() - older_than)
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += OutboxEvent.objects.filter(pk__in=ids).delete()[0]
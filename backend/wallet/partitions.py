@@ -0,0 +1,105 @@
+"""
+Monthly range partitions of the Transaction table on PostgreSQL.
+
+Migration 0009 turns wallet_transaction into a table partitioned by
+created_at with one partition per calendar month (wallet_transaction_pYYYYMM)
+and a default partition for rows outside them. Queries that filter on
+created_at only scan the matching months. On other databases the table stays
+a plain table and these helpers do nothing.
+"""
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import Transaction
+
+
+TABLE = Transaction._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def month_start(value):
+    """First day of the month containing a date or datetime (in UTC)"""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(dt_timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """[start, end) of a month as UTC datetimes"""
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    end = add_months(month, 1)
+    return start, datetime(end.year, end.month, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def existing_partitions():
+    """Names of the partitions currently attached to the Transaction table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)", [TABLE]
+        )
+        return {name for name, in cursor.fetchall()}
+
+
+def create_partition(month):
+    """
+    Attach the partition for one month. Rows that already landed in the
+    default partition for that month are moved into it first, because
+    PostgreSQL refuses to add a partition that overlaps rows in the default.
+    """
+    name = connection.ops.quote_name(partition_name(month))
+    table = connection.ops.quote_name(TABLE)
+    default = connection.ops.quote_name(DEFAULT_PARTITION)
+    start, end = month_bounds(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved", [start, end]
+        )
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", [start, end])
+
+
+def ensure_partitions(months_ahead=3, today=None):
+    """
+    Create any missing partitions from the current month through months_ahead
+    months ahead. Returns the months created.
+    """
+    if not is_partitioned():
+        return []
+    current = month_start(today or datetime.now(dt_timezone.utc))
+    existing = existing_partitions()
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if partition_name(month) not in existing:
+            create_partition(month)
+            created.append(month)
+    return created
+
+
+def drop_partition(month):
+    """Drop one month's partition if it exists. Returns whether it did."""
+    if not is_partitioned() or partition_name(month) not in existing_partitions():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {connection.ops.quote_name(partition_name(month))}")
+    return True
@@ -0,0 +1,167 @@
+"""
+Check stored balances against the rows that should explain them.
+
+Expected wallet balances come from one grouped aggregate over completed
+transactions and expected piggy bank amounts from one over contributions and
+one over payouts. Stored and expected values are streamed in id order and
+merge-joined, so memory and query count stay flat however many wallets exist.
+"""
+import heapq
+from collections import namedtuple
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import chain, groupby
+from operator import itemgetter
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, Sum, Value, When
+from django.utils import timezone
+
+from . import archive, ledger
+from .models import Wallet, Transaction, PiggyBank, PiggyBankContribution
+from .statements import signed_amount
+
+
+ZERO = Decimal('0.00')
+
+
+class Discrepancy(namedtuple('Discrepancy', 'kind id stored expected')):
+    @property
+    def difference(self):
+        return self.expected - self.stored
+
+
+def money(value):
+    """Aggregates come back with backend-dependent scale (SQLite drops trailing zeros)"""
+    return ZERO if value is None else value.quantize(ZERO)
+
+
+def expected_wallet_balances(chunk_size=5000):
+    """
+    (wallet id, net of completed transactions) in wallet id order, including
+    the stored totals of archived months
+    """
+    rows = Transaction.objects.filter(status='COMPLETED').order_by('wallet_id').values('wallet_id').annotate(
+        net=Sum(signed_amount())
+    ).values_list('wallet_id', 'net')
+    merged = heapq.merge(
+        rows.iterator(chunk_size=chunk_size), archive.archived_wallet_nets(chunk_size), key=itemgetter(0)
+    )
+    for wallet_id, nets in groupby(merged, key=itemgetter(0)):
+        yield wallet_id, money(sum(money(net) for _, net in nets))
+
+
+def expected_piggybank_amounts():
+    """Contributions minus completed payouts per piggy bank id"""
+    expected = {
+        piggybank_id: money(total)
+        for piggybank_id, total in PiggyBankContribution.objects.order_by().values('piggy_bank_id').annotate(
+            total=Sum('amount')
+        ).values_list('piggy_bank_id', 'total')
+    }
+    # Payouts are the TRANSFER_IN rows that carry the paying piggy bank's id as reference
+    payouts = Transaction.objects.filter(
+        transaction_type='TRANSFER_IN', status='COMPLETED', reference_id__isnull=False
+    ).order_by().values('reference_id').annotate(total=Sum('amount')).values_list('reference_id', 'total')
+    for reference_id, total in chain(payouts, archive.archived_reference_totals().items()):
+        try:
+            piggybank_id = PiggyBank._meta.pk.to_python(reference_id)
+        except ValidationError:
+            continue
+        expected[piggybank_id] = expected.get(piggybank_id, ZERO) - money(total)
+    return expected
+
+
+def merge_join(stored_rows, expected_rows):
+    """
+    Yield (id, stored, expected) for every stored row whose expected value differs.
+    Both inputs must be sorted by id; ids missing from expected_rows expect zero.
+    """
+    expected_rows = iter(expected_rows)
+    current = next(expected_rows, None)
+    for pk, stored in stored_rows:
+        while current is not None and current[0] < pk:
+            current = next(expected_rows, None)
+        expected = ZERO
+        if current is not None and current[0] == pk:
+            expected = current[1]
+            current = next(expected_rows, None)
+        if stored != expected:
+            yield pk, stored, expected
+
+
+@contextmanager
+def snapshot():
+    """
+    Transaction in which all reads see one snapshot, so rows committed while
+    the check runs cannot show up on one side of the comparison only
+    """
+    # The isolation level can only be chosen by the statement that opens the transaction
+    repeatable = connection.vendor == 'postgresql' and not connection.in_atomic_block
+    with transaction.atomic():
+        if repeatable:
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        yield
+
+
+def find_discrepancies(chunk_size=5000):
+    """
+    Returns (wallets checked, piggy banks checked, list of Discrepancy)
+    """
+    counts = {'wallet': 0, 'piggybank': 0}
+    discrepancies = []
+
+    def counted(rows, kind):
+        for row in rows:
+            counts[kind] += 1
+            yield row
+
+    with snapshot():
+        wallets = Wallet.objects.order_by('id').values_list('id', 'balance').iterator(chunk_size=chunk_size)
+        for pk, stored, expected in merge_join(counted(wallets, 'wallet'), expected_wallet_balances(chunk_size)):
+            discrepancies.append(Discrepancy('wallet', pk, stored, expected))
+
+        expected = expected_piggybank_amounts()
+        piggy_banks = PiggyBank.objects.order_by('id').values_list('id', 'current_amount').iterator(chunk_size=chunk_size)
+        for pk, stored in counted(piggy_banks, 'piggybank'):
+            if stored != expected.get(pk, ZERO):
+                discrepancies.append(Discrepancy('piggybank', pk, stored, expected.get(pk, ZERO)))
+    return counts['wallet'], counts['piggybank'], discrepancies
+
+
+REPAIR_TARGETS = {
+    'wallet': (Wallet, 'balance', ledger.wallet_account),
+    'piggybank': (PiggyBank, 'current_amount', ledger.piggybank_account),
+}
+
+
+def repair(discrepancies, batch_size=1000):
+    """
+    Set stored balances to their expected values, batch by batch, and post the
+    corrections to the ledger as ADJUSTMENT entries. A row whose stored value
+    moved since it was checked is left alone. Returns the number repaired.
+    """
+    repaired = 0
+    for kind, (model, field, account) in REPAIR_TARGETS.items():
+        pending = [discrepancy for discrepancy in discrepancies if discrepancy.kind == kind]
+        for offset in range(0, len(pending), batch_size):
+            batch = {discrepancy.id: discrepancy for discrepancy in pending[offset:offset + batch_size]}
+            with transaction.atomic():
+                current = model.objects.select_for_update().filter(id__in=batch).values_list('id', field)
+                fixable = [batch[pk] for pk, stored in current if stored == batch[pk].stored]
+                if not fixable:
+                    continue
+                model.objects.filter(id__in=[discrepancy.id for discrepancy in fixable]).update(**{
+                    field: Case(
+                        *[When(id=discrepancy.id, then=Value(discrepancy.expected)) for discrepancy in fixable],
+                        output_field=DecimalField(max_digits=12, decimal_places=2)
+                    ),
+                    'updated_at': timezone.now(),
+                })
+                legs = [(account(discrepancy.id), discrepancy.difference) for discrepancy in fixable]
+                ledger.post('ADJUSTMENT', legs + [(ledger.ADJUSTMENT_ACCOUNT, -sum(amount for _, amount in legs))],
+                            "Reconciliation repair")
+                repaired += len(fixable)
+    return repaired
@@ -70,6 +70,37 @@ class TransferSerializer(serializers.Serializer):
             raise serializers.ValidationError("Recipient wallet not found or inactive")
 
 
+class BulkTransferItemSerializer(serializers.Serializer):
+    """
+    Serializer for a single payout inside a bulk transfer
+    """
+    recipient_wallet_id = serializers.UUIDField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    description = serializers.CharField(max_length=255, required=False, default='Bulk payout')
+
+
+class BulkTransferSerializer(serializers.Serializer):
+    """
+    Serializer for settling many transfers from one wallet at once.
+    Recipients are checked by the transfer engine in a single query rather than per item.
+    """
+    MAX_TRANSFERS = 1000
+
+    transfers = BulkTransferItemSerializer(many=True, allow_empty=False, max_length=MAX_TRANSFERS)
+    partial = serializers.BooleanField(required=False, default=False)
+
+
+class BulkTransferResultSerializer(serializers.Serializer):
+    """
+    Serializer for the outcome of one bulk transfer item
+    """
+    recipient_wallet_id = serializers.UUIDField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    status = serializers.CharField()
+    transaction_id = serializers.UUIDField(required=False)
+    error = serializers.CharField(required=False)
+
+
 class PiggyBankSerializer(serializers.ModelSerializer):
     """
     Serializer for PiggyBank model
@@ -88,9 +119,14 @@ class PiggyBankSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'creator', 'current_amount', 'is_active', 'created_at', 'updated_at')
 
     def get_members_count(self, obj):
+        # Querysets built with PiggyBank.objects.with_counts() carry the count already
+        if hasattr(obj, 'active_members_count'):
+            return obj.active_members_count or 0
         return obj.members.filter(is_active=True).count()
 
     def get_contributions_count(self, obj):
+        if hasattr(obj, 'contribution_total_count'):
+            return obj.contribution_total_count or 0
         return obj.contributions.count()
 
     def create(self, validated_data):
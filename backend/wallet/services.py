@@ -0,0 +1,278 @@
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from . import events, ledger, outbox
+from .models import Wallet, Transaction, PiggyBank, PiggyBankContribution
+
+
+class InsufficientFunds(Exception):
+    """
+    Raised when a conditional debit finds the balance too low
+    """
+
+
+def debit_wallet(wallet_id, amount):
+    """
+    Atomically subtract amount from a wallet with a single conditional UPDATE.
+    Only balance and updated_at are written.
+    """
+    updated = Wallet.objects.filter(id=wallet_id, is_active=True, balance__gte=amount).update(
+        balance=F('balance') - amount,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        raise InsufficientFunds()
+
+
+def credit_wallet(wallet_id, amount):
+    """
+    Atomically add amount to a wallet
+    """
+    Wallet.objects.filter(id=wallet_id).update(
+        balance=F('balance') + amount,
+        updated_at=timezone.now()
+    )
+
+
+def debit_piggybank(piggybank_id, amount):
+    """
+    Atomically subtract amount from a piggy bank, failing if it holds too little
+    """
+    updated = PiggyBank.objects.filter(id=piggybank_id, is_active=True, current_amount__gte=amount).update(
+        current_amount=F('current_amount') - amount,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        raise InsufficientFunds()
+
+
+def credit_piggybank(piggybank_id, amount):
+    """
+    Atomically add amount to a piggy bank
+    """
+    PiggyBank.objects.filter(id=piggybank_id).update(
+        current_amount=F('current_amount') + amount,
+        updated_at=timezone.now()
+    )
+
+
+def transfer_funds(sender_wallet, recipient_wallet, amount, description, assessment=None):
+    """
+    Move amount between two wallets and record the linked TRANSFER_OUT/TRANSFER_IN pair.
+
+    The wallet rows are updated in UUID order so that two opposite transfers
+    always take their row locks in the same sequence and cannot deadlock. Both
+    transaction rows are written with one bulk INSERT, the balanced journal
+    entry with two more and both outbox events with one, so a transfer is a
+    fixed six statements inside the database transaction, eight counting the
+    BEGIN/COMMIT (or SAVEPOINT/RELEASE when nested) around them.
+    The fraud assessment, if given, is stored on the TRANSFER_OUT row.
+    Raises InsufficientFunds if the sender cannot cover the amount.
+    """
+    sender_txn = Transaction(
+        wallet=sender_wallet,
+        transaction_type='TRANSFER_OUT',
+        amount=amount,
+        status='COMPLETED',
+        description=f"Transfer to {recipient_wallet.owner.username}: {description}",
+        related_wallet=recipient_wallet,
+        **(assessment.transaction_fields() if assessment else {})
+    )
+    recipient_txn = Transaction(
+        wallet=recipient_wallet,
+        transaction_type='TRANSFER_IN',
+        amount=amount,
+        status='COMPLETED',
+        description=f"Transfer from {sender_wallet.owner.username}: {description}",
+        related_wallet=sender_wallet,
+        related_transaction=sender_txn
+    )
+    sender_txn.related_transaction = recipient_txn
+
+    with transaction.atomic():
+        for wallet_id in sorted({sender_wallet.id, recipient_wallet.id}):
+            if wallet_id == sender_wallet.id:
+                debit_wallet(sender_wallet.id, amount)
+            if wallet_id == recipient_wallet.id:
+                credit_wallet(recipient_wallet.id, amount)
+
+        Transaction.objects.bulk_create([sender_txn, recipient_txn])
+        ledger.post('TRANSFER', [
+            (ledger.wallet_account(sender_wallet.id), -amount),
+            (ledger.wallet_account(recipient_wallet.id), amount),
+        ], description, transaction=sender_txn)
+        outbox.record_transactions([sender_txn, recipient_txn])
+        events.publish_transactions([sender_txn, recipient_txn])
+
+    return sender_txn
+
+
+def deposit_funds(wallet, amount, description):
+    """
+    Credit a wallet from outside the system and record the DEPOSIT row and its journal entry
+    """
+    with transaction.atomic():
+        txn = Transaction.objects.create(
+            wallet=wallet,
+            transaction_type='DEPOSIT',
+            amount=amount,
+            status='COMPLETED',
+            description=description
+        )
+        credit_wallet(wallet.id, amount)
+        ledger.post('DEPOSIT', [
+            (ledger.EXTERNAL_ACCOUNT, -amount),
+            (ledger.wallet_account(wallet.id), amount),
+        ], description, transaction=txn)
+        outbox.record_transactions([txn])
+        events.publish_transactions([txn])
+    return txn
+
+
+def contribute_funds(piggy_bank, wallet, contributor, amount, assessment=None):
+    """
+    Move amount from a member's wallet into a piggy bank, recording the
+    PIGGYBANK_CONTRIBUTION row, the contribution and the journal entry.
+    Raises InsufficientFunds if the wallet cannot cover the amount.
+    """
+    with transaction.atomic():
+        # Debit first so a concurrent overdraw aborts before anything is written
+        debit_wallet(wallet.id, amount)
+        credit_piggybank(piggy_bank.id, amount)
+
+        txn = Transaction.objects.create(
+            wallet=wallet,
+            transaction_type='PIGGYBANK_CONTRIBUTION',
+            amount=amount,
+            status='COMPLETED',
+            description=f"Contribution to {piggy_bank.name}",
+            reference_id=str(piggy_bank.id),
+            **(assessment.transaction_fields() if assessment else {})
+        )
+        contribution = PiggyBankContribution.objects.create(
+            piggy_bank=piggy_bank,
+            contributor=contributor,
+            wallet=wallet,
+            amount=amount,
+            transaction=txn
+        )
+        ledger.post('PIGGYBANK_CONTRIBUTION', [
+            (ledger.wallet_account(wallet.id), -amount),
+            (ledger.piggybank_account(piggy_bank.id), amount),
+        ], f"Contribution to {piggy_bank.name}", transaction=txn)
+        outbox.record_transactions([txn])
+        outbox.record_contribution(contribution)
+        events.publish_transactions([txn])
+        events.publish_contribution(contribution)
+    return contribution
+
+
+class BulkTransferFailed(Exception):
+    """
+    Raised when an all-or-nothing bulk transfer has at least one invalid item
+    """
+    def __init__(self, results):
+        super().__init__("Bulk transfer rejected")
+        self.results = results
+
+
+def bulk_transfer(sender_wallet, items, partial=False):
+    """
+    Settle a batch of payouts from one wallet inside a single database transaction.
+
+    items is a list of dicts with recipient_wallet_id, amount and description.
+    The sender and every recipient are locked with one SELECT ... FOR UPDATE in
+    UUID order, the sender is debited once, all recipients are credited with a
+    single CASE update, the TRANSFER_OUT/TRANSFER_IN pairs go in with one
+    bulk_create, as do their outbox events, and the whole batch is one journal
+    entry, so the statement count does not grow with the batch size.
+
+    Returns a list of per-item results. When partial is False any invalid item
+    raises BulkTransferFailed and nothing is written; otherwise invalid items
+    are skipped and the rest are settled.
+    """
+    recipient_ids = {item['recipient_wallet_id'] for item in items}
+
+    with transaction.atomic():
+        wallets = {
+            wallet.id: wallet
+            for wallet in Wallet.objects.select_for_update(of=('self',)).select_related('owner').filter(
+                id__in=recipient_ids | {sender_wallet.id}, is_active=True
+            ).order_by('id')
+        }
+        sender = wallets.get(sender_wallet.id)
+        if sender is None:
+            raise Wallet.DoesNotExist("Sender wallet not found or inactive")
+        available = sender.balance
+
+        results = []
+        transactions = []
+        credits = {}
+        total = Decimal('0.00')
+        for item in items:
+            recipient = wallets.get(item['recipient_wallet_id'])
+            amount = item['amount']
+            result = {
+                'recipient_wallet_id': item['recipient_wallet_id'],
+                'amount': amount,
+            }
+            results.append(result)
+
+            if recipient is None:
+                result.update(status='FAILED', error='Recipient wallet not found or inactive')
+                continue
+            if recipient.id == sender.id:
+                result.update(status='FAILED', error='Cannot transfer to the same wallet')
+                continue
+            if total + amount > available:
+                result.update(status='FAILED', error='Insufficient balance')
+                continue
+
+            sender_txn = Transaction(
+                wallet=sender,
+                transaction_type='TRANSFER_OUT',
+                amount=amount,
+                status='COMPLETED',
+                description=f"Transfer to {recipient.owner.username}: {item['description']}",
+                related_wallet=recipient
+            )
+            recipient_txn = Transaction(
+                wallet=recipient,
+                transaction_type='TRANSFER_IN',
+                amount=amount,
+                status='COMPLETED',
+                description=f"Transfer from {sender.owner.username}: {item['description']}",
+                related_wallet=sender,
+                related_transaction=sender_txn
+            )
+            sender_txn.related_transaction = recipient_txn
+            transactions.extend([sender_txn, recipient_txn])
+
+            credits[recipient.id] = credits.get(recipient.id, Decimal('0.00')) + amount
+            total += amount
+            result.update(status='COMPLETED', transaction_id=sender_txn.id)
+
+        if not partial and any(result['status'] == 'FAILED' for result in results):
+            raise BulkTransferFailed(results)
+
+        if transactions:
+            debit_wallet(sender.id, total)
+            now = timezone.now()
+            Wallet.objects.filter(id__in=credits).update(
+                balance=F('balance') + Case(
+                    *[When(id=wallet_id, then=Value(amount)) for wallet_id, amount in credits.items()],
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2)
+                ),
+                updated_at=now
+            )
+            Transaction.objects.bulk_create(transactions)
+            ledger.post('BULK_TRANSFER', [(ledger.wallet_account(sender.id), -total)] + [
+                (ledger.wallet_account(wallet_id), amount) for wallet_id, amount in credits.items()
+            ], f"Bulk transfer to {len(credits)} wallets")
+            outbox.record_transactions(transactions)
+            events.publish_transactions(transactions)
+
+    return results
@@ -0,0 +1,111 @@
+import csv
+import json
+from decimal import Decimal
+from itertools import chain
+
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from . import archive
+from .models import Transaction
+
+
+STATEMENT_COLUMNS = (
+    'id', 'created_at', 'transaction_type', 'status', 'description',
+    'reference_id', 'related_wallet', 'amount', 'balance',
+)
+
+STATEMENT_FIELDS = (
+    'id', 'created_at', 'transaction_type', 'status', 'description',
+    'reference_id', 'related_wallet_id', 'amount',
+)
+
+STATEMENT_CHUNK_SIZE = 2000
+
+
+def signed_amount():
+    """
+    Expression for a transaction's effect on its own wallet's balance
+    """
+    return Case(
+        When(transaction_type__in=Transaction.CREDIT_TYPES, then=F('amount')),
+        When(transaction_type__in=Transaction.DEBIT_TYPES, then=-F('amount')),
+        default=Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+def opening_balance(wallet, since):
+    """
+    Balance of the wallet just before since, from one aggregate over earlier
+    completed rows plus the stored totals of archived months
+    """
+    if since is None:
+        return Decimal('0.00')
+    return Transaction.objects.filter(
+        wallet=wallet, status='COMPLETED', created_at__lt=since
+    ).aggregate(
+        total=Coalesce(Sum(signed_amount()), Value(Decimal('0.00')), output_field=DecimalField())
+    )['total'] + archive.archived_net_before(wallet, since)
+
+
+def statement_rows(wallet, since=None, until=None):
+    """
+    Yield statement rows oldest first with a running balance.
+
+    Rows are read as plain tuples through a server-side cursor, so memory use
+    does not depend on the length of the history. Archived months come first,
+    decoded one month at a time.
+    """
+    queryset = Transaction.objects.filter(wallet=wallet)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+
+    balance = opening_balance(wallet, since)
+    rows = queryset.order_by('created_at', 'id').values_list(*STATEMENT_FIELDS)
+    archived = (
+        tuple(record[column] for column in STATEMENT_FIELDS)
+        for record in archive.archived_rows(wallet, since, until)
+    )
+    for row in chain(archived, rows.iterator(chunk_size=STATEMENT_CHUNK_SIZE)):
+        transaction_type, txn_status, amount = row[2], row[3], row[7]
+        if txn_status == 'COMPLETED':
+            if transaction_type in Transaction.CREDIT_TYPES:
+                balance += amount
+            elif transaction_type in Transaction.DEBIT_TYPES:
+                balance -= amount
+        yield row + (balance,)
+
+
+class _Echo:
+    """
+    File-like object whose write() hands the line back to the csv writer's caller
+    """
+    def write(self, value):
+        return value
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(STATEMENT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([_format_value(value) for value in row])
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        record = {
+            column: (None if value is None else _format_value(value))
+            for column, value in zip(STATEMENT_COLUMNS, row)
+        }
+        yield json.dumps(record) + '\n'
@@ -0,0 +1,173 @@
+"""
+ASGI application serving the event stream at /api/events/.
+
+A logged-in user connects with Server-Sent Events (GET with
+Accept: text/event-stream) or a WebSocket and receives the events published
+by wallet.events for their wallets and for the piggy banks they could access
+when they connected. A new piggy bank shows up after reconnecting.
+
+Streams are long-lived and mostly idle, so this is plain ASGI in front of
+Django (see backend/asgi.py) rather than a Django view: Django runs each
+request's middleware on a thread that lives as long as the request, while an
+idle connection here is just a waiting coroutine and its bounded queue. The
+session cookie is checked the way Django's auth middleware would.
+
+SSE frames are "event: <name>" plus "data: <json>"; WebSocket messages are
+{"event": <name>, "data": {...}}. An "overflow" event means messages were
+dropped because the client fell behind; it should refetch over the REST API.
+"""
+import asyncio
+import functools
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.http import HttpRequest
+from django.http.cookie import parse_cookie
+from django.http.request import validate_host
+
+from . import events, membership
+
+
+OVERFLOW = events.Message('overflow', '{}')
+
+
+def _headers(scope):
+    return {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers', [])}
+
+
+async def authenticate(scope):
+    """The active user logged in with the request's session cookie, or None"""
+    session_key = parse_cookie(_headers(scope).get('cookie', '')).get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return None
+    request = HttpRequest()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user = await aget_user(request)
+    return user if user.is_authenticated and user.is_active else None
+
+
+def origin_allowed(scope):
+    """
+    Browsers send cookies with cross-site WebSocket handshakes, so those are
+    only accepted from this site's own hosts or CSRF_TRUSTED_ORIGINS
+    """
+    origin = _headers(scope).get('origin')
+    if origin is None:
+        return True
+    if origin in settings.CSRF_TRUSTED_ORIGINS:
+        return True
+    host = urlsplit(origin).hostname
+    return bool(host) and validate_host(host, settings.ALLOWED_HOSTS)
+
+
+async def channels_for(user):
+    piggybank_ids = await membership.aaccessible_ids(user.id)
+    return [events.user_channel(user.id)] + [events.piggybank_channel(piggybank_id) for piggybank_id in piggybank_ids]
+
+
+# Every subscriber of a channel is sent the same message, so it is framed once
+@functools.lru_cache(maxsize=1024)
+def sse_frame(message):
+    return f'event: {message.event}\ndata: {message.data}\n\n'.encode()
+
+
+@functools.lru_cache(maxsize=1024)
+def websocket_frame(message):
+    return f'{{"event":"{message.event}","data":{message.data}}}'
+
+
+async def _close_on_disconnect(receive, disconnect, subscriber):
+    while (await receive())['type'] != disconnect:
+        pass
+    subscriber.close()
+
+
+class EventStreamApp:
+    """
+    ASGI application for the event stream; handles 'http' (SSE) and 'websocket' scopes
+    """
+    def __init__(self, broker=None):
+        self.broker = broker
+
+    def get_broker(self):
+        return self.broker or events.get_broker()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'websocket':
+            await self.websocket(scope, receive, send)
+        else:
+            await self.server_sent_events(scope, receive, send)
+
+    async def reply(self, send, status, body, headers=()):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), *headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def stream(self, subscriber, receive, disconnect, send_messages, heartbeat=None):
+        """Hand queued messages to send_messages until the client disconnects"""
+        watcher = asyncio.ensure_future(_close_on_disconnect(receive, disconnect, subscriber))
+        try:
+            while True:
+                messages, overflowed = await subscriber.get(heartbeat)
+                if subscriber.closed:
+                    break
+                await send_messages([OVERFLOW, *messages] if overflowed else messages)
+        except OSError:
+            # The server could not write to a client that went away
+            pass
+        finally:
+            self.get_broker().unsubscribe(subscriber)
+            watcher.cancel()
+
+    async def server_sent_events(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            await self.reply(send, 405, b'{"detail":"Method not allowed."}', [(b'allow', b'GET')])
+            return
+        user = await authenticate(scope)
+        if user is None:
+            await self.reply(send, 403, b'{"detail":"Authentication credentials were not provided."}')
+            return
+
+        subscriber = self.get_broker().subscribe(await channels_for(user))
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Keep nginx from buffering the stream
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+
+        async def send_messages(messages):
+            # An empty batch is a heartbeat, which also lets proxies see the connection is alive
+            body = b''.join(sse_frame(message) for message in messages) or b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        await self.stream(subscriber, receive, 'http.disconnect', send_messages, events.get_setting('HEARTBEAT'))
+
+    async def websocket(self, scope, receive, send):
+        if (await receive())['type'] != 'websocket.connect':
+            return
+        user = await authenticate(scope) if origin_allowed(scope) else None
+        if user is None:
+            # Closing before accepting answers the handshake with 403
+            await send({'type': 'websocket.close', 'code': 1008})
+            return
+
+        subscriber = self.get_broker().subscribe(await channels_for(user))
+        await send({'type': 'websocket.accept'})
+
+        async def send_messages(messages):
+            for message in messages:
+                await send({'type': 'websocket.send', 'text': websocket_frame(message)})
+
+        # WebSocket servers ping idle connections themselves
+        await self.stream(subscriber, receive, 'websocket.disconnect', send_messages)
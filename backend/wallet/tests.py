@@ -1,10 +1,111 @@
-from django.test import TestCase
+import asyncio
+import http.server
+import json
+import numpy as np
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from decimal import Decimal
 from users.models import User
-from .models import Wallet, Transaction, PiggyBank, PiggyBankContribution, PiggyBankMember
+from .models import (
+    Wallet, Transaction, PiggyBank, PiggyBankContribution, PiggyBankMember, IdempotencyKey, JournalEntry, Posting,
+    BalanceCheckpoint, ArchivedTransactionBatch, OutboxEvent
+)
+from api.renderers import ORJSONRenderer
+from rest_framework.renderers import JSONRenderer
+from .batch_scoring import compute_features, score_wallets
+from .fast_serializers import serialize_transactions, serialize_wallets, transaction_rows, wallet_rows
+from .fraud import ALLOW, Assessment, BaseScorer, RuleBasedScorer, ScoringEvent
+from .graph import TransferGraph, analyze, connected_components, find_cycles, strongly_connected_components
+from .ids import uuid7, uuid7_time
+from . import events, membership, outbox
+from .ledger import UnbalancedEntry, balance_as_of, create_checkpoints, piggybank_account, post, wallet_account
+from .serializers import TransactionSerializer, WalletSerializer
+from .services import InsufficientFunds, contribute_funds, debit_wallet, deposit_funds, transfer_funds
+from .streams import EventStreamApp
+from .velocity import InMemoryVelocityStore, SQLiteVelocityStore, WindowCounter, get_store, rebuild_from_transactions
+
+
+class QueryBudgetMixin:
+    """
+    Assert that an endpoint stays within a fixed number of queries
+    regardless of how many rows it returns
+    """
+
+    def assertQueryBudget(self, url, budget, grow=None, data=None):
+        """
+        grow, if given, adds rows; it is called before and after the first
+        measurement so both runs return a non-empty page
+        """
+        if grow is not None:
+            grow()
+        with CaptureQueriesContext(connection) as before:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        if grow is not None:
+            grow()
+            with CaptureQueriesContext(connection) as after:
+                self.client.get(url, data)
+            self.assertEqual(
+                len(after), len(before),
+                f"{url} query count grows with the number of rows: {len(before)} -> {len(after)}"
+            )
+
+        self.assertLessEqual(
+            len(before), budget,
+            f"{url} ran {len(before)} queries, budget is {budget}:\n"
+            + "\n".join(query['sql'] for query in before.captured_queries)
+        )
+        return response
+
+
+class FixedScorer(BaseScorer):
+    """Scorer returning a fixed score for fraud screening tests"""
+    score_value = 0.0
+
+    def score(self, event):
+        return self.score_value, ['fixed']
+
+
+class HoldScorer(FixedScorer):
+    score_value = 0.75
+
+
+class DenyScorer(FixedScorer):
+    score_value = 0.95
+
+
+class SlowScorer(BaseScorer):
+    def score(self, event):
+        time.sleep(0.05)
+        return 1.0, ['slow']
+
+
+class LoopCheckingVelocityStore(SQLiteVelocityStore):
+    """SQLite store noting whether each deposit was recorded on an event loop thread"""
+    calls = []
+
+    def record_deposit(self, *args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            self.calls.append('event loop')
+        except RuntimeError:
+            self.calls.append('thread')
+        return super().record_deposit(*args, **kwargs)
 
 
 class WalletModelTest(TestCase):
@@ -39,6 +140,83 @@ class WalletModelTest(TestCase):
         self.assertTrue(wallet.can_debit(Decimal('100.00')))
         self.assertFalse(wallet.can_debit(Decimal('150.00')))
 
+    def test_time_ordered_ids(self):
+        """Test new wallets and transactions get increasing UUIDv7 ids"""
+        wallets = [Wallet.objects.create(owner=self.user, name=f'Wallet {i}') for i in range(3)]
+        txns = [
+            Transaction.objects.create(wallet=wallets[0], transaction_type='DEPOSIT', amount=Decimal('1.00'))
+            for _ in range(3)
+        ]
+
+        for rows in (wallets, txns):
+            self.assertEqual({row.id.version for row in rows}, {7})
+            self.assertEqual(list(type(rows[0]).objects.order_by('id')), rows)
+        self.assertLess(abs(uuid7_time(txns[0].id) - txns[0].created_at), timedelta(seconds=5))
+        self.assertEqual(len({uuid7() for _ in range(10000)}), 10000)
+
+
+class TransferServiceTest(TestCase):
+    """Test cases for the atomic balance update helpers"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.sender = Wallet.objects.create(owner=self.user, name='Sender', balance=Decimal('100.00'))
+        self.recipient = Wallet.objects.create(owner=self.other_user, name='Recipient')
+
+    def test_debit_wallet_insufficient_balance(self):
+        """Test conditional debit leaves the balance untouched when too low"""
+        with self.assertRaises(InsufficientFunds):
+            debit_wallet(self.sender.id, Decimal('100.01'))
+        self.sender.refresh_from_db()
+        self.assertEqual(self.sender.balance, Decimal('100.00'))
+
+    def test_debit_wallet_uses_current_balance(self):
+        """Test debit is applied against the database value, not a stale instance"""
+        stale = Wallet.objects.get(id=self.sender.id)
+        debit_wallet(self.sender.id, Decimal('60.00'))
+        with self.assertRaises(InsufficientFunds):
+            debit_wallet(stale.id, Decimal('60.00'))
+        self.sender.refresh_from_db()
+        self.assertEqual(self.sender.balance, Decimal('40.00'))
+
+    def test_transfer_funds_links_transactions(self):
+        """Test transfer updates both balances and links the transaction pair"""
+        sender_txn = transfer_funds(self.sender, self.recipient, Decimal('30.00'), 'Lunch')
+
+        self.sender.refresh_from_db()
+        self.recipient.refresh_from_db()
+        self.assertEqual(self.sender.balance, Decimal('70.00'))
+        self.assertEqual(self.recipient.balance, Decimal('30.00'))
+
+        sender_txn = Transaction.objects.get(id=sender_txn.id)
+        recipient_txn = sender_txn.related_transaction
+        self.assertEqual(sender_txn.transaction_type, 'TRANSFER_OUT')
+        self.assertEqual(recipient_txn.transaction_type, 'TRANSFER_IN')
+        self.assertEqual(recipient_txn.related_transaction_id, sender_txn.id)
+
+    def test_transfer_funds_query_count(self):
+        """Test a transfer is six statements plus the SAVEPOINT/RELEASE of its nested atomic block"""
+        with self.assertNumQueries(8):
+            transfer_funds(self.sender, self.recipient, Decimal('10.00'), 'Coffee')
+
+    def test_transfer_funds_rolls_back_on_insufficient_balance(self):
+        """Test a failed debit leaves no partial credit behind"""
+        with self.assertRaises(InsufficientFunds):
+            transfer_funds(self.sender, self.recipient, Decimal('500.00'), 'Too much')
+
+        self.recipient.refresh_from_db()
+        self.assertEqual(self.recipient.balance, Decimal('0.00'))
+        self.assertEqual(Transaction.objects.count(), 0)
+
 
 class WalletAPITest(APITestCase):
     """Test cases for Wallet API endpoints"""
@@ -151,6 +329,1583 @@ class WalletAPITest(APITestCase):
         self.assertIn('Insufficient balance', response.data['error'])
 
 
+class BulkTransferAPITest(APITestCase):
+    """Test cases for the bulk transfer endpoint"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.sender_wallet = Wallet.objects.create(owner=self.user, name='Payroll', balance=Decimal('100.00'))
+        self.recipient_wallets = []
+        for index in range(3):
+            recipient = User.objects.create_user(
+                username=f'recipient{index}',
+                email=f'recipient{index}@example.com',
+                password='testpass123'
+            )
+            self.recipient_wallets.append(Wallet.objects.create(owner=recipient, name='Recipient Wallet'))
+        self.url = reverse('wallet-bulk-transfer', kwargs={'wallet_id': self.sender_wallet.id})
+
+    def test_bulk_transfer(self):
+        """Test a batch credits every recipient and debits the sender once"""
+        data = {
+            'transfers': [
+                {'recipient_wallet_id': str(wallet.id), 'amount': '20.00'}
+                for wallet in self.recipient_wallets
+            ] + [{'recipient_wallet_id': str(self.recipient_wallets[0].id), 'amount': '5.00'}]
+        }
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['completed'], 4)
+        self.assertEqual(response.data['total_amount'], '65.00')
+        self.sender_wallet.refresh_from_db()
+        self.assertEqual(self.sender_wallet.balance, Decimal('35.00'))
+        balances = [Wallet.objects.get(id=wallet.id).balance for wallet in self.recipient_wallets]
+        self.assertEqual(balances, [Decimal('25.00'), Decimal('20.00'), Decimal('20.00')])
+        self.assertEqual(Transaction.objects.filter(transaction_type='TRANSFER_OUT').count(), 4)
+        self.assertEqual(Transaction.objects.filter(transaction_type='TRANSFER_IN').count(), 4)
+
+    def test_bulk_transfer_all_or_nothing(self):
+        """Test one bad item rejects the whole batch"""
+        data = {
+            'transfers': [
+                {'recipient_wallet_id': str(self.recipient_wallets[0].id), 'amount': '60.00'},
+                {'recipient_wallet_id': str(self.recipient_wallets[1].id), 'amount': '60.00'},
+            ]
+        }
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['results'][0]['status'], 'COMPLETED')
+        self.assertEqual(response.data['results'][1]['error'], 'Insufficient balance')
+        self.sender_wallet.refresh_from_db()
+        self.assertEqual(self.sender_wallet.balance, Decimal('100.00'))
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_bulk_transfer_partial(self):
+        """Test partial mode settles valid items and reports the rest"""
+        inactive_wallet = self.recipient_wallets[2]
+        inactive_wallet.is_active = False
+        inactive_wallet.save()
+        data = {
+            'partial': True,
+            'transfers': [
+                {'recipient_wallet_id': str(self.recipient_wallets[0].id), 'amount': '60.00'},
+                {'recipient_wallet_id': str(self.recipient_wallets[1].id), 'amount': '60.00'},
+                {'recipient_wallet_id': str(inactive_wallet.id), 'amount': '10.00'},
+                {'recipient_wallet_id': str(self.recipient_wallets[1].id), 'amount': '30.00'},
+            ]
+        }
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['completed'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['COMPLETED', 'FAILED', 'FAILED', 'COMPLETED']
+        )
+        self.sender_wallet.refresh_from_db()
+        self.assertEqual(self.sender_wallet.balance, Decimal('10.00'))
+
+    def test_bulk_transfer_to_the_sending_wallet_fails(self):
+        """Test an item paying the sender's own wallet fails instead of moving money in a circle"""
+        data = {
+            'partial': True,
+            'transfers': [
+                {'recipient_wallet_id': str(self.sender_wallet.id), 'amount': '10.00'},
+                {'recipient_wallet_id': str(self.recipient_wallets[0].id), 'amount': '10.00'},
+            ]
+        }
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['status'], 'FAILED')
+        self.assertEqual(response.data['results'][0]['error'], 'Cannot transfer to the same wallet')
+        self.assertEqual(response.data['completed'], 1)
+        self.sender_wallet.refresh_from_db()
+        self.assertEqual(self.sender_wallet.balance, Decimal('90.00'))
+        self.assertFalse(Transaction.objects.filter(wallet=self.sender_wallet, transaction_type='TRANSFER_IN').exists())
+
+
+class IdempotencyKeyAPITest(APITestCase):
+    """Test cases for Idempotency-Key handling on money movement endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.wallet = Wallet.objects.create(owner=self.user, name='Test Wallet')
+        self.url = reverse('wallet-deposit', kwargs={'wallet_id': self.wallet.id})
+
+    def test_retry_replays_stored_response(self):
+        """Test a retried deposit is answered from the stored response"""
+        data = {'amount': '100.00', 'description': 'Retry me'}
+
+        first = self.client.post(self.url, data, HTTP_IDEMPOTENCY_KEY='deposit-1')
+        second = self.client.post(self.url, data, HTTP_IDEMPOTENCY_KEY='deposit-1')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('100.00'))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_key_reused_with_different_payload(self):
+        """Test reusing a key for another request is rejected"""
+        self.client.post(self.url, {'amount': '100.00'}, HTTP_IDEMPOTENCY_KEY='deposit-1')
+        response = self.client.post(self.url, {'amount': '200.00'}, HTTP_IDEMPOTENCY_KEY='deposit-1')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_expired_key_is_executed_again(self):
+        """Test a key past its TTL no longer replays and purge removes it"""
+        data = {'amount': '100.00'}
+        self.client.post(self.url, data, HTTP_IDEMPOTENCY_KEY='deposit-1')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        response = self.client.post(self.url, data, HTTP_IDEMPOTENCY_KEY='deposit-1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertEqual(IdempotencyKey.objects.count(), 0)
+
+
+class WalletTransactionListAPITest(APITestCase):
+    """Test cases for listing wallet transactions"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.wallet = Wallet.objects.create(owner=self.user, name='Test Wallet')
+        self.url = reverse('wallet-transactions', kwargs={'wallet_id': self.wallet.id})
+        same_time = timezone.now() - timedelta(days=1)
+        self.transactions = Transaction.objects.bulk_create([
+            Transaction(
+                wallet=self.wallet,
+                transaction_type='DEPOSIT' if index % 2 else 'WITHDRAWAL',
+                amount=Decimal('1.00') + index,
+                status='COMPLETED'
+            )
+            for index in range(7)
+        ])
+        # Force ties on created_at so the id tie-breaker is exercised
+        Transaction.objects.filter(id__in=[txn.id for txn in self.transactions[:4]]).update(created_at=same_time)
+
+    def test_page_number_pagination_is_default(self):
+        """Test offset paging is still used without a cursor"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 7)
+
+    def test_cursor_pagination_walks_every_row_once(self):
+        """Test following next links returns each transaction exactly once"""
+        seen = []
+        url = f'{self.url}?pagination=cursor&page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(set(seen), {str(txn.id) for txn in self.transactions})
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filters(self):
+        """Test since and type filters narrow the results"""
+        since = (timezone.now() - timedelta(hours=1)).isoformat()
+
+        response = self.client.get(self.url, {'pagination': 'cursor', 'since': since})
+        self.assertEqual(len(response.data['results']), 3)
+
+        response = self.client.get(self.url, {'pagination': 'cursor', 'type': 'DEPOSIT'})
+        self.assertEqual(len(response.data['results']), 3)
+
+        response = self.client.get(self.url, {'type': 'BOGUS'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QueryBudgetTest(QueryBudgetMixin, APITestCase):
+    """Test cases keeping list endpoints at a constant number of queries"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.wallet = Wallet.objects.create(owner=self.user, name='Main', balance=Decimal('1000.00'))
+        self.other_wallet = Wallet.objects.create(owner=self.other_user, name='Other')
+        self.piggy_bank = PiggyBank.objects.create(name='Fund', creator=self.user, target_amount=Decimal('500.00'))
+
+    def add_rows(self):
+        for index in range(3):
+            Wallet.objects.create(owner=self.user, name=f'Extra {index}')
+            transfer_funds(self.wallet, self.other_wallet, Decimal('1.00'), 'Budget test')
+            piggy_bank = PiggyBank.objects.create(
+                name=f'Fund {index}', creator=self.other_user, target_amount=Decimal('10.00')
+            )
+            suffix = PiggyBankMember.objects.count()
+            member = User.objects.create(username=f'member{suffix}', email=f'member{suffix}@example.com')
+            PiggyBankMember.objects.create(piggy_bank=piggy_bank, user=self.user)
+            PiggyBankMember.objects.create(piggy_bank=self.piggy_bank, user=member)
+            txn = Transaction.objects.create(
+                wallet=self.wallet, transaction_type='PIGGYBANK_CONTRIBUTION', amount=Decimal('1.00'),
+                status='COMPLETED'
+            )
+            PiggyBankContribution.objects.create(
+                piggy_bank=self.piggy_bank, contributor=self.user, wallet=self.wallet,
+                amount=Decimal('1.00'), transaction=txn
+            )
+        membership.invalidate(self.user.id)
+
+    def test_wallet_list(self):
+        """Test wallet list is the cache version read, a count and one select"""
+        self.assertQueryBudget(reverse('wallet-list-create'), 3, grow=self.add_rows)
+
+    def test_wallet_transactions(self):
+        """Test transaction list does not resolve owners per row"""
+        url = reverse('wallet-transactions', kwargs={'wallet_id': self.wallet.id})
+        self.assertQueryBudget(url, 3, grow=self.add_rows)
+        self.assertQueryBudget(url, 2, data={'pagination': 'cursor'})
+
+    def test_piggybank_list(self):
+        """Test piggy bank counts are annotated instead of queried per row"""
+        url = reverse('piggybank-list-create')
+        response = self.assertQueryBudget(url, 3, grow=self.add_rows)
+        own = next(item for item in response.data['results'] if item['id'] == str(self.piggy_bank.id))
+        self.assertEqual(own['members_count'], 3)
+        self.assertEqual(own['contributions_count'], 3)
+
+        # With the membership index warm it is a count plus one select
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data['count'], 7)
+
+    def test_piggybank_contributions_and_members(self):
+        """Test contribution and member lists load related rows in the same query"""
+        kwargs = {'piggybank_id': self.piggy_bank.id}
+        self.assertQueryBudget(reverse('piggybank-contributions', kwargs=kwargs), 3, grow=self.add_rows)
+        self.assertQueryBudget(reverse('piggybank-members', kwargs=kwargs), 3)
+
+
+class WalletStatementAPITest(APITestCase):
+    """Test cases for the streamed wallet statement export"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.wallet = Wallet.objects.create(owner=self.user, name='Test Wallet')
+        self.url = reverse('wallet-statement', kwargs={'wallet_id': self.wallet.id})
+        base = timezone.now() - timedelta(days=10)
+        rows = [
+            ('DEPOSIT', '100.00', 'COMPLETED'),
+            ('TRANSFER_OUT', '30.00', 'COMPLETED'),
+            ('WITHDRAWAL', '500.00', 'FAILED'),
+            ('TRANSFER_IN', '5.50', 'COMPLETED'),
+        ]
+        for index, (transaction_type, amount, txn_status) in enumerate(rows):
+            txn = Transaction.objects.create(
+                wallet=self.wallet, transaction_type=transaction_type,
+                amount=Decimal(amount), status=txn_status
+            )
+            Transaction.objects.filter(id=txn.id).update(created_at=base + timedelta(days=index))
+        self.base = base
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_running_balance(self):
+        """Test CSV export is oldest first and carries a running balance"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0].split(',')[-1], 'balance')
+        self.assertEqual([line.split(',')[-1] for line in lines[1:]], ['100.00', '70.00', '70.00', '75.50'])
+
+    def test_ndjson_with_since(self):
+        """Test NDJSON export starts from the opening balance before since"""
+        since = (self.base + timedelta(days=1)).isoformat()
+
+        response = self.client.get(self.url, {'output': 'ndjson', 'since': since})
+
+        records = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([record['transaction_type'] for record in records], ['TRANSFER_OUT', 'WITHDRAWAL', 'TRANSFER_IN'])
+        self.assertEqual(records[0]['balance'], '70.00')
+        self.assertEqual(records[-1]['balance'], '75.50')
+
+    def test_invalid_output(self):
+        """Test unknown export formats are rejected"""
+        response = self.client.get(self.url, {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FraudScreeningAPITest(APITestCase):
+    """Test cases for the fraud scoring stage in money movement endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.sender_wallet = Wallet.objects.create(owner=self.user, name='Sender', balance=Decimal('200.00'))
+        self.recipient_wallet = Wallet.objects.create(owner=self.other_user, name='Recipient')
+        self.url = reverse('wallet-transfer', kwargs={'wallet_id': self.sender_wallet.id})
+        self.data = {'recipient_wallet_id': str(self.recipient_wallet.id), 'amount': '50.00'}
+
+    def assertBalancesUnchanged(self):
+        self.sender_wallet.refresh_from_db()
+        self.recipient_wallet.refresh_from_db()
+        self.assertEqual(self.sender_wallet.balance, Decimal('200.00'))
+        self.assertEqual(self.recipient_wallet.balance, Decimal('0.00'))
+
+    @override_settings(FRAUD_SCORING={'SCORER': 'wallet.tests.DenyScorer'})
+    def test_denied_transfer(self):
+        """Test a denied transfer is recorded as FAILED and moves no money"""
+        response = self.client.post(self.url, self.data)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertBalancesUnchanged()
+        txn = Transaction.objects.get()
+        self.assertEqual(txn.status, 'FAILED')
+        self.assertTrue(txn.fraud_flagged)
+
+    @override_settings(FRAUD_SCORING={'SCORER': 'wallet.tests.HoldScorer'})
+    def test_held_transfer(self):
+        """Test a held transfer is recorded as PENDING and moves no money"""
+        response = self.client.post(self.url, self.data)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'PENDING')
+        self.assertBalancesUnchanged()
+
+    @override_settings(FRAUD_SCORING={'SCORER': 'wallet.tests.SlowScorer', 'LATENCY_BUDGET_MS': 1})
+    def test_slow_scorer_allows_and_flags(self):
+        """Test a scorer over its latency budget lets the transfer through flagged"""
+        response = self.client.post(self.url, self.data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.sender_wallet.refresh_from_db()
+        self.assertEqual(self.sender_wallet.balance, Decimal('150.00'))
+        txn = Transaction.objects.get(transaction_type='TRANSFER_OUT')
+        self.assertTrue(txn.fraud_flagged)
+        self.assertIsNone(txn.fraud_score)
+
+    @override_settings(FRAUD_SCORING={'SCORER': 'wallet.tests.DenyScorer'})
+    def test_denied_contribution(self):
+        """Test contributions are screened before the debit"""
+        piggy_bank = PiggyBank.objects.create(name='Fund', creator=self.user, target_amount=Decimal('500.00'))
+        url = reverse('piggybank-contribute', kwargs={'piggybank_id': piggy_bank.id})
+
+        response = self.client.post(url, {'wallet_id': str(self.sender_wallet.id), 'amount': '10.00'})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(PiggyBankContribution.objects.count(), 0)
+        piggy_bank.refresh_from_db()
+        self.assertEqual(piggy_bank.current_amount, Decimal('0.00'))
+
+    def test_rule_based_scorer(self):
+        """Test the default rules hold a large transfer that empties the wallet"""
+        event = ScoringEvent('transfer', self.user.id, self.sender_wallet.id, Decimal('20000.00'),
+                             balance=Decimal('20000.00'))
+        score, reasons = RuleBasedScorer().score(event)
+        self.assertGreaterEqual(score, 0.7)
+        self.assertIn('large_amount', reasons)
+
+
+class VelocityCounterTest(TestCase):
+    """Test cases for sliding-window velocity counters"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(owner=self.user, name='Test Wallet', balance=Decimal('100.00'))
+        get_store().clear()
+
+    def test_window_expires_old_buckets(self):
+        """Test events drop out of the window as time moves on"""
+        counter = WindowCounter(60, 1)
+        counter.add(10.0, 1000)
+        counter.add(5.0, 1030)
+
+        self.assertEqual(counter.read(1030), (15.0, 2))
+        self.assertEqual(counter.read(1061), (5.0, 1))
+        self.assertEqual(counter.read(5000), (0.0, 0))
+
+    def assertStoreFeatures(self, store):
+        now = 100000.0
+        store.record_deposit('w1', 'u1', Decimal('500.00'), now - 7200)
+        store.record_transfer('w1', 'u1', 'r1', Decimal('10.00'), now - 1800)
+        store.record_transfer('w1', 'u1', 'r2', Decimal('20.00'), now - 30)
+        store.record_transfer('w1', 'u1', 'r1', Decimal('30.00'), now - 5)
+
+        features = store.features('w1', 'u1', now)
+        self.assertEqual(features['wallet_sent_60s'], Decimal('50.00'))
+        self.assertEqual(features['wallet_sent_count_60s'], 2)
+        self.assertEqual(features['wallet_sent_1h'], Decimal('60.00'))
+        self.assertEqual(features['wallet_deposited_1h'], Decimal('0.00'))
+        self.assertEqual(features['user_deposited_24h'], Decimal('500.00'))
+        self.assertEqual(features['wallet_recipients_1h'], 2)
+        self.assertEqual(store.features('w2', 'u2', now)['wallet_sent_24h'], Decimal('0'))
+
+    def test_in_memory_store(self):
+        """Test the in-memory store computes sums, counts and distinct recipients"""
+        self.assertStoreFeatures(InMemoryVelocityStore())
+
+    def test_sqlite_store(self):
+        """Test the shared SQLite store returns the same features"""
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertStoreFeatures(SQLiteVelocityStore(path=os.path.join(directory, 'velocity.sqlite3')))
+
+    def test_transfer_updates_counters(self):
+        """Test the transfer write path records into the velocity store after commit"""
+        other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        recipient_wallet = Wallet.objects.create(owner=other_user, name='Recipient')
+        self.client.force_login(self.user)
+        url = reverse('wallet-transfer', kwargs={'wallet_id': self.wallet.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'recipient_wallet_id': str(recipient_wallet.id), 'amount': '25.00'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        features = get_store().features(self.wallet.id, self.user.id)
+        self.assertEqual(features['wallet_sent_60s'], Decimal('25.00'))
+        self.assertEqual(features['user_recipients_1h'], 1)
+
+    def test_rebuild_from_transactions(self):
+        """Test counters can be rebuilt from the Transaction table"""
+        Transaction.objects.create(
+            wallet=self.wallet, transaction_type='DEPOSIT', amount=Decimal('40.00'), status='COMPLETED'
+        )
+        Transaction.objects.create(
+            wallet=self.wallet, transaction_type='TRANSFER_OUT', amount=Decimal('15.00'), status='COMPLETED'
+        )
+
+        self.assertEqual(rebuild_from_transactions(), 2)
+        features = get_store().features(self.wallet.id, self.user.id)
+        self.assertEqual(features['wallet_deposited_1h'], Decimal('40.00'))
+        self.assertEqual(features['wallet_sent_1h'], Decimal('15.00'))
+
+    def test_rebuilt_and_live_piggybank_contributions_are_one_recipient(self):
+        """Test a piggy bank replayed from reference_id and recorded live counts as one recipient"""
+        piggy_bank = PiggyBank.objects.create(creator=self.user, name='Trip', target_amount=Decimal('100.00'))
+        Transaction.objects.create(
+            wallet=self.wallet, transaction_type='PIGGYBANK_CONTRIBUTION', amount=Decimal('5.00'),
+            status='COMPLETED', reference_id=str(piggy_bank.id)
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for store in (get_store(), SQLiteVelocityStore(path=os.path.join(directory, 'velocity.sqlite3'))):
+                rebuild_from_transactions(store)
+                store.record_transfer(self.wallet.id, self.user.id, piggy_bank.id, Decimal('5.00'))
+                self.assertEqual(store.features(self.wallet.id, self.user.id)['wallet_recipients_1h'], 1)
+
+    def test_rebuild_command_refuses_process_local_store(self):
+        """Test the rebuild command errors out instead of filling its own short-lived in-memory store"""
+        with self.assertRaises(CommandError):
+            call_command('rebuild_velocity_counters', stdout=StringIO())
+
+
+class BatchScoringTest(TestCase):
+    """Test cases for offline fraud re-scoring"""
+
+    def test_compute_features(self):
+        """Test velocity and new-recipient features are computed per wallet"""
+        wallet = np.array([0, 0, 0, 1, 1])
+        counterparty = np.array([5, 5, 6, 5, -1])
+        amount = np.array([10.0, 20.0, 30.0, 40.0, 50.0])
+        timestamp = np.array([0.0, 100.0, 5000.0, 10.0, 20.0])
+
+        features = compute_features(wallet, counterparty, amount, timestamp)
+
+        self.assertEqual(features['velocity_count'].tolist(), [1, 2, 1, 1, 2])
+        self.assertEqual(features['velocity_amount'].tolist(), [10.0, 30.0, 30.0, 40.0, 90.0])
+        self.assertEqual(features['new_recipient'].tolist(), [1.0, 0.0, 1.0, 1.0, 0.0])
+        self.assertAlmostEqual(features['amount_zscore'][2], 1.2247, places=3)
+
+    def test_score_transactions_command(self):
+        """Test the command flags an outlier and stores scores"""
+        user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        other = User.objects.create_user(username='otheruser', email='other@example.com', password='testpass123')
+        wallet = Wallet.objects.create(owner=user, name='Sender')
+        recipient = Wallet.objects.create(owner=other, name='Recipient')
+        base = timezone.now() - timedelta(days=30)
+        for day in range(20):
+            txn = Transaction.objects.create(
+                wallet=wallet, transaction_type='TRANSFER_OUT', amount=Decimal('10.00'),
+                status='COMPLETED', related_wallet=recipient
+            )
+            Transaction.objects.filter(id=txn.id).update(created_at=base + timedelta(days=day))
+        outlier = Transaction.objects.create(
+            wallet=wallet, transaction_type='TRANSFER_OUT', amount=Decimal('5000.00'),
+            status='COMPLETED', related_wallet=Wallet.objects.create(owner=other, name='New')
+        )
+
+        output = StringIO()
+        call_command('score_transactions', '--threshold', '0.5', stdout=output)
+
+        self.assertIn('Scored 21 transactions', output.getvalue())
+        outlier.refresh_from_db()
+        self.assertTrue(outlier.batch_fraud_flagged)
+        self.assertEqual(Transaction.objects.filter(batch_fraud_flagged=True).count(), 1)
+        self.assertFalse(Transaction.objects.filter(batch_fraud_score__isnull=True).exists())
+
+    def test_rescoring_replaces_batch_flags(self):
+        """Test a second run clears the first run's flags and leaves real-time results alone"""
+        user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        wallet = Wallet.objects.create(owner=user, name='Sender')
+        recipient = Wallet.objects.create(owner=user, name='Recipient')
+        timed_out = Transaction.objects.create(
+            wallet=wallet, transaction_type='TRANSFER_OUT', amount=Decimal('10.00'), status='COMPLETED',
+            related_wallet=recipient, **Assessment(ALLOW, None, ['scoring_timeout'], flagged=True).transaction_fields()
+        )
+
+        self.assertEqual(score_wallets([wallet.id], threshold=0.0), (1, 1, 1))
+        timed_out.refresh_from_db()
+        self.assertTrue(timed_out.batch_fraud_flagged)
+
+        self.assertEqual(score_wallets([wallet.id], threshold=0.99), (1, 1, 0))
+        timed_out.refresh_from_db()
+        self.assertFalse(timed_out.batch_fraud_flagged)
+        self.assertLess(timed_out.batch_fraud_score, 0.99)
+        self.assertTrue(timed_out.fraud_flagged)
+        self.assertIsNone(timed_out.fraud_score)
+
+
+class TransferGraphTest(TestCase):
+    """Test cases for transfer-graph analysis"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.wallets = [Wallet.objects.create(owner=self.user, name=f'Wallet {i}') for i in range(7)]
+
+    def transfer(self, sender, recipient, amount='10.00', status='COMPLETED'):
+        return Transaction.objects.create(
+            wallet=self.wallets[sender], related_wallet=self.wallets[recipient], transaction_type='TRANSFER_OUT',
+            amount=Decimal(amount), status=status
+        )
+
+    def test_cycles_and_components(self):
+        """Test a ring of transfers is found and separate clusters are labelled apart"""
+        self.transfer(0, 1, '100.00')
+        self.transfer(1, 2, '90.00')
+        self.transfer(2, 0, '80.00')
+        self.transfer(2, 3)
+        self.transfer(4, 5)
+        self.transfer(5, 6, status='FAILED')
+
+        graph = TransferGraph()
+        self.assertEqual(graph.refresh(), 5)
+        csr = graph.window()
+        ids = [graph.wallet_index[wallet.id] for wallet in self.wallets[:6]]
+
+        cycles = find_cycles(csr)
+        self.assertEqual(len(cycles), 1)
+        self.assertEqual(sorted(cycles[0]), sorted(ids[:3]))
+        self.assertEqual((strongly_connected_components(csr)[ids] >= 0).tolist(), [True] * 3 + [False] * 3)
+
+        components = connected_components(csr)
+        self.assertEqual(len(set(components[ids[:4]])), 1)
+        self.assertEqual(components[ids[4]], components[ids[5]])
+        self.assertNotEqual(components[ids[0]], components[ids[4]])
+
+        report = analyze(graph, min_component_size=2)
+        self.assertEqual(report['cycles'][0]['amount'], 80.0)
+        self.assertEqual([component['size'] for component in report['components']], [4, 2])
+
+    def test_refresh_appends_only_new_edges_and_hub_ranking(self):
+        """Test incremental refresh and that a pass-through wallet ranks as the top hub"""
+        graph = TransferGraph(capacity=2)
+        for sender in (0, 1, 2):
+            self.transfer(sender, 3, '50.00')
+        self.assertEqual(graph.refresh(), 3)
+
+        for recipient in (4, 5):
+            self.transfer(3, recipient, '75.00')
+        self.assertEqual(graph.refresh(), 2)
+        self.assertEqual(graph.refresh(), 0)
+        self.assertEqual(graph.length, 5)
+
+        report = analyze(graph)
+        self.assertEqual(report['edges'], 5)
+        self.assertEqual(report['hubs'][0]['wallet'], str(self.wallets[3].id))
+        self.assertEqual((report['hubs'][0]['fan_in'], report['hubs'][0]['fan_out']), (3, 2))
+
+        self.assertEqual(graph.window(since=timezone.now()).counts.sum(), 0)
+        self.assertEqual(graph.discard_before(timezone.now()), 5)
+
+    def test_refresh_loads_since_and_picks_up_late_commits(self):
+        """Test the first refresh honours since and a transfer committed late with an earlier time is added once"""
+        now = timezone.now()
+        old = self.transfer(0, 1)
+        Transaction.objects.filter(id=old.id).update(created_at=now - timedelta(days=2))
+        self.transfer(1, 2)
+        graph = TransferGraph(lag=timedelta(minutes=5))
+        self.assertEqual(graph.refresh(since=now - timedelta(hours=1)), 1)
+
+        late = self.transfer(2, 3, '30.00')
+        Transaction.objects.filter(id=late.id).update(created_at=graph.newest - timedelta(minutes=1))
+        self.assertEqual(graph.refresh(), 1)
+        self.assertEqual(graph.refresh(), 0)
+        timestamps = graph.timestamp[:graph.length]
+        self.assertEqual(timestamps.tolist(), sorted(timestamps.tolist()))
+        self.assertEqual(graph.amount[0], 30.0)
+
+    def test_analyze_transfer_graph_command(self):
+        """Test the command prints a JSON report"""
+        self.transfer(0, 1)
+        self.transfer(1, 0)
+        output = StringIO()
+
+        call_command('analyze_transfer_graph', '--hours', '1', stdout=output)
+
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['new_edges'], 2)
+        self.assertEqual(len(report['cycles']), 1)
+
+
+class LedgerTest(APITestCase):
+    """Test cases for the double-entry ledger and balance checkpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(username='otheruser', email='other@example.com', password='testpass123')
+        self.wallet = Wallet.objects.create(owner=self.user, name='Main')
+        self.other_wallet = Wallet.objects.create(owner=self.other_user, name='Other')
+        self.client.force_authenticate(user=self.user)
+
+    def assertLedgerMatchesBalances(self):
+        for entry in JournalEntry.objects.prefetch_related('postings'):
+            self.assertEqual(sum(posting.amount for posting in entry.postings.all()), 0, entry.entry_type)
+        for wallet in Wallet.objects.all():
+            self.assertEqual(balance_as_of(wallet_account(wallet.id)), wallet.balance)
+        for piggy_bank in PiggyBank.objects.all():
+            self.assertEqual(balance_as_of(piggybank_account(piggy_bank.id)), piggy_bank.current_amount)
+
+    def test_money_paths_post_balanced_entries(self):
+        """Test every money movement posts balanced legs that agree with stored balances"""
+        piggy_bank = PiggyBank.objects.create(name='Trip', creator=self.user, target_amount=Decimal('500.00'))
+
+        self.client.post(reverse('wallet-deposit', kwargs={'wallet_id': self.wallet.id}), {'amount': '200.00'})
+        self.client.post(reverse('wallet-transfer', kwargs={'wallet_id': self.wallet.id}), {
+            'recipient_wallet_id': str(self.other_wallet.id), 'amount': '30.00'
+        })
+        self.client.post(reverse('wallet-bulk-transfer', kwargs={'wallet_id': self.wallet.id}), {
+            'transfers': [{'recipient_wallet_id': str(self.other_wallet.id), 'amount': '5.00'}] * 2
+        }, format='json')
+        self.client.post(reverse('piggybank-contribute', kwargs={'piggybank_id': piggy_bank.id}), {
+            'wallet_id': str(self.wallet.id), 'amount': '100.00'
+        })
+        response = self.client.post(reverse('piggybank-pay', kwargs={'piggybank_id': piggy_bank.id}), {
+            'recipient_wallet_id': str(self.other_wallet.id), 'amount': '40.00'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(
+            sorted(JournalEntry.objects.values_list('entry_type', flat=True)),
+            ['BULK_TRANSFER', 'DEPOSIT', 'PIGGYBANK_CONTRIBUTION', 'PIGGYBANK_PAYMENT', 'TRANSFER']
+        )
+        self.assertEqual(balance_as_of(piggybank_account(piggy_bank.id)), Decimal('60.00'))
+        self.assertLedgerMatchesBalances()
+
+    def test_balance_as_of_uses_checkpoint_and_tail(self):
+        """Test historical balances come from the nearest checkpoint plus later postings"""
+        account = wallet_account(self.wallet.id)
+        start = timezone.now() - timedelta(hours=3)
+        for hours, amount in ((0, '100.00'), (1, '50.00'), (2, '25.00')):
+            entry = post('DEPOSIT', [('external', -Decimal(amount)), (account, Decimal(amount))])
+            Posting.objects.filter(entry=entry).update(created_at=start + timedelta(hours=hours))
+
+        self.assertEqual(create_checkpoints(as_of=start + timedelta(minutes=90)), 2)
+        self.assertEqual(create_checkpoints(as_of=start + timedelta(minutes=150)), 2)
+        self.assertEqual(create_checkpoints(as_of=start + timedelta(minutes=170)), 0)
+        with self.assertRaises(ValueError):
+            create_checkpoints(as_of=start)
+
+        self.assertEqual(
+            list(BalanceCheckpoint.objects.filter(account=account).order_by('as_of').values_list('balance', flat=True)),
+            [Decimal('150.00'), Decimal('175.00')]
+        )
+        # Tamper with the history before the checkpoint: reads no longer look at it
+        Posting.objects.filter(account=account, created_at__lt=start + timedelta(minutes=30)).update(amount=0)
+        with self.assertNumQueries(2):
+            self.assertEqual(balance_as_of(account, start + timedelta(minutes=160)), Decimal('175.00'))
+        self.assertEqual(balance_as_of(account, start + timedelta(minutes=100)), Decimal('150.00'))
+        self.assertEqual(balance_as_of(account, start + timedelta(minutes=30)), Decimal('0.00'))
+
+    def test_ledger_is_append_only_and_balanced(self):
+        """Test unbalanced entries are refused and postings cannot be changed"""
+        with self.assertRaises(UnbalancedEntry):
+            post('DEPOSIT', [('external', Decimal('-10.00')), (wallet_account(self.wallet.id), Decimal('9.00'))])
+
+        entry = post('DEPOSIT', [('external', Decimal('-10.00')), (wallet_account(self.wallet.id), Decimal('10.00'))])
+        posting = entry.postings.first()
+        posting.amount = Decimal('0.00')
+        with self.assertRaises(ValueError):
+            posting.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+
+class ReconciliationTest(APITestCase):
+    """Test cases for balance reconciliation"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(username='otheruser', email='other@example.com', password='testpass123')
+        self.wallet = Wallet.objects.create(owner=self.user, name='Main')
+        self.other_wallet = Wallet.objects.create(owner=self.other_user, name='Other')
+        self.piggy_bank = PiggyBank.objects.create(name='Trip', creator=self.user, target_amount=Decimal('500.00'))
+        self.client.force_authenticate(user=self.user)
+
+        self.client.post(reverse('wallet-deposit', kwargs={'wallet_id': self.wallet.id}), {'amount': '200.00'})
+        self.client.post(reverse('wallet-transfer', kwargs={'wallet_id': self.wallet.id}), {
+            'recipient_wallet_id': str(self.other_wallet.id), 'amount': '30.00'
+        })
+        self.client.post(reverse('piggybank-contribute', kwargs={'piggybank_id': self.piggy_bank.id}), {
+            'wallet_id': str(self.wallet.id), 'amount': '100.00'
+        })
+        self.client.post(reverse('piggybank-pay', kwargs={'piggybank_id': self.piggy_bank.id}), {
+            'recipient_wallet_id': str(self.other_wallet.id), 'amount': '40.00'
+        })
+
+    def test_consistent_balances_report_clean(self):
+        """Test balances written by the API reconcile with a fixed number of queries"""
+        Wallet.objects.create(owner=self.other_user, name='Empty')
+        output = StringIO()
+
+        # Seven SELECTs inside the snapshot savepoint, however many wallets there are
+        with self.assertNumQueries(9):
+            call_command('reconcile_balances', '--fail-on-discrepancy', stdout=output)
+
+        self.assertIn('Checked 3 wallets and 1 piggy banks', output.getvalue())
+        self.assertIn('0 discrepancies', output.getvalue())
+
+    def test_repair_fixes_drift_and_posts_adjustment(self):
+        """Test drifted balances are reported, repaired and the correction is journaled"""
+        Wallet.objects.filter(id=self.wallet.id).update(balance=Decimal('999.00'))
+        PiggyBank.objects.filter(id=self.piggy_bank.id).update(current_amount=Decimal('0.00'))
+
+        with self.assertRaises(CommandError):
+            call_command('reconcile_balances', '--fail-on-discrepancy', stdout=StringIO())
+
+        output = StringIO()
+        call_command('reconcile_balances', '--repair', stdout=output)
+        self.assertIn(f'wallet {self.wallet.id}: stored 999.00, expected 70.00 (-929.00)', output.getvalue())
+        self.assertIn('Repaired 2', output.getvalue())
+
+        self.wallet.refresh_from_db()
+        self.piggy_bank.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('70.00'))
+        self.assertEqual(self.piggy_bank.current_amount, Decimal('60.00'))
+        adjustments = Posting.objects.filter(entry__entry_type='ADJUSTMENT')
+        self.assertEqual(adjustments.filter(account=wallet_account(self.wallet.id)).get().amount, Decimal('-929.00'))
+        self.assertEqual(sum(posting.amount for posting in adjustments), 0)
+        call_command('reconcile_balances', '--fail-on-discrepancy', stdout=StringIO())
+
+
+class TransactionArchiveTest(APITestCase):
+    """Test cases for moving old transactions into the archive"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(username='otheruser', email='other@example.com', password='testpass123')
+        self.wallet = Wallet.objects.create(owner=self.user, name='Main')
+        self.other_wallet = Wallet.objects.create(owner=self.other_user, name='Other')
+        self.piggy_bank = PiggyBank.objects.create(name='Trip', creator=self.user, target_amount=Decimal('500.00'))
+        self.client.force_authenticate(user=self.user)
+
+        self.client.post(reverse('wallet-deposit', kwargs={'wallet_id': self.wallet.id}), {'amount': '200.00'})
+        self.client.post(reverse('wallet-transfer', kwargs={'wallet_id': self.wallet.id}), {
+            'recipient_wallet_id': str(self.other_wallet.id), 'amount': '30.00'
+        })
+        self.client.post(reverse('piggybank-contribute', kwargs={'piggybank_id': self.piggy_bank.id}), {
+            'wallet_id': str(self.wallet.id), 'amount': '100.00'
+        })
+        self.client.post(reverse('piggybank-pay', kwargs={'piggybank_id': self.piggy_bank.id}), {
+            'recipient_wallet_id': str(self.other_wallet.id), 'amount': '40.00'
+        })
+        # Move that history back into one month, a day apart, and add a recent deposit
+        self.old = (timezone.now() - timedelta(days=500)).replace(day=1, hour=12)
+        for index, txn in enumerate(Transaction.objects.order_by('created_at', 'id')):
+            Transaction.objects.filter(id=txn.id).update(created_at=self.old + timedelta(days=index))
+        self.client.post(reverse('wallet-deposit', kwargs={'wallet_id': self.wallet.id}), {'amount': '5.00'})
+        self.statement_url = reverse('wallet-statement', kwargs={'wallet_id': self.wallet.id})
+
+    def statement(self, **params):
+        response = self.client.get(self.statement_url, {'output': 'ndjson', **params})
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_dry_run_keeps_rows(self):
+        """Test a dry run lists the month without moving anything"""
+        output = StringIO()
+        call_command('archive_transactions', '--older-than', '12', '--dry-run', stdout=output)
+
+        self.assertIn(f'Would archive {self.old:%Y-%m}', output.getvalue())
+        self.assertEqual(Transaction.objects.count(), 6)
+        self.assertFalse(ArchivedTransactionBatch.objects.exists())
+
+    def test_archive_keeps_statements_and_balances(self):
+        """Test archived months still show in statements and reconcile with stored balances"""
+        before = self.statement()
+
+        output = StringIO()
+        call_command('archive_transactions', '--older-than', '12', stdout=output)
+
+        self.assertIn('Archived 5 transactions from 1 months', output.getvalue())
+        self.assertEqual(Transaction.objects.count(), 1)
+        batch = ArchivedTransactionBatch.objects.get(wallet=self.wallet)
+        self.assertEqual((batch.row_count, batch.net), (3, Decimal('70.00')))
+        payout = ArchivedTransactionBatch.objects.get(wallet=self.other_wallet)
+        self.assertEqual(payout.reference_totals, {str(self.piggy_bank.id): '40.00'})
+        # Contributions point at archived rows and are not cascaded away
+        self.assertEqual(PiggyBankContribution.objects.count(), 1)
+
+        self.assertEqual(self.statement(), before)
+        since = (self.old + timedelta(days=2)).isoformat()
+        records = self.statement(since=since)
+        self.assertEqual([record['transaction_type'] for record in records],
+                         ['PIGGYBANK_CONTRIBUTION', 'DEPOSIT'])
+        self.assertEqual([record['balance'] for record in records], ['70.00', '75.00'])
+
+        output = StringIO()
+        call_command('reconcile_balances', '--fail-on-discrepancy', stdout=output)
+        self.assertIn('0 discrepancies', output.getvalue())
+
+    def test_create_partitions_outside_postgresql(self):
+        """Test partition maintenance is a no-op where the table is not partitioned"""
+        output = StringIO()
+        call_command('create_transaction_partitions', stdout=output)
+        self.assertIn('not partitioned', output.getvalue())
+
+
+class AsyncEndpointTest(TestCase):
+    """Test cases for the async endpoints served under ASGI"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(owner=self.user, name='Main', balance=Decimal('100.00'))
+        self.other_wallet = Wallet.objects.create(owner=self.other_user, name='Other')
+        self.piggy_bank = PiggyBank.objects.create(creator=self.user, name='Trip', target_amount=Decimal('500.00'))
+        self.client.force_login(self.user)
+
+    def test_read_parity(self):
+        """Test async read endpoints return the same responses as the DRF views"""
+        for i in range(25):
+            Transaction.objects.create(
+                wallet=self.wallet, transaction_type='DEPOSIT', amount=Decimal('1.00') + i, status='COMPLETED'
+            )
+        transactions = reverse('wallet-transactions', kwargs={'wallet_id': self.wallet.id})
+        cursor = self.client.get(transactions, {'pagination': 'cursor', 'page_size': 5}).json()['next']
+        requests = [
+            (reverse('wallet-list-create'), {}),
+            (reverse('wallet-detail', kwargs={'pk': self.wallet.id}), {}),
+            (reverse('wallet-detail', kwargs={'pk': self.other_wallet.id}), {}),
+            (transactions, {}),
+            (transactions, {'page': 2, 'type': 'DEPOSIT'}),
+            (transactions, {'page': 9}),
+            (transactions, {'type': 'BOGUS'}),
+            (cursor, {}),
+            (reverse('piggybank-list-create'), {}),
+            (reverse('user-search'), {'q': 'other'}),
+        ]
+        for url, params in requests:
+            expected = self.client.get(url, params)
+            with override_settings(ROOT_URLCONF='backend.urls_async'):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, expected.status_code, url)
+            self.assertEqual(response.json(), expected.json(), url)
+
+    @override_settings(ROOT_URLCONF='backend.urls_async')
+    async def test_money_movements(self):
+        """Test deposit, transfer and contribution through the async views"""
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.post(
+            reverse('wallet-deposit', kwargs={'wallet_id': self.wallet.id}), {'amount': '50.00'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['wallet_owner'], 'testuser')
+
+        response = await self.async_client.post(
+            reverse('wallet-transfer', kwargs={'wallet_id': self.wallet.id}),
+            {'recipient_wallet_id': str(self.other_wallet.id), 'amount': '30.00'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['related_wallet_owner'], 'otheruser')
+
+        response = await self.async_client.post(
+            reverse('piggybank-contribute', kwargs={'piggybank_id': self.piggy_bank.id}),
+            {'wallet_id': str(self.wallet.id), 'amount': '20.00'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['piggy_bank_name'], 'Trip')
+
+        response = await self.async_client.post(
+            reverse('wallet-transfer', kwargs={'wallet_id': self.wallet.id}),
+            {'recipient_wallet_id': str(self.other_wallet.id), 'amount': '500.00'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        await self.wallet.arefresh_from_db()
+        await self.other_wallet.arefresh_from_db()
+        await self.piggy_bank.arefresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('100.00'))
+        self.assertEqual(self.other_wallet.balance, Decimal('30.00'))
+        self.assertEqual(self.piggy_bank.current_amount, Decimal('20.00'))
+
+    @override_settings(ROOT_URLCONF='backend.urls_async')
+    async def test_shared_velocity_store_is_kept_off_the_event_loop(self):
+        """Test a velocity store doing I/O is called on a thread, not the event loop"""
+        await self.async_client.aforce_login(self.user)
+        LoopCheckingVelocityStore.calls.clear()
+        with tempfile.TemporaryDirectory() as directory, self.settings(VELOCITY_COUNTERS={
+            'BACKEND': 'wallet.tests.LoopCheckingVelocityStore',
+            'OPTIONS': {'path': os.path.join(directory, 'velocity.sqlite3')},
+        }):
+            response = await self.async_client.post(
+                reverse('wallet-deposit', kwargs={'wallet_id': self.wallet.id}), {'amount': '5.00'},
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(LoopCheckingVelocityStore.calls, ['thread'])
+            features = await sync_to_async(get_store().features)(self.wallet.id, self.user.id)
+            self.assertEqual(features['wallet_deposited_1h'], Decimal('5.00'))
+
+    @override_settings(ROOT_URLCONF='backend.urls_async', FRAUD_SCORING={'SCORER': 'wallet.tests.DenyScorer'})
+    async def test_denied_transfer(self):
+        """Test a denied async transfer is recorded as FAILED and moves no money"""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse('wallet-transfer', kwargs={'wallet_id': self.wallet.id}),
+            {'recipient_wallet_id': str(self.other_wallet.id), 'amount': '30.00'}, content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        txn = await Transaction.objects.aget()
+        self.assertEqual(txn.status, 'FAILED')
+        await self.wallet.arefresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('100.00'))
+
+    @override_settings(ROOT_URLCONF='backend.urls_async')
+    async def test_idempotent_retry_and_anonymous(self):
+        """Test Idempotency-Key requests are replayed and anonymous requests refused"""
+        url = reverse('wallet-deposit', kwargs={'wallet_id': self.wallet.id})
+        response = await self.async_client.get(reverse('wallet-list-create'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        await self.async_client.aforce_login(self.user)
+        first = await self.async_client.post(
+            url, {'amount': '10.00'}, content_type='application/json', headers={'Idempotency-Key': 'retry-1'}
+        )
+        second = await self.async_client.post(
+            url, {'amount': '10.00'}, content_type='application/json', headers={'Idempotency-Key': 'retry-1'}
+        )
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(await Transaction.objects.acount(), 1)
+
+
+class FastSerializerTest(TestCase):
+    """Test cases for the values()-based list serializers"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            phone_number='+15550100'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(owner=self.user, name='Caf\u00e9 \U0001f4b0', balance=Decimal('1234.50'))
+        self.other_wallet = Wallet.objects.create(owner=self.other_user, name='Other', is_active=False)
+        transfer_funds(self.wallet, self.other_wallet, Decimal('10.05'), 'Rent')
+        Transaction.objects.create(
+            wallet=self.wallet, transaction_type='DEPOSIT', amount=Decimal('99999.99'), status='PENDING',
+            reference_id='ext-1', description=''
+        )
+
+    def assertSameOutput(self, fast, expected):
+        self.assertEqual(fast, expected)
+        self.assertEqual(ORJSONRenderer().render(fast), JSONRenderer().render(expected))
+
+    def test_transaction_parity(self):
+        """Test serialize_transactions matches TransactionSerializer"""
+        queryset = Transaction.objects.select_related('wallet__owner', 'related_wallet__owner').order_by('created_at')
+        self.assertEqual(queryset.count(), 3)
+        for zone in ('UTC', 'Asia/Kolkata'):
+            with timezone.override(zone):
+                self.assertSameOutput(
+                    serialize_transactions(transaction_rows(queryset)),
+                    TransactionSerializer(queryset, many=True).data
+                )
+
+    def test_wallet_parity(self):
+        """Test serialize_wallets matches WalletSerializer"""
+        queryset = Wallet.objects.select_related('owner').order_by('created_at')
+        for zone in ('UTC', 'America/New_York'):
+            with timezone.override(zone):
+                self.assertSameOutput(serialize_wallets(wallet_rows(queryset)), WalletSerializer(queryset, many=True).data)
+
+
+class PiggyBankMembershipTest(APITestCase):
+    """Test cases for the cached piggy bank membership index"""
+
+    def setUp(self):
+        membership.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.member = User.objects.create_user(
+            username='memberuser',
+            email='member@example.com',
+            password='testpass123'
+        )
+        self.piggy_bank = PiggyBank.objects.create(name='Trip', creator=self.user, target_amount=Decimal('100.00'))
+        self.list_url = reverse('piggybank-list-create')
+
+    def listed_ids(self, user):
+        self.client.force_authenticate(user=user)
+        return [item['id'] for item in self.client.get(self.list_url).data['results']]
+
+    def test_lookups_are_cached(self):
+        """Test authorization is answered from the index once it is loaded"""
+        PiggyBankMember.objects.create(piggy_bank=self.piggy_bank, user=self.member)
+        self.assertEqual(membership.accessible_ids(self.member.id), {self.piggy_bank.id})
+        with self.assertNumQueries(0):
+            self.assertTrue(membership.can_access(self.member, self.piggy_bank))
+            self.assertTrue(membership.can_access(self.user, self.piggy_bank))
+
+    def test_add_member_and_soft_delete_invalidate(self):
+        """Test adding a member and deleting the piggy bank update both users' lists"""
+        self.assertEqual(self.listed_ids(self.member), [])
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse('piggybank-add-member', kwargs={'piggybank_id': self.piggy_bank.id}), {'username': 'memberuser'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.listed_ids(self.member), [str(self.piggy_bank.id)])
+
+        self.client.force_authenticate(user=self.user)
+        self.client.delete(reverse('piggybank-detail', kwargs={'pk': self.piggy_bank.id}))
+        self.assertEqual(self.listed_ids(self.user), [])
+        self.assertEqual(self.listed_ids(self.member), [])
+
+    def test_membership_granted_elsewhere_is_not_refused(self):
+        """Test a stale index is reloaded before access is refused"""
+        self.assertFalse(membership.can_access(self.member, self.piggy_bank))
+        # As if added through another worker: this process's index is not invalidated
+        PiggyBankMember.objects.create(piggy_bank=self.piggy_bank, user=self.member)
+        self.assertTrue(membership.can_access(self.member, self.piggy_bank))
+
+    @override_settings(PIGGYBANK_MEMBERSHIP={'CACHE': 'default'})
+    def test_changes_outside_the_api_invalidate(self):
+        """Test deactivating a membership or piggy bank with save(), as the admin does, revokes access"""
+        member = PiggyBankMember.objects.create(piggy_bank=self.piggy_bank, user=self.member)
+        self.assertTrue(membership.can_access(self.member, self.piggy_bank))
+        member.is_active = False
+        member.save()
+        self.assertFalse(membership.can_access(self.member, self.piggy_bank))
+
+        self.assertTrue(membership.can_access(self.user, self.piggy_bank))
+        self.piggy_bank.is_active = False
+        self.piggy_bank.save()
+        self.assertEqual(membership.accessible_ids(self.user.id), frozenset())
+
+    @override_settings(PIGGYBANK_MEMBERSHIP={'CACHE': 'default'})
+    def test_shared_cache(self):
+        """Test a worker with an empty index reads the set from the shared cache"""
+        membership.accessible_ids(self.user.id)
+        membership.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(membership.accessible_ids(self.user.id), {self.piggy_bank.id})
+
+        membership.invalidate(self.user.id)
+        with self.assertNumQueries(1):
+            membership.accessible_ids(self.user.id)
+
+
+class WalletListCacheTest(APITestCase):
+    """Test cases for the cached wallet list and its ETags"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(owner=self.user, name='Main', balance=Decimal('100.00'))
+        self.other_wallet = Wallet.objects.create(owner=self.other, name='Other', balance=Decimal('0.00'))
+        self.list_url = reverse('wallet-list-create')
+
+    def poll(self, user, etag=None):
+        self.client.force_authenticate(user=user)
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(self.list_url, headers=headers)
+
+    def balances(self, response):
+        return {item['name']: item['balance'] for item in response.data['results']}
+
+    def test_unchanged_poll_is_not_modified(self):
+        """Test a poll with the current ETag gets a 304 from the version query alone"""
+        response = self.poll(self.user)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.poll(self.user, etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        with self.assertNumQueries(1):
+            response = self.poll(self.user)
+        self.assertEqual(self.balances(response), {'Main': '100.00'})
+        self.assertEqual(self.poll(self.user, 'W/' + etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.poll(self.user, '"stale"').status_code, status.HTTP_200_OK)
+
+    def test_money_movements_change_the_etag(self):
+        """Test deposits and transfers invalidate the lists of everyone involved"""
+        etag = self.poll(self.user)['ETag']
+        other_etag = self.poll(self.other)['ETag']
+
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse('wallet-deposit', kwargs={'wallet_id': self.wallet.id}), {'amount': '50.00'})
+        response = self.poll(self.user, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.balances(response), {'Main': '150.00'})
+        self.assertEqual(self.poll(self.other, other_etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        etag = response['ETag']
+        self.client.force_authenticate(user=self.user)
+        self.client.post(
+            reverse('wallet-transfer', kwargs={'wallet_id': self.wallet.id}),
+            {'recipient_wallet_id': str(self.other_wallet.id), 'amount': '30.00'}
+        )
+        self.assertEqual(self.balances(self.poll(self.user, etag)), {'Main': '120.00'})
+        self.assertEqual(self.balances(self.poll(self.other, other_etag)), {'Other': '30.00'})
+
+    @override_settings(CACHES={
+        'worker_a': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker-a'},
+        'worker_b': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker-b'},
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    })
+    def test_write_invalidates_every_workers_cache(self):
+        """Test a write through one worker's cache changes the ETag served by another's"""
+        etags = {}
+        for alias in ('worker_a', 'worker_b'):
+            with self.settings(WALLET_LIST_CACHE={'CACHE': alias}):
+                etags[alias] = self.poll(self.user)['ETag']
+                self.assertEqual(self.poll(self.user, etags[alias]).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.settings(WALLET_LIST_CACHE={'CACHE': 'worker_a'}):
+            self.client.force_authenticate(user=self.user)
+            self.client.post(reverse('wallet-deposit', kwargs={'wallet_id': self.wallet.id}), {'amount': '5.00'})
+
+        for alias in ('worker_a', 'worker_b'):
+            with self.settings(WALLET_LIST_CACHE={'CACHE': alias}):
+                response = self.poll(self.user, etags[alias])
+                self.assertEqual(response.status_code, status.HTTP_200_OK, alias)
+                self.assertEqual(self.balances(response), {'Main': '105.00'})
+
+    def test_wallet_changes_and_piggybank_payments_change_the_etag(self):
+        """Test wallet create, update and delete and piggy bank payments invalidate the list"""
+        etag = self.poll(self.user)['ETag']
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.list_url, {'name': 'Savings'})
+        response = self.poll(self.user, etag)
+        self.assertEqual(self.balances(response), {'Main': '100.00', 'Savings': '0.00'})
+
+        etag = response['ETag']
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(reverse('wallet-detail', kwargs={'pk': self.wallet.id}), {'name': 'Renamed'})
+        response = self.poll(self.user, etag)
+        self.assertEqual(self.balances(response), {'Renamed': '100.00', 'Savings': '0.00'})
+
+        etag = response['ETag']
+        self.client.force_authenticate(user=self.user)
+        self.client.delete(reverse('wallet-detail', kwargs={'pk': self.wallet.id}))
+        response = self.poll(self.user, etag)
+        self.assertEqual(self.balances(response), {'Savings': '0.00'})
+
+        other_etag = self.poll(self.other)['ETag']
+        piggy_bank = PiggyBank.objects.create(
+            name='Trip', creator=self.user, target_amount=Decimal('100.00'), current_amount=Decimal('40.00')
+        )
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse('piggybank-pay', kwargs={'piggybank_id': piggy_bank.id}),
+            {'recipient_wallet_id': str(self.other_wallet.id), 'amount': '25.00'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.balances(self.poll(self.other, other_etag)), {'Other': '25.00'})
+
+    @override_settings(WALLET_LIST_CACHE={'CACHE': None})
+    def test_disabled(self):
+        """Test the list is served uncached and without an ETag when the cache is off"""
+        response = self.poll(self.user)
+        self.assertEqual(self.balances(response), {'Main': '100.00'})
+        self.assertNotIn('ETag', response)
+
+
+class EventStreamTest(TestCase):
+    """Test cases for the SSE/WebSocket event stream and its brokers"""
+
+    def setUp(self):
+        membership.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(owner=self.user, name='Main', balance=Decimal('100.00'))
+        self.other_wallet = Wallet.objects.create(owner=self.other, name='Other', balance=Decimal('100.00'))
+        self.piggy_bank = PiggyBank.objects.create(creator=self.user, name='Trip', target_amount=Decimal('500.00'))
+        PiggyBankMember.objects.create(piggy_bank=self.piggy_bank, user=self.other)
+        self.broker = events.get_broker()
+        self.app = EventStreamApp()
+
+    def committed(self, func, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            return func(*args)
+
+    async def connect(self, scope_type='http', cookie=True, headers=()):
+        await self.async_client.aforce_login(self.user)
+        session_key = self.async_client.cookies[settings.SESSION_COOKIE_NAME].value
+        headers = list(headers)
+        if cookie:
+            headers.append((b'cookie', f'{settings.SESSION_COOKIE_NAME}={session_key}'.encode()))
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        scope = {'type': scope_type, 'path': '/api/events/', 'headers': headers}
+        if scope_type == 'http':
+            scope['method'] = 'GET'
+            inbox.put_nowait({'type': 'http.request', 'body': b''})
+        else:
+            inbox.put_nowait({'type': 'websocket.connect'})
+        task = asyncio.ensure_future(self.app(scope, inbox.get, outbox.put))
+        return task, inbox, outbox
+
+    async def next_message(self, outbox):
+        return await asyncio.wait_for(outbox.get(), 5)
+
+    async def test_server_sent_events(self):
+        """Test a subscriber receives its own transactions and its piggy banks' contributions only"""
+        task, inbox, outbox = await self.connect()
+        self.assertEqual((await self.next_message(outbox))['status'], 200)
+        self.assertEqual((await self.next_message(outbox))['body'], b'retry: 5000\n\n')
+
+        await sync_to_async(self.committed)(deposit_funds, self.wallet, Decimal('50.00'), 'Salary')
+        frame = (await self.next_message(outbox))['body'].decode()
+        self.assertTrue(frame.startswith('event: transaction\ndata: '))
+        data = json.loads(frame.split('data: ', 1)[1])
+        self.assertEqual((data['transaction_type'], data['amount'], data['balance']), ('DEPOSIT', '50.00', '150.00'))
+
+        await sync_to_async(self.committed)(
+            transfer_funds, self.other_wallet, self.wallet, Decimal('10.00'), 'Rent'
+        )
+        frame = (await self.next_message(outbox))['body'].decode()
+        self.assertEqual(frame.count('event: '), 1)
+        self.assertEqual(json.loads(frame.split('data: ', 1)[1])['transaction_type'], 'TRANSFER_IN')
+
+        await sync_to_async(self.committed)(
+            contribute_funds, self.piggy_bank, self.other_wallet, self.other, Decimal('25.00')
+        )
+        frame = (await self.next_message(outbox))['body'].decode()
+        self.assertTrue(frame.startswith('event: contribution\n'))
+        data = json.loads(frame.split('data: ', 1)[1])
+        self.assertEqual((data['contributor'], data['current_amount']), ('otheruser', '25.00'))
+
+        await inbox.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(task, 5)
+        self.assertFalse(self.broker.channels)
+
+    async def test_websocket_and_authentication(self):
+        """Test WebSocket delivery and that anonymous or cross-site connections are refused"""
+        task, inbox, outbox = await self.connect(cookie=False)
+        self.assertEqual((await self.next_message(outbox))['status'], 403)
+        await asyncio.wait_for(task, 5)
+
+        task, inbox, outbox = await self.connect('websocket', headers=[(b'origin', b'https://evil.example')])
+        self.assertEqual((await self.next_message(outbox))['type'], 'websocket.close')
+        await asyncio.wait_for(task, 5)
+
+        task, inbox, outbox = await self.connect('websocket', headers=[(b'origin', b'http://localhost:3000')])
+        self.assertEqual((await self.next_message(outbox))['type'], 'websocket.accept')
+        self.broker.publish(events.user_channel(self.user.id), events.Message('transaction', '{"id":"1"}'))
+        message = await self.next_message(outbox)
+        self.assertEqual(json.loads(message['text']), {'event': 'transaction', 'data': {'id': '1'}})
+        await inbox.put({'type': 'websocket.disconnect'})
+        await asyncio.wait_for(task, 5)
+
+    async def test_slow_subscriber_is_bounded(self):
+        """Test a subscriber that falls behind keeps only the newest messages and is told it overflowed"""
+        subscriber = self.broker.subscribe(['user:1'], queue_size=3)
+        for i in range(10):
+            self.broker.publish('user:1', events.Message('transaction', str(i)))
+        await asyncio.sleep(0)
+        messages, overflowed = await subscriber.get(1)
+        self.assertEqual([message.data for message in messages], ['7', '8', '9'])
+        self.assertTrue(overflowed)
+        self.assertEqual(await subscriber.get(0.01), ([], False))
+
+    async def test_sqlite_broker_relays_between_processes(self):
+        """Test an event published through one SQLite broker reaches another's subscriber"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'events.sqlite3')
+            publisher = events.SQLiteBroker(path)
+            listener = events.SQLiteBroker(path, poll_interval=0.01)
+            try:
+                subscriber = listener.subscribe(['user:1'])
+                publisher.publish('user:2', events.Message('transaction', '"other"'))
+                publisher.publish('user:1', events.Message('transaction', '"mine"'))
+                messages, overflowed = await subscriber.get(5)
+                self.assertEqual(messages, [events.Message('transaction', '"mine"')])
+            finally:
+                listener.close()
+
+
+class OutboxTest(APITestCase):
+    """Test cases for the transactional outbox and its dispatcher"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.wallet = Wallet.objects.create(owner=self.user, name='Main', balance=Decimal('100.00'))
+        self.other_wallet = Wallet.objects.create(owner=self.other, name='Other', balance=Decimal('0.00'))
+        self.piggy_bank = PiggyBank.objects.create(creator=self.user, name='Trip', target_amount=Decimal('500.00'))
+        self.client.force_authenticate(user=self.user)
+
+    def test_money_movements_write_events(self):
+        """Test each movement writes its events with the movement and a failed one writes none"""
+        self.client.post(reverse('wallet-deposit', kwargs={'wallet_id': self.wallet.id}), {'amount': '50.00'})
+        self.client.post(
+            reverse('wallet-transfer', kwargs={'wallet_id': self.wallet.id}),
+            {'recipient_wallet_id': str(self.other_wallet.id), 'amount': '30.00'}
+        )
+        self.client.post(
+            reverse('piggybank-contribute', kwargs={'piggybank_id': self.piggy_bank.id}),
+            {'wallet_id': str(self.wallet.id), 'amount': '20.00'}
+        )
+        self.client.post(
+            reverse('wallet-transfer', kwargs={'wallet_id': self.wallet.id}),
+            {'recipient_wallet_id': str(self.other_wallet.id), 'amount': '999.00'}
+        )
+
+        events = list(OutboxEvent.objects.values_list('event_type', 'wallet_id', 'payload'))
+        self.assertEqual([(event_type, wallet_id) for event_type, wallet_id, payload in events], [
+            ('transaction.completed', self.wallet.id),
+            ('transaction.completed', self.wallet.id),
+            ('transaction.completed', self.other_wallet.id),
+            ('transaction.completed', self.wallet.id),
+            ('piggybank.contribution', self.wallet.id),
+        ])
+        self.assertEqual([payload['transaction_type'] for _, _, payload in events[:4]],
+                         ['DEPOSIT', 'TRANSFER_OUT', 'TRANSFER_IN', 'PIGGYBANK_CONTRIBUTION'])
+        self.assertEqual(events[4][2]['amount'], '20.00')
+
+    def test_dispatch_in_batches(self):
+        """Test the dispatcher delivers pending events in id order and marks them dispatched"""
+        for amount in ('1.00', '2.00', '3.00'):
+            deposit_funds(self.wallet, Decimal(amount), 'Top up')
+        delivered = []
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'outbox.ndjson')
+            dispatcher = outbox.Dispatcher([outbox.CallbackSink(delivered.extend), outbox.FileSink(path)], batch_size=2)
+            self.assertEqual(dispatcher.dispatch_batch(), (2, 2))
+            self.assertEqual(dispatcher.dispatch_batch(), (1, 1))
+            self.assertEqual(dispatcher.dispatch_batch(), (0, 0))
+            with open(path) as file:
+                lines = [json.loads(line) for line in file]
+        self.assertEqual([message['payload']['amount'] for message in delivered], ['1.00', '2.00', '3.00'])
+        self.assertEqual(lines, delivered)
+        self.assertFalse(OutboxEvent.objects.filter(dispatched_at__isnull=True).exists())
+
+        call_command('purge_outbox_events', '--days', '0', stdout=StringIO())
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed_delivery_is_retried_in_wallet_order(self):
+        """Test a failing sink leaves the batch pending with a backoff and holds later events of its wallet"""
+        deposit_funds(self.wallet, Decimal('1.00'), 'First')
+        delivered = []
+
+        def flaky(messages):
+            if not delivered and len(messages) == 1 and messages[0]['payload']['amount'] == '1.00':
+                delivered.append(None)
+                raise ConnectionError("sink down")
+            delivered.extend(messages)
+
+        dispatcher = outbox.Dispatcher([outbox.CallbackSink(flaky)])
+        self.assertEqual(dispatcher.dispatch_batch(), (0, 1))
+        failed = OutboxEvent.objects.get()
+        self.assertEqual((failed.attempts, failed.last_error), (1, 'ConnectionError: sink down'))
+        self.assertGreater(failed.available_at, timezone.now())
+
+        deposit_funds(self.wallet, Decimal('2.00'), 'Second')
+        deposit_funds(self.other_wallet, Decimal('5.00'), 'Other wallet')
+        # The second deposit waits for the first without being claimed; the other wallet's event goes out
+        self.assertEqual(dispatcher.dispatch_batch(), (1, 1))
+        self.assertEqual(delivered[1]['payload']['amount'], '5.00')
+
+        OutboxEvent.objects.filter(id=failed.id).update(available_at=timezone.now())
+        self.assertEqual(dispatcher.dispatch_batch(), (2, 2))
+        self.assertEqual([message['payload']['amount'] for message in delivered[2:]], ['1.00', '2.00'])
+
+    def test_backlog_behind_a_backoff_does_not_stall_other_wallets(self):
+        """Test a wallet's backlog behind a failed event leaves room in every batch for other wallets"""
+        deposit_funds(self.wallet, Decimal('1.00'), 'Failed')
+        OutboxEvent.objects.update(attempts=1, available_at=timezone.now() + timedelta(minutes=5))
+        for amount in ('2.00', '3.00', '4.00'):
+            deposit_funds(self.wallet, Decimal(amount), 'Backlog')
+        for amount in ('5.00', '6.00', '7.00'):
+            deposit_funds(self.other_wallet, Decimal(amount), 'Other wallet')
+        delivered = []
+        dispatcher = outbox.Dispatcher([outbox.CallbackSink(delivered.extend)], batch_size=2)
+
+        self.assertEqual(dispatcher.dispatch_batch(), (2, 2))
+        self.assertEqual(dispatcher.dispatch_batch(), (1, 1))
+        self.assertEqual(dispatcher.dispatch_batch(), (0, 0))
+        self.assertEqual([message['payload']['amount'] for message in delivered], ['5.00', '6.00', '7.00'])
+
+        OutboxEvent.objects.filter(attempts=1).update(available_at=timezone.now())
+        while dispatcher.dispatch_batch()[1]:
+            pass
+        self.assertEqual([message['payload']['amount'] for message in delivered[3:]], ['1.00', '2.00', '3.00', '4.00'])
+
+    def test_held_events_are_passed_over(self):
+        """Test a batch whose events are all held back moves the next claim past them"""
+        for amount in ('1.00', '2.00', '3.00'):
+            deposit_funds(self.wallet, Decimal(amount), 'Held')
+        deposit_funds(self.other_wallet, Decimal('5.00'), 'Other wallet')
+        first = OutboxEvent.objects.order_by('id').first()
+        delivered = []
+        dispatcher = outbox.Dispatcher([outbox.CallbackSink(delivered.extend)], batch_size=2)
+        # As if another dispatcher had the first event locked
+        dispatcher.cursor = first.id
+
+        self.assertEqual(dispatcher.dispatch_batch(), (0, 2))
+        self.assertEqual(dispatcher.dispatch_batch(), (1, 1))
+        self.assertEqual(delivered[0]['payload']['amount'], '5.00')
+        self.assertEqual(dispatcher.cursor, 0)
+
+    def test_http_sink(self):
+        """Test the HTTP sink posts batches and a non-2xx response fails delivery"""
+        received = []
+
+        class StubHandler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                received.append(body)
+                self.send_response(503 if len(received) == 1 else 204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.HTTPServer(('127.0.0.1', 0), StubHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            deposit_funds(self.wallet, Decimal('1.00'), 'Top up')
+            sink = outbox.HTTPSink(f'http://127.0.0.1:{server.server_port}/events')
+            dispatcher = outbox.Dispatcher([sink])
+            self.assertEqual(dispatcher.dispatch_batch(), (0, 1))
+            OutboxEvent.objects.update(available_at=timezone.now())
+            self.assertEqual(dispatcher.dispatch_batch(), (1, 1))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(len(received), 2)
+        self.assertEqual(received[1]['events'][0]['type'], 'transaction.completed')
+
+
 class PiggyBankAPITest(APITestCase):
     """Test cases for PiggyBank API endpoints"""
 
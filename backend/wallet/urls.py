@@ -7,7 +7,9 @@ urlpatterns = [
     path('wallets/<uuid:pk>/', views.WalletDetailView.as_view(), name='wallet-detail'),
     path('wallets/<uuid:wallet_id>/deposit/', views.deposit_money, name='wallet-deposit'),
     path('wallets/<uuid:wallet_id>/transfer/', views.transfer_money, name='wallet-transfer'),
+    path('wallets/<uuid:wallet_id>/bulk-transfer/', views.bulk_transfer_money, name='wallet-bulk-transfer'),
     path('wallets/<uuid:wallet_id>/transactions/', views.WalletTransactionListView.as_view(), name='wallet-transactions'),
+    path('wallets/<uuid:wallet_id>/statement/', views.export_wallet_statement, name='wallet-statement'),
     
     # PiggyBank endpoints
     path('piggybanks/', views.PiggyBankListCreateView.as_view(), name='piggybank-list-create'),
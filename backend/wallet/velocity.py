@@ -0,0 +1,345 @@
+"""
+Sliding-window velocity counters used as fraud features.
+
+Each window is a ring of time buckets with a running total, so recording an
+event and reading a window are both O(1) (expired buckets are cleared as the
+clock moves forward, each at most once). Counters live in process memory by
+default; SQLiteVelocityStore keeps the same buckets in a local SQLite file so
+several worker processes on one box share them.
+
+Recipients are keyed by their id as a string in both stores, so a piggy bank
+counts once whether it was recorded live (a UUID) or replayed from a
+transaction's reference_id (a string). A process-local store starts empty, so
+wsgi/asgi call preload() to replay the last day of transactions into it.
+"""
+import functools
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+# window name -> (window length in seconds, bucket width in seconds)
+WINDOWS = {
+    '60s': (60, 1),
+    '1h': (3600, 60),
+    '24h': (86400, 900),
+}
+DISTINCT_WINDOW = '1h'
+
+DEFAULTS = {
+    'BACKEND': 'wallet.velocity.InMemoryVelocityStore',
+    'OPTIONS': {},
+}
+
+
+class WindowCounter:
+    """
+    Sum and count of events over a sliding window made of fixed-width buckets
+    """
+    __slots__ = ('width', 'size', 'epochs', 'sums', 'counts', 'head', 'total', 'count')
+
+    def __init__(self, length, width):
+        self.width = width
+        self.size = length // width
+        self.epochs = [None] * self.size
+        self.sums = [0.0] * self.size
+        self.counts = [0] * self.size
+        self.head = None
+        self.total = 0.0
+        self.count = 0
+
+    def _advance(self, epoch):
+        if self.head is None:
+            self.head = epoch
+            return
+        if epoch <= self.head:
+            return
+        # Clear every bucket that falls out of the window, at most one full ring
+        for stale in range(max(self.head + 1, epoch - self.size + 1), epoch + 1):
+            index = stale % self.size
+            if self.epochs[index] is not None:
+                self.total -= self.sums[index]
+                self.count -= self.counts[index]
+                self.epochs[index] = None
+                self.sums[index] = 0.0
+                self.counts[index] = 0
+        self.head = epoch
+
+    def add(self, amount, at):
+        epoch = int(at // self.width)
+        self._advance(epoch)
+        if epoch <= self.head - self.size:
+            return
+        index = epoch % self.size
+        if self.epochs[index] != epoch:
+            self.epochs[index] = epoch
+        self.sums[index] += amount
+        self.counts[index] += 1
+        self.total += amount
+        self.count += 1
+
+    def read(self, at):
+        self._advance(int(at // self.width))
+        return self.total, self.count
+
+
+class DistinctCounter:
+    """
+    Number of distinct keys seen within a sliding window
+    """
+    def __init__(self, length, width):
+        self.window = WindowCounter(length, width)
+        self.last_seen = {}
+        self.prune_at = 256
+
+    def add(self, key, at):
+        epoch = int(at // self.window.width)
+        previous = self.last_seen.get(key)
+        window = self.window
+        window._advance(epoch)
+        if previous is not None and previous > window.head - window.size:
+            # Move the key from its old bucket to the current one
+            index = previous % window.size
+            if window.epochs[index] == previous:
+                window.counts[index] -= 1
+                window.count -= 1
+        self.last_seen[key] = epoch
+        window.add(0.0, at)
+        if len(self.last_seen) > self.prune_at:
+            cutoff = window.head - window.size
+            self.last_seen = {k: e for k, e in self.last_seen.items() if e > cutoff}
+            self.prune_at = max(256, 2 * len(self.last_seen))
+
+    def read(self, at):
+        return self.window.read(at)[1]
+
+
+class EntityCounters:
+    """
+    Counters kept for one wallet or one user
+    """
+    def __init__(self):
+        self.sent = {name: WindowCounter(*spec) for name, spec in WINDOWS.items()}
+        self.deposited = {name: WindowCounter(*spec) for name, spec in WINDOWS.items()}
+        self.recipients = DistinctCounter(*WINDOWS[DISTINCT_WINDOW])
+
+
+class InMemoryVelocityStore:
+    """
+    Process-local counters for the most recently active wallets and users
+    """
+    process_local = True
+
+    def __init__(self, max_entities=100000):
+        self.max_entities = max_entities
+        self.entities = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _entity(self, key):
+        counters = self.entities.get(key)
+        if counters is None:
+            counters = self.entities[key] = EntityCounters()
+            if len(self.entities) > self.max_entities:
+                self.entities.popitem(last=False)
+        else:
+            self.entities.move_to_end(key)
+        return counters
+
+    def record_transfer(self, wallet_id, user_id, recipient_id, amount, at=None):
+        at = time.time() if at is None else at
+        with self.lock:
+            for key in (('wallet', wallet_id), ('user', user_id)):
+                counters = self._entity(key)
+                for counter in counters.sent.values():
+                    counter.add(float(amount), at)
+                if recipient_id is not None:
+                    counters.recipients.add(str(recipient_id), at)
+
+    def record_deposit(self, wallet_id, user_id, amount, at=None):
+        at = time.time() if at is None else at
+        with self.lock:
+            for key in (('wallet', wallet_id), ('user', user_id)):
+                for counter in self._entity(key).deposited.values():
+                    counter.add(float(amount), at)
+
+    def features(self, wallet_id, user_id, at=None):
+        at = time.time() if at is None else at
+        features = {}
+        with self.lock:
+            for prefix, key in (('wallet', ('wallet', wallet_id)), ('user', ('user', user_id))):
+                counters = self.entities.get(key)
+                for name in WINDOWS:
+                    sent, sent_count = counters.sent[name].read(at) if counters else (0.0, 0)
+                    deposited, _ = counters.deposited[name].read(at) if counters else (0.0, 0)
+                    features[f'{prefix}_sent_{name}'] = Decimal(str(round(sent, 2)))
+                    features[f'{prefix}_sent_count_{name}'] = sent_count
+                    features[f'{prefix}_deposited_{name}'] = Decimal(str(round(deposited, 2)))
+                features[f'{prefix}_recipients_{DISTINCT_WINDOW}'] = counters.recipients.read(at) if counters else 0
+        return features
+
+    def clear(self):
+        with self.lock:
+            self.entities.clear()
+
+
+class SQLiteVelocityStore:
+    """
+    Velocity buckets in a local SQLite file shared by all worker processes on a host.
+    Reads sum at most one window's worth of buckets through the primary key.
+    """
+    process_local = False
+
+    def __init__(self, path='velocity.sqlite3'):
+        self.path = str(path)
+        self.local = threading.local()
+        with self._connection() as connection:
+            connection.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS velocity_bucket (
+                    entity TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    epoch INTEGER NOT NULL,
+                    total REAL NOT NULL DEFAULT 0,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (entity, metric, epoch)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS velocity_recipient (
+                    entity TEXT NOT NULL,
+                    recipient TEXT NOT NULL,
+                    seen_at REAL NOT NULL,
+                    PRIMARY KEY (entity, recipient)
+                ) WITHOUT ROWID;
+            """)
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+        return connection
+
+    def _add(self, connection, entity, metric, amount, at):
+        for name, (length, width) in WINDOWS.items():
+            connection.execute(
+                "INSERT INTO velocity_bucket (entity, metric, epoch, total, count) VALUES (?, ?, ?, ?, 1) "
+                "ON CONFLICT (entity, metric, epoch) DO UPDATE SET total = total + excluded.total, count = count + 1",
+                (entity, f'{metric}_{name}', int(at // width), float(amount))
+            )
+
+    def record_transfer(self, wallet_id, user_id, recipient_id, amount, at=None):
+        at = time.time() if at is None else at
+        connection = self._connection()
+        with connection:
+            for entity in (f'wallet:{wallet_id}', f'user:{user_id}'):
+                self._add(connection, entity, 'sent', amount, at)
+                if recipient_id is not None:
+                    connection.execute(
+                        "INSERT INTO velocity_recipient (entity, recipient, seen_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT (entity, recipient) DO UPDATE SET seen_at = MAX(seen_at, excluded.seen_at)",
+                        (entity, str(recipient_id), at)
+                    )
+
+    def record_deposit(self, wallet_id, user_id, amount, at=None):
+        at = time.time() if at is None else at
+        connection = self._connection()
+        with connection:
+            for entity in (f'wallet:{wallet_id}', f'user:{user_id}'):
+                self._add(connection, entity, 'deposited', amount, at)
+
+    def features(self, wallet_id, user_id, at=None):
+        at = time.time() if at is None else at
+        connection = self._connection()
+        features = {}
+        for prefix, entity in (('wallet', f'wallet:{wallet_id}'), ('user', f'user:{user_id}')):
+            for name, (length, width) in WINDOWS.items():
+                first_epoch = int(at // width) - length // width + 1
+                for metric in ('sent', 'deposited'):
+                    total, count = connection.execute(
+                        "SELECT COALESCE(SUM(total), 0), COALESCE(SUM(count), 0) FROM velocity_bucket "
+                        "WHERE entity = ? AND metric = ? AND epoch >= ?",
+                        (entity, f'{metric}_{name}', first_epoch)
+                    ).fetchone()
+                    features[f'{prefix}_{metric}_{name}'] = Decimal(str(round(total, 2)))
+                    if metric == 'sent':
+                        features[f'{prefix}_sent_count_{name}'] = count
+            length = WINDOWS[DISTINCT_WINDOW][0]
+            features[f'{prefix}_recipients_{DISTINCT_WINDOW}'] = connection.execute(
+                "SELECT COUNT(*) FROM velocity_recipient WHERE entity = ? AND seen_at > ?",
+                (entity, at - length)
+            ).fetchone()[0]
+        return features
+
+    def purge(self, at=None):
+        """Delete buckets older than the longest window"""
+        at = time.time() if at is None else at
+        cutoff = at - max(length for length, _ in WINDOWS.values())
+        connection = self._connection()
+        with connection:
+            for name, (length, width) in WINDOWS.items():
+                connection.execute(
+                    "DELETE FROM velocity_bucket WHERE metric IN (?, ?) AND epoch < ?",
+                    (f'sent_{name}', f'deposited_{name}', int(cutoff // width))
+                )
+            connection.execute("DELETE FROM velocity_recipient WHERE seen_at < ?", (cutoff,))
+
+    def clear(self):
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM velocity_bucket")
+            connection.execute("DELETE FROM velocity_recipient")
+
+
+@functools.lru_cache(maxsize=None)
+def _build_store(backend, options):
+    return import_string(backend)(**dict(options))
+
+
+def get_store():
+    """Return the configured velocity store, shared within the process"""
+    config = {**DEFAULTS, **getattr(settings, 'VELOCITY_COUNTERS', {})}
+    return _build_store(config['BACKEND'], tuple(sorted(config['OPTIONS'].items())))
+
+
+def rebuild_from_transactions(store=None, chunk_size=5000):
+    """
+    Replay completed transfers and deposits from the last 24 hours into the
+    store, e.g. after a restart. Returns the number of rows replayed.
+    """
+    from .models import Transaction
+
+    store = store or get_store()
+    store.clear()
+    longest = max(length for length, _ in WINDOWS.values())
+    rows = Transaction.objects.filter(
+        status='COMPLETED',
+        transaction_type__in=('DEPOSIT', 'TRANSFER_OUT', 'PIGGYBANK_CONTRIBUTION'),
+        created_at__gte=timezone.now() - timedelta(seconds=longest)
+    ).order_by('created_at').values_list(
+        'transaction_type', 'wallet_id', 'wallet__owner_id', 'related_wallet_id', 'reference_id', 'amount', 'created_at'
+    )
+
+    replayed = 0
+    for transaction_type, wallet_id, user_id, related_wallet_id, reference_id, amount, created_at in rows.iterator(
+            chunk_size=chunk_size):
+        at = created_at.timestamp()
+        if transaction_type == 'DEPOSIT':
+            store.record_deposit(wallet_id, user_id, amount, at)
+        else:
+            store.record_transfer(wallet_id, user_id, related_wallet_id or reference_id, amount, at)
+        replayed += 1
+    return replayed
+
+
+def preload():
+    """
+    Rebuild a process-local store in a background thread at startup, so
+    fraud features do not start from zero after a restart or deploy
+    """
+    if getattr(get_store(), 'process_local', False):
+        threading.Thread(target=rebuild_from_transactions, daemon=True, name='velocity-rebuild').start()
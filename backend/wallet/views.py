@@ -1,22 +1,66 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from drf_spectacular.utils import extend_schema
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from datetime import datetime, time
 from decimal import Decimal
+import functools
 
 from .models import Wallet, Transaction, PiggyBank, PiggyBankContribution, PiggyBankMember
+from . import events, fast_serializers, fraud, ledger, list_cache, membership, outbox, velocity
+from .pagination import KeysetPagination
+from .statements import statement_rows, iter_csv, iter_ndjson
+from .idempotency import idempotent, IDEMPOTENCY_KEY_PARAMETER
+from .services import (
+    InsufficientFunds, BulkTransferFailed, credit_wallet, debit_piggybank, transfer_funds, bulk_transfer,
+    deposit_funds, contribute_funds
+)
 from .serializers import (
     WalletSerializer, WalletCreateSerializer, TransactionSerializer,
-    DepositSerializer, TransferSerializer, PiggyBankSerializer,
+    DepositSerializer, TransferSerializer, BulkTransferSerializer, BulkTransferResultSerializer,
+    PiggyBankSerializer,
     PiggyBankContributionSerializer, PiggyBankContributeSerializer,
     PiggyBankMemberSerializer, AddMemberSerializer, PiggyBankPaymentSerializer
 )
 from users.models import User
 
 
+def parse_date_param(value, name):
+    """
+    Parse an ISO date or datetime query parameter into an aware datetime
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: "Enter a valid ISO 8601 date or datetime"})
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def fraud_blocked_response(assessment, txn):
+    """
+    Response for a money movement that fraud screening held (202) or denied (403)
+    """
+    events.publish_transactions([txn])
+    txn_data = TransactionSerializer(txn).data
+    if assessment.decision == fraud.HOLD:
+        return Response(txn_data, status=status.HTTP_202_ACCEPTED)
+    return Response(
+        {"error": "Transaction declined by fraud screening", "transaction": txn_data},
+        status=status.HTTP_403_FORBIDDEN
+    )
+
+
 class WalletListCreateView(generics.ListCreateAPIView):
     """
     List user's wallets or create a new wallet
@@ -29,7 +73,22 @@ class WalletListCreateView(generics.ListCreateAPIView):
         return WalletSerializer
 
     def get_queryset(self):
-        return Wallet.objects.filter(owner=self.request.user, is_active=True)
+        return Wallet.objects.filter(owner=self.request.user, is_active=True).select_related('owner')
+
+    def list(self, request, *args, **kwargs):
+        data, etag = list_cache.conditional_page(request, request.user.id, self.page_data)
+        headers = {'ETag': etag} if etag else None
+        if data is None:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(data, headers=headers)
+
+    def page_data(self):
+        # Same output as WalletSerializer, built from plain rows
+        rows = fast_serializers.wallet_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return fast_serializers.serialize_wallets(rows)
+        return self.get_paginated_response(fast_serializers.serialize_wallets(page)).data
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -43,21 +102,23 @@ class WalletDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        return Wallet.objects.filter(owner=self.request.user, is_active=True)
+        return Wallet.objects.filter(owner=self.request.user, is_active=True).select_related('owner')
 
     def perform_destroy(self, instance):
         # Soft delete - just mark as inactive
         instance.is_active = False
-        instance.save()
+        instance.save(update_fields=['is_active', 'updated_at'])
 
 
 @extend_schema(
     request=DepositSerializer,
     responses={200: TransactionSerializer},
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     description="Deposit money into a wallet"
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent
 def deposit_money(request, wallet_id):
     """
     Deposit money into a wallet
@@ -69,19 +130,10 @@ def deposit_money(request, wallet_id):
         amount = serializer.validated_data['amount']
         description = serializer.validated_data.get('description', 'Wallet deposit')
 
-        with transaction.atomic():
-            # Create transaction record
-            txn = Transaction.objects.create(
-                wallet=wallet,
-                transaction_type='DEPOSIT',
-                amount=amount,
-                status='COMPLETED',
-                description=description
-            )
-
-            # Update wallet balance
-            wallet.balance += amount
-            wallet.save()
+        txn = deposit_funds(wallet, amount, description)
+        transaction.on_commit(functools.partial(
+            velocity.get_store().record_deposit, wallet.id, request.user.id, amount
+        ))
 
         txn_serializer = TransactionSerializer(txn)
         return Response(txn_serializer.data, status=status.HTTP_200_OK)
@@ -92,68 +144,65 @@ def deposit_money(request, wallet_id):
 @extend_schema(
     request=TransferSerializer,
     responses={200: TransactionSerializer},
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     description="Transfer money to another wallet"
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent
 def transfer_money(request, wallet_id):
     """
     Transfer money from one wallet to another
     """
-    sender_wallet = get_object_or_404(Wallet, id=wallet_id, owner=request.user, is_active=True)
-    print("Sender wallet is ", sender_wallet)
+    sender_wallet = get_object_or_404(
+        Wallet.objects.select_related('owner'), id=wallet_id, owner=request.user, is_active=True
+    )
     serializer = TransferSerializer(data=request.data)
 
     if serializer.is_valid():
-        print("Serializer is valid!!!")
         recipient_wallet_id = serializer.validated_data['recipient_wallet_id']
         amount = serializer.validated_data['amount']
         description = serializer.validated_data.get('description', 'Peer-to-peer transfer')
 
-        recipient_wallet = get_object_or_404(Wallet, id=recipient_wallet_id, is_active=True)
-        print("Recipient wallet is ", recipient_wallet)
+        recipient_wallet = get_object_or_404(
+            Wallet.objects.select_related('owner'), id=recipient_wallet_id, is_active=True
+        )
 
-        # Check if sender has sufficient balance
+        # Cheap early exit; the conditional debit in transfer_funds is authoritative
         if not sender_wallet.can_debit(amount):
-            print("Insufficient balance")
             return Response(
                 {"error": "Insufficient balance"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        with transaction.atomic():
-            # Create outgoing transaction for sender
-            print("Creating sender transaction")
-            sender_txn = Transaction.objects.create(
+        assessment = fraud.evaluate(fraud.ScoringEvent(
+            'transfer', request.user.id, sender_wallet.id, amount,
+            balance=sender_wallet.balance, counterparty_id=recipient_wallet.id,
+            wallet_created_at=sender_wallet.created_at
+        ))
+        if not assessment.allowed:
+            txn = Transaction.objects.create(
                 wallet=sender_wallet,
                 transaction_type='TRANSFER_OUT',
                 amount=amount,
-                status='COMPLETED',
+                status=assessment.transaction_status,
                 description=f"Transfer to {recipient_wallet.owner.username}: {description}",
-                related_wallet=recipient_wallet
+                related_wallet=recipient_wallet,
+                **assessment.transaction_fields()
             )
+            return fraud_blocked_response(assessment, txn)
 
-            # Create incoming transaction for recipient
-            recipient_txn = Transaction.objects.create(
-                wallet=recipient_wallet,
-                transaction_type='TRANSFER_IN',
-                amount=amount,
-                status='COMPLETED',
-                description=f"Transfer from {sender_wallet.owner.username}: {description}",
-                related_wallet=sender_wallet,
-                related_transaction=sender_txn
+        try:
+            sender_txn = transfer_funds(sender_wallet, recipient_wallet, amount, description, assessment)
+        except InsufficientFunds:
+            return Response(
+                {"error": "Insufficient balance"},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-            # Link transactions
-            sender_txn.related_transaction = recipient_txn
-            sender_txn.save()
-
-            # Update wallet balances
-            sender_wallet.balance -= amount
-            sender_wallet.save()
-
-            recipient_wallet.balance += amount
-            recipient_wallet.save()
+        transaction.on_commit(functools.partial(
+            velocity.get_store().record_transfer, sender_wallet.id, request.user.id, recipient_wallet.id, amount
+        ))
 
         txn_serializer = TransactionSerializer(sender_txn)
         return Response(txn_serializer.data, status=status.HTTP_200_OK)
@@ -161,17 +210,172 @@ def transfer_money(request, wallet_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(
+    request=BulkTransferSerializer,
+    responses={200: {"description": "Per-item transfer results"}},
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
+    description="Transfer money from one wallet to many recipients in a single database transaction"
+)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@idempotent
+def bulk_transfer_money(request, wallet_id):
+    """
+    Settle a batch of transfers from one wallet.
+    By default the batch is all-or-nothing; pass "partial": true to settle the valid items only.
+    """
+    sender_wallet = get_object_or_404(Wallet, id=wallet_id, owner=request.user, is_active=True)
+    serializer = BulkTransferSerializer(data=request.data)
+
+    if serializer.is_valid():
+        partial = serializer.validated_data['partial']
+        transfers = serializer.validated_data['transfers']
+
+        # The batch is screened as a whole; a held or denied batch is not settled
+        assessment = fraud.evaluate(fraud.ScoringEvent(
+            'bulk_transfer', request.user.id, sender_wallet.id, sum(item['amount'] for item in transfers),
+            balance=sender_wallet.balance, wallet_created_at=sender_wallet.created_at
+        ))
+        if not assessment.allowed:
+            return Response(
+                {"error": "Bulk transfer declined by fraud screening", "decision": assessment.decision},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            results = bulk_transfer(sender_wallet, transfers, partial=partial)
+        except BulkTransferFailed as exc:
+            return Response(
+                {
+                    "error": "Bulk transfer rejected",
+                    "results": BulkTransferResultSerializer(exc.results, many=True).data
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except InsufficientFunds:
+            return Response(
+                {"error": "Insufficient balance"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Wallet.DoesNotExist:
+            return Response(
+                {"error": "Sender wallet not found or inactive"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        completed = [result for result in results if result['status'] == 'COMPLETED']
+        store = velocity.get_store()
+        for result in completed:
+            transaction.on_commit(functools.partial(
+                store.record_transfer, sender_wallet.id, request.user.id, result['recipient_wallet_id'], result['amount']
+            ))
+        return Response({
+            "partial": partial,
+            "completed": len(completed),
+            "failed": len(results) - len(completed),
+            "total_amount": str(sum((result['amount'] for result in completed), Decimal('0.00'))),
+            "results": BulkTransferResultSerializer(results, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@extend_schema(parameters=[
+    OpenApiParameter('pagination', str, enum=['page', 'cursor'],
+                     description="Use 'cursor' for keyset paging; page-number paging is the default"),
+    OpenApiParameter('since', str, description="Only transactions created at or after this date/datetime"),
+    OpenApiParameter('until', str, description="Only transactions created before this date/datetime"),
+    OpenApiParameter('type', str, description="Comma separated transaction types to include"),
+])
 class WalletTransactionListView(generics.ListAPIView):
     """
     List transactions for a specific wallet
+    Pass pagination=cursor (or a cursor) for keyset paging that stays fast on deep pages;
+    page-number paging remains the default for the admin UI.
     """
     serializer_class = TransactionSerializer
     permission_classes = [AllowAny]
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if wants_cursor(self.request.query_params):
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
         wallet_id = self.kwargs['wallet_id']
         wallet = get_object_or_404(Wallet, id=wallet_id, owner=self.request.user, is_active=True)
-        return Transaction.objects.filter(wallet=wallet)
+        return wallet_transactions(wallet, self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        # Same output as TransactionSerializer, built from plain rows
+        rows = fast_serializers.transaction_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(fast_serializers.serialize_transactions(rows))
+        return self.get_paginated_response(fast_serializers.serialize_transactions(page))
+
+
+def wants_cursor(params):
+    return params.get('pagination') == 'cursor' or KeysetPagination.cursor_query_param in params
+
+
+def wallet_transactions(wallet, params):
+    """
+    A wallet's transactions narrowed by the since/until/type query parameters, newest first
+    """
+    queryset = Transaction.objects.filter(wallet=wallet).select_related('wallet__owner', 'related_wallet__owner')
+
+    if params.get('since'):
+        queryset = queryset.filter(created_at__gte=parse_date_param(params['since'], 'since'))
+    if params.get('until'):
+        queryset = queryset.filter(created_at__lt=parse_date_param(params['until'], 'until'))
+    if params.get('type'):
+        types = params['type'].split(',')
+        valid_types = {choice for choice, _ in Transaction.TRANSACTION_TYPES}
+        if not set(types) <= valid_types:
+            raise ValidationError({'type': f"Must be one of {', '.join(sorted(valid_types))}"})
+        queryset = queryset.filter(transaction_type__in=types)
+
+    return queryset.order_by('-created_at', '-id')
+
+
+STATEMENT_FORMATS = {
+    'csv': (iter_csv, 'text/csv', 'csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson', 'ndjson'),
+}
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter('output', str, enum=list(STATEMENT_FORMATS), description="Export format, csv by default"),
+        OpenApiParameter('since', str, description="Only transactions created at or after this date/datetime"),
+        OpenApiParameter('until', str, description="Only transactions created before this date/datetime"),
+    ],
+    responses={200: {"description": "Streamed statement with a running balance column"}},
+    description="Export a wallet's full transaction history"
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def export_wallet_statement(request, wallet_id):
+    """
+    Stream a wallet statement as CSV or NDJSON, oldest transaction first
+    """
+    wallet = get_object_or_404(Wallet, id=wallet_id, owner=request.user, is_active=True)
+
+    output = request.query_params.get('output', 'csv')
+    if output not in STATEMENT_FORMATS:
+        raise ValidationError({'output': f"Must be one of {', '.join(STATEMENT_FORMATS)}"})
+    since = parse_date_param(request.query_params['since'], 'since') if request.query_params.get('since') else None
+    until = parse_date_param(request.query_params['until'], 'until') if request.query_params.get('until') else None
+
+    encoder, content_type, extension = STATEMENT_FORMATS[output]
+    response = StreamingHttpResponse(encoder(statement_rows(wallet, since, until)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="statement-{wallet.id}.{extension}"'
+    return response
 
 
 class PiggyBankListCreateView(generics.ListCreateAPIView):
@@ -183,18 +387,16 @@ class PiggyBankListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         # Return piggy banks created by user or where user is a member
-        user_created = PiggyBank.objects.filter(creator=self.request.user, is_active=True)
-        user_member = PiggyBank.objects.filter(
-            members__user=self.request.user,
-            members__is_active=True,
-            is_active=True
-        )
-        return (user_created | user_member).distinct()
+        return piggy_banks_by_id(membership.accessible_ids(self.request.user.id))
 
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
 
 
+def piggy_banks_by_id(ids):
+    return PiggyBank.objects.filter(id__in=ids, is_active=True).select_related('creator').with_counts()
+
+
 class PiggyBankDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a piggy bank
@@ -203,12 +405,12 @@ class PiggyBankDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        return PiggyBank.objects.filter(creator=self.request.user, is_active=True)
+        return PiggyBank.objects.filter(creator=self.request.user, is_active=True).select_related('creator').with_counts()
 
     def perform_destroy(self, instance):
         # Soft delete - just mark as inactive
         instance.is_active = False
-        instance.save()
+        instance.save(update_fields=['is_active', 'updated_at'])
 
 
 @extend_schema(
@@ -251,27 +453,19 @@ def add_piggybank_member(request, piggybank_id):
 @extend_schema(
     request=PiggyBankContributeSerializer,
     responses={201: PiggyBankContributionSerializer},
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     description="Contribute money to a piggy bank"
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent
 def contribute_to_piggybank(request, piggybank_id):
     """
     Contribute money to a piggy bank
     """
     piggy_bank = get_object_or_404(PiggyBank, id=piggybank_id, is_active=True)
 
-    # Check if user is a member or creator
-    is_member = (
-        piggy_bank.creator == request.user or
-        PiggyBankMember.objects.filter(
-            piggy_bank=piggy_bank,
-            user=request.user,
-            is_active=True
-        ).exists()
-    )
-
-    if not is_member:
+    if not membership.can_access(request.user, piggy_bank):
         return Response(
             {"error": "You are not a member of this piggy bank"},
             status=status.HTTP_403_FORBIDDEN
@@ -292,33 +486,32 @@ def contribute_to_piggybank(request, piggybank_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        with transaction.atomic():
-            # Create transaction record
+        assessment = fraud.evaluate(fraud.ScoringEvent(
+            'piggybank_contribution', request.user.id, wallet.id, amount,
+            balance=wallet.balance, counterparty_id=piggy_bank.id, wallet_created_at=wallet.created_at
+        ))
+        if not assessment.allowed:
             txn = Transaction.objects.create(
                 wallet=wallet,
                 transaction_type='PIGGYBANK_CONTRIBUTION',
                 amount=amount,
-                status='COMPLETED',
+                status=assessment.transaction_status,
                 description=f"Contribution to {piggy_bank.name}",
-                reference_id=str(piggy_bank.id)
+                reference_id=str(piggy_bank.id),
+                **assessment.transaction_fields()
             )
+            return fraud_blocked_response(assessment, txn)
 
-            # Create contribution record
-            contribution = PiggyBankContribution.objects.create(
-                piggy_bank=piggy_bank,
-                contributor=request.user,
-                wallet=wallet,
-                amount=amount,
-                transaction=txn
+        try:
+            contribution = contribute_funds(piggy_bank, wallet, request.user, amount, assessment)
+        except InsufficientFunds:
+            return Response(
+                {"error": "Insufficient balance in wallet"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-
-            # Update wallet balance
-            wallet.balance -= amount
-            wallet.save()
-
-            # Update piggy bank balance
-            piggy_bank.current_amount += amount
-            piggy_bank.save()
+        transaction.on_commit(functools.partial(
+            velocity.get_store().record_transfer, wallet.id, request.user.id, piggy_bank.id, amount
+        ))
 
         contribution_serializer = PiggyBankContributionSerializer(contribution)
         return Response(contribution_serializer.data, status=status.HTTP_201_CREATED)
@@ -337,20 +530,10 @@ class PiggyBankContributionListView(generics.ListAPIView):
         piggybank_id = self.kwargs['piggybank_id']
         piggy_bank = get_object_or_404(PiggyBank, id=piggybank_id, is_active=True)
 
-        # Check if user has access to this piggy bank
-        is_member = (
-            piggy_bank.creator == self.request.user or
-            PiggyBankMember.objects.filter(
-                piggy_bank=piggy_bank,
-                user=self.request.user,
-                is_active=True
-            ).exists()
-        )
-
-        if not is_member:
+        if not membership.can_access(self.request.user, piggy_bank):
             return PiggyBankContribution.objects.none()
 
-        return PiggyBankContribution.objects.filter(piggy_bank=piggy_bank)
+        return PiggyBankContribution.objects.filter(piggy_bank=piggy_bank).select_related('piggy_bank', 'contributor')
 
 
 class PiggyBankMemberListView(generics.ListAPIView):
@@ -364,29 +547,21 @@ class PiggyBankMemberListView(generics.ListAPIView):
         piggybank_id = self.kwargs['piggybank_id']
         piggy_bank = get_object_or_404(PiggyBank, id=piggybank_id, is_active=True)
 
-        # Check if user has access to this piggy bank
-        is_member = (
-            piggy_bank.creator == self.request.user or
-            PiggyBankMember.objects.filter(
-                piggy_bank=piggy_bank,
-                user=self.request.user,
-                is_active=True
-            ).exists()
-        )
-
-        if not is_member:
+        if not membership.can_access(self.request.user, piggy_bank):
             return PiggyBankMember.objects.none()
 
-        return PiggyBankMember.objects.filter(piggy_bank=piggy_bank, is_active=True)
+        return PiggyBankMember.objects.filter(piggy_bank=piggy_bank, is_active=True).select_related('piggy_bank', 'user')
 
 
 @extend_schema(
     request=PiggyBankPaymentSerializer,
     responses={200: TransactionSerializer},
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     description="Make a payment from piggy bank funds to a wallet"
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent
 def pay_from_piggybank(request, piggybank_id):
     """
     Make a payment from piggy bank funds to a recipient wallet
@@ -395,7 +570,7 @@ def pay_from_piggybank(request, piggybank_id):
     piggy_bank = get_object_or_404(PiggyBank, id=piggybank_id, is_active=True)
 
     # Only creator can make payments from piggy bank
-    if piggy_bank.creator != request.user:
+    if piggy_bank.creator_id != request.user.id:
         return Response(
             {"error": "Only the creator of the piggy bank can make payments"},
             status=status.HTTP_403_FORBIDDEN
@@ -417,24 +592,49 @@ def pay_from_piggybank(request, piggybank_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        with transaction.atomic():
-            # Create transaction record for the payment
+        assessment = fraud.evaluate(fraud.ScoringEvent(
+            'piggybank_payment', request.user.id, recipient_wallet.id, amount,
+            balance=piggy_bank.current_amount, counterparty_id=piggy_bank.id
+        ))
+        if not assessment.allowed:
             txn = Transaction.objects.create(
                 wallet=recipient_wallet,
                 transaction_type='TRANSFER_IN',
                 amount=amount,
-                status='COMPLETED',
+                status=assessment.transaction_status,
                 description=f"Payment from {piggy_bank.name}: {description}",
-                reference_id=str(piggy_bank.id)
+                reference_id=str(piggy_bank.id),
+                **assessment.transaction_fields()
+            )
+            return fraud_blocked_response(assessment, txn)
+
+        try:
+            with transaction.atomic():
+                debit_piggybank(piggy_bank.id, amount)
+                credit_wallet(recipient_wallet.id, amount)
+
+                # Create transaction record for the payment
+                txn = Transaction.objects.create(
+                    wallet=recipient_wallet,
+                    transaction_type='TRANSFER_IN',
+                    amount=amount,
+                    status='COMPLETED',
+                    description=f"Payment from {piggy_bank.name}: {description}",
+                    reference_id=str(piggy_bank.id),
+                    **assessment.transaction_fields()
+                )
+                # The piggy bank side has no Transaction row; its debit is this entry's first leg
+                ledger.post('PIGGYBANK_PAYMENT', [
+                    (ledger.piggybank_account(piggy_bank.id), -amount),
+                    (ledger.wallet_account(recipient_wallet.id), amount),
+                ], description, transaction=txn)
+                outbox.record_transactions([txn])
+                events.publish_transactions([txn])
+        except InsufficientFunds:
+            return Response(
+                {"error": "Insufficient funds in piggy bank"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-
-            # Update recipient wallet balance
-            recipient_wallet.balance += amount
-            recipient_wallet.save()
-
-            # Update piggy bank balance
-            piggy_bank.current_amount -= amount
-            piggy_bank.save()
 
         txn_serializer = TransactionSerializer(txn)
         return Response(txn_serializer.data, status=status.HTTP_200_OK)